@@ -60,6 +60,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 
+# Cabeçalhos de resposta legíveis pelo frontend (paginação por cursor)
+CORS_EXPOSE_HEADERS = ['X-Proximo-Cursor']
+
 # Adiciona a URL do Frontend em produção se ela estiver definida nas variáveis de ambiente
 # (Adicione a variável FRONTEND_URL no Render do Backend com o valor: https://financeiro-frontend-tose.onrender.com)
 if 'FRONTEND_URL' in os.environ:
@@ -135,6 +138,51 @@ elif 'RENDER' in os.environ:
 # Router para impedir escritas no banco de Vendas
 DATABASE_ROUTERS = ['config.db_routers.VendasRouter']
 
+# --- CACHE ---
+# LocMemCache é por processo e descarta as entradas menos usadas (LRU) ao atingir MAX_ENTRIES.
+# No alias 'dre' só o conteúdo é por processo: as versões que formam a chave ficam no banco
+# (VersaoCacheDRE), então uma invalidação feita em um worker vale para todos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'financeiro-default',
+    },
+    'dre': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'financeiro-dre',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('DRE_CACHE_MAX_ENTRIES', 300))},
+    },
+}
+
+# Tempo de vida (segundos) do DRE em cache: meses encerrados vs mês corrente/futuro,
+# cujo faturamento ainda muda no banco de vendas.
+DRE_CACHE_TIMEOUT = int(os.environ.get('DRE_CACHE_TIMEOUT', 300))
+DRE_CACHE_TIMEOUT_MES_ABERTO = int(os.environ.get('DRE_CACHE_TIMEOUT_MES_ABERTO', 60))
+
+# DRE: consulta ao banco de vendas em paralelo com as despesas (pool de threads por processo)
+DRE_VENDAS_PARALELO = os.environ.get('DRE_VENDAS_PARALELO', 'True') == 'True'
+DRE_VENDAS_MAX_WORKERS = int(os.environ.get('DRE_VENDAS_MAX_WORKERS', 4))
+
+# Faturamento de dias encerrados lido da tabela local VendaDiariaConsolidada
+# (mantida pelo comando `sincronizar_vendas`); só o período ainda não consolidado vai ao banco de vendas.
+VENDAS_USAR_CONSOLIDADO = os.environ.get('VENDAS_USAR_CONSOLIDADO', 'False') == 'True'
+
+# Matriz de taxas de cartão por loja (invalidada nas escritas; o timeout cobre os demais workers).
+TAXAS_CACHE_TIMEOUT = int(os.environ.get('TAXAS_CACHE_TIMEOUT', 600))
+
+# Autenticação: situação do usuário (ativo/superusuário) revalidada no banco de vendas
+# no máximo uma vez por este intervalo (segundos) em cada processo.
+AUTH_USUARIO_CACHE_TIMEOUT = int(os.environ.get('AUTH_USUARIO_CACHE_TIMEOUT', 60))
+
+# Espelho local das permissões de loja: tempo (segundos) até reler as do usuário no banco de vendas.
+# 0 desliga a releitura sob demanda (espelho mantido só pelo comando `sincronizar_permissoes`).
+PERMISSOES_LOJA_TTL = int(os.environ.get('PERMISSOES_LOJA_TTL', 900))
+
+# Sugestão de categoria na importação de extratos: índices por loja em memória (LRU por processo),
+# reconstruídos após o TTL (segundos) para incorporar despesas gravadas por outros processos.
+SUGESTAO_CATEGORIAS_MAX_LOJAS = int(os.environ.get('SUGESTAO_CATEGORIAS_MAX_LOJAS', 32))
+SUGESTAO_CATEGORIAS_TTL = int(os.environ.get('SUGESTAO_CATEGORIAS_TTL', 900))
+
 # --- SENHAS E I18N ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -54,6 +54,18 @@ export interface Despesa {
   data_transacao?: string;
 }
 
+export interface FiltrosDespesas {
+  mes?: number;
+  ano?: number;
+  categoria_id?: number;
+  fornecedor_id?: number;
+  valor_min?: number;
+  valor_max?: number;
+  data_inicio?: string;
+  data_fim?: string;
+  limite?: number;
+}
+
 export interface DashboardResumo {
   percentual_pago: number;
   percentual_atrasado: number;
@@ -190,6 +202,40 @@ export interface ContaBancaria {
   ativo: boolean;
 }
 
+export interface ConferenciaRecebivel {
+  data_prevista: string;
+  valor_bruto: number;
+  taxas: number;
+  valor_liquido_previsto: number;
+  valor_recebido: number | null;
+  data_recebimento: string | null;
+  origem: string | null;
+  chave_credito: string | null;
+  diferenca: number;
+  status: 'CONCILIADO' | 'DIVERGENTE' | 'NAO_RECEBIDO';
+}
+
+export interface ConferenciaCaixa {
+  loja_id: number;
+  data: string;
+  dinheiro_vendido: number;
+  caixas: { caixa_id: number; total: number }[];
+  recolhido: number;
+  entradas: number;
+  diferenca: number;
+  status: 'OK' | 'DIVERGENTE' | 'SEM_REGISTRO' | 'SEM_VENDA';
+}
+
+// Linha do extrato da conta, com o saldo após a movimentação
+export interface MovimentacaoExtrato {
+  id: number;
+  data_ocorrencia: string;
+  tipo_movimentacao: string;
+  descricao: string;
+  valor: number;
+  saldo: number;
+}
+
 export interface User {
   id: number;
   nome: string;
@@ -285,6 +331,23 @@ export const api = {
     return res.json();
   },
 
+  // Uma página do extrato da conta (o próximo cursor vem no cabeçalho X-Proximo-Cursor)
+  getExtratoConta: async (
+    contaId: number,
+    filtros: { data_inicio?: string; data_fim?: string; limite?: number } = {},
+    cursor?: string | null
+  ): Promise<{ itens: MovimentacaoExtrato[]; proximoCursor: string | null }> => {
+    const params = new URLSearchParams();
+    Object.entries(filtros).forEach(([chave, valor]) => {
+      if (valor !== undefined && valor !== null && valor !== '') params.set(chave, String(valor));
+    });
+    if (cursor) params.set('cursor', cursor);
+
+    const res = await fetch(`${API_BASE_URL}/contas/${contaId}/extrato?${params.toString()}`, { cache: 'no-store', headers: getHeaders() });
+    if (!res.ok) throw new Error('Falha ao buscar extrato da conta');
+    return { itens: await res.json(), proximoCursor: res.headers.get('X-Proximo-Cursor') };
+  },
+
   createTransferencia: async (data: unknown) => {
     const res = await fetch(`${API_BASE_URL}/contas/transferencia`, {
       method: 'POST',
@@ -360,6 +423,21 @@ export const api = {
     return res.json();
   },
 
+  // Repasses de cartão previstos no mês x entradas registradas nas contas da loja
+  getConferenciaRecebiveis: async (lojaId: number, mes: number, ano: number): Promise<ConferenciaRecebivel[]> => {
+    const res = await fetch(`${API_BASE_URL}/recebiveis/${lojaId}/${mes}/${ano}`, { cache: 'no-store', headers: getHeaders() });
+    if (!res.ok) throw new Error('Falha ao carregar conferência de recebíveis');
+    return res.json();
+  },
+
+  // Dinheiro vendido x recolhido dos caixas físicos, por loja e dia (todas as lojas do usuário)
+  getConferenciaCaixas: async (mes: number, ano: number, lojaId?: number): Promise<ConferenciaCaixa[]> => {
+    const params = lojaId ? `?loja_id=${lojaId}` : '';
+    const res = await fetch(`${API_BASE_URL}/caixas/conferencia/${mes}/${ano}${params}`, { cache: 'no-store', headers: getHeaders() });
+    if (!res.ok) throw new Error('Falha ao carregar conferência de caixa');
+    return res.json();
+  },
+
   downloadDrePdf: async (lojaId: number, mes: number, ano: number): Promise<void> => {
     const res = await fetch(`${API_BASE_URL}/dre/${lojaId}/${mes}/${ano}/pdf`, {
       method: 'GET',
@@ -426,20 +504,36 @@ export const api = {
     return res.json();
   },
 
-  // Método que aplica o filtro
-  getDespesas: async (lojaId: number, mes?: number, ano?: number): Promise<Despesa[]> => {
-    let url = `${API_BASE_URL}/despesas/?loja_id=${lojaId}`;
-    
-    // Adiciona os filtros na URL se os parâmetros existirem
-    if (mes && ano) {
-      url += `&mes=${mes}&ano=${ano}`;
-    }
-    
-    console.log("📡 Buscando despesas na URL:", url);
-    
-    const res = await fetch(url, { cache: 'no-store', headers: getHeaders() });
+  // Uma página da listagem (paginação por cursor: o próximo vem no cabeçalho X-Proximo-Cursor)
+  getDespesasPagina: async (
+    lojaId: number,
+    filtros: FiltrosDespesas = {},
+    cursor?: string | null
+  ): Promise<{ itens: Despesa[]; proximoCursor: string | null }> => {
+    const params = new URLSearchParams({ loja_id: String(lojaId) });
+    Object.entries(filtros).forEach(([chave, valor]) => {
+      if (valor !== undefined && valor !== null && valor !== '') params.set(chave, String(valor));
+    });
+    if (cursor) params.set('cursor', cursor);
+
+    const res = await fetch(`${API_BASE_URL}/despesas/?${params.toString()}`, { cache: 'no-store', headers: getHeaders() });
     if (!res.ok) throw new Error('Falha ao buscar despesas');
-    return res.json();
+    return { itens: await res.json(), proximoCursor: res.headers.get('X-Proximo-Cursor') };
+  },
+
+  // Método que aplica o filtro (percorre todas as páginas do mês)
+  getDespesas: async (lojaId: number, mes?: number, ano?: number): Promise<Despesa[]> => {
+    const filtros: FiltrosDespesas = mes && ano ? { mes, ano, limite: 500 } : { limite: 500 };
+    const despesas: Despesa[] = [];
+    let cursor: string | null = null;
+
+    do {
+      const pagina: { itens: Despesa[]; proximoCursor: string | null } = await api.getDespesasPagina(lojaId, filtros, cursor);
+      despesas.push(...pagina.itens);
+      cursor = pagina.proximoCursor;
+    } while (cursor);
+
+    return despesas;
   },
 
   getDespesa: async (id: number): Promise<DespesaDetail> => {
@@ -465,6 +559,23 @@ export const api = {
     return res.json();
   },
 
+  // Grava o OFX como movimentações da conta; reenviar o mesmo extrato não duplica linhas
+  importarOfxConta: async (contaId: number, file: File): Promise<{ importadas: number; ja_importadas: number; em_periodo_fechado: number }> => {
+    const formData = new FormData();
+    formData.append('arquivo', file);
+
+    const headers = getHeaders();
+    delete (headers as any)['Content-Type']; // Let browser set boundary
+
+    const res = await fetch(`${API_BASE_URL}/contas/${contaId}/importar-ofx`, {
+      method: 'POST',
+      headers: headers,
+      body: formData,
+    });
+    if (!res.ok) throw new Error('Falha ao importar extrato na conta');
+    return res.json();
+  },
+
   createDespesa: async (data: unknown) => {
     const res = await fetch(`${API_BASE_URL}/despesas/`, {
       method: 'POST',
@@ -9,6 +9,7 @@ from .models import (
     FechamentoMensal,
     AuditoriaLog
 )
+from .app.services import agregados_mensais
 
 @admin.register(ContaBancaria)
 class ContaBancariaAdmin(admin.ModelAdmin):
@@ -21,6 +22,23 @@ class ContaPagarAdmin(admin.ModelAdmin):
     list_filter = ('loja_id_externo', 'data_competencia')
     search_fields = ('descricao', 'numero_documento')
 
+    # As views do admin já rodam em transação; os agregados são recalculados nela.
+    def save_model(self, request, obj, form, change):
+        periodos = set()
+        if change:
+            periodos = agregados_mensais.periodos_de_despesas(ContaPagar.objects.filter(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        agregados_mensais.recalcular_periodos(periodos | agregados_mensais.periodos_de_despesas([obj]))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        agregados_mensais.recalcular_periodos(agregados_mensais.periodos_de_despesas([obj]))
+
+    def delete_queryset(self, request, queryset):
+        periodos = agregados_mensais.periodos_de_despesas(queryset)
+        super().delete_queryset(request, queryset)
+        agregados_mensais.recalcular_periodos(periodos)
+
 @admin.register(FechamentoMensal)
 class FechamentoMensalAdmin(admin.ModelAdmin):
     list_display = ('loja_id_externo', 'mes', 'ano', 'resultado_operacional', 'status')
@@ -6,9 +6,11 @@ from typing import List, Optional
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import check_password
-from django.db import connections
 from django.http import HttpResponse
 
+from .security import claims_usuario, invalidar_usuario, resolver_usuario
+from financeiro_core.app.services import permissoes_lojas
+
 router = Router()
 
 SECRET_KEY = settings.SECRET_KEY
@@ -55,9 +57,10 @@ class SwitchLojaOut(Schema):
 
 # --- Helpers ---
 
-def create_token(user_id: int, active_loja_id: Optional[int] = None):
+def create_token(user: User, active_loja_id: Optional[int] = None):
+    # Claims de identidade assinados: o AuthBearer não precisa buscar o usuário a cada requisição
     payload = {
-        "user_id": user_id,
+        **claims_usuario(user),
         "active_loja_id": active_loja_id,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=24)
     }
@@ -79,9 +82,9 @@ def get_user_from_request(request):
     token = auth_header.split(" ")[1]
     payload = decode_token(token)
 
-    try:
-        user = User.objects.using('vendas').get(id=payload["user_id"])
-    except User.DoesNotExist:
+    # Mesmo caminho do AuthBearer: claims do token + situação do usuário em cache
+    user = resolver_usuario(payload)
+    if user is None:
         raise HttpError(401, "Usuário não encontrado")
 
     return user, payload.get("active_loja_id")
@@ -101,74 +104,24 @@ def login(request, payload: LoginSchema):
         raise HttpError(401, "Credenciais inválidas")
 
     # Busca as lojas do usuário para definir a loja ativa inicial
-    lojas = fetch_user_lojas(user.id, user.is_superuser)
+    lojas = fetch_user_lojas(user.id)
 
     active_loja_id = None
     if lojas:
         active_loja_id = lojas[0]["id"]
 
-    # Gera o JWT com base no user_id do Orion e com a loja ativa inicial
-    token = create_token(user.id, active_loja_id)
+    # Descarta o estado em cache para que mudanças de permissão valham a partir deste login
+    invalidar_usuario(user.id)
+
+    # Gera o JWT com base no usuário do Orion e com a loja ativa inicial
+    token = create_token(user, active_loja_id)
     return {"token": token}
 
-# --- Lógica de Permissões via Raw SQL ---
-
-def fetch_user_lojas(user_id: int, is_superuser: bool) -> List[dict]:
-    """Busca as lojas e permissões do usuário direto no banco secundário usando SQL bruto."""
-    lojas_dict = {}
-
-    with connections['vendas'].cursor() as cursor:
-        if is_superuser:
-            cursor.execute("SELECT id, nome FROM vendas_loja WHERE ativa = true")
-            for row in cursor.fetchall():
-                lojas_dict[row[0]] = {"id": row[0], "nome": row[1], "role": "GLOBAL"}
-        else:
-            # Regra Nova: Superusuário de Grupo
-            cursor.execute('''
-                SELECT l.id, l.nome
-                FROM vendas_loja l
-                INNER JOIN vendas_grupolojas_super_usuarios_grupo gsu ON l.grupo_id = gsu.grupolojas_id
-                WHERE gsu.user_id = %s AND l.ativa = true
-            ''', [user_id])
-            for row in cursor.fetchall():
-                if row[0] not in lojas_dict:
-                    lojas_dict[row[0]] = {"id": row[0], "nome": row[1], "role": "GESTOR_GRUPO"}
-
-            # Regra 2: Gestor
-            cursor.execute('''
-                SELECT l.id, l.nome
-                FROM vendas_loja l
-                INNER JOIN vendas_loja_gestores lg ON l.id = lg.loja_id
-                WHERE lg.user_id = %s AND l.ativa = true
-            ''', [user_id])
-            for row in cursor.fetchall():
-                if row[0] not in lojas_dict: # Prioridade maior ou mantém se não existir
-                    lojas_dict[row[0]] = {"id": row[0], "nome": row[1], "role": "GESTOR"}
-
-            # Regra 3a: Usuário Base (vendas_userprofile)
-            cursor.execute('''
-                SELECT l.id, l.nome
-                FROM vendas_loja l
-                INNER JOIN vendas_userprofile up ON l.id = up.loja_id
-                WHERE up.user_id = %s AND l.ativa = true
-            ''', [user_id])
-            for row in cursor.fetchall():
-                if row[0] not in lojas_dict:
-                    lojas_dict[row[0]] = {"id": row[0], "nome": row[1], "role": "USUARIO"}
-
-            # Regra 3b: Conferente (vendas_userprofile_lojas_conferencia)
-            cursor.execute('''
-                SELECT l.id, l.nome
-                FROM vendas_loja l
-                INNER JOIN vendas_userprofile_lojas_conferencia uplc ON l.id = uplc.loja_id
-                INNER JOIN vendas_userprofile up ON uplc.userprofile_id = up.id
-                WHERE up.user_id = %s AND l.ativa = true
-            ''', [user_id])
-            for row in cursor.fetchall():
-                if row[0] not in lojas_dict:
-                    lojas_dict[row[0]] = {"id": row[0], "nome": row[1], "role": "CONFERENTE"}
-
-    return list(lojas_dict.values())
+# --- Permissões (espelho local do banco de vendas) ---
+
+def fetch_user_lojas(user_id: int) -> List[dict]:
+    """Lojas e papéis do usuário, lidos do espelho local (ver app/services/permissoes_lojas.py)."""
+    return permissoes_lojas.lojas_do_usuario(user_id)
 
 def mount_grupos(lojas: List[dict]) -> List[dict]:
     """Cria um grupo aglutinador para as lojas encontradas."""
@@ -187,7 +140,7 @@ def mount_grupos(lojas: List[dict]) -> List[dict]:
 def me(request):
     user, active_loja_id = get_user_from_request(request)
 
-    lojas = fetch_user_lojas(user.id, user.is_superuser)
+    lojas = fetch_user_lojas(user.id)
     grupos = mount_grupos(lojas)
 
     active_loja = None
@@ -216,7 +169,7 @@ def switch_loja(request, payload: SwitchLojaSchema):
     print(f"DEBUG: Trocando para a loja ID {payload.loja_id}")
     user, _ = get_user_from_request(request)
 
-    lojas = fetch_user_lojas(user.id, user.is_superuser)
+    lojas = fetch_user_lojas(user.id)
 
     # Valida se o usuário tem acesso à loja
     target_loja = None
@@ -231,7 +184,7 @@ def switch_loja(request, payload: SwitchLojaSchema):
     print("DEBUG: Permissão confirmada")
 
     # Retorna a loja e o novo token no corpo
-    new_token = create_token(user.id, target_loja["id"])
+    new_token = create_token(user, target_loja["id"])
     print("DEBUG: Novo token gerado")
 
     return {"active_loja": target_loja, "token": new_token}
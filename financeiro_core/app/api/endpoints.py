@@ -1,5 +1,7 @@
-from ninja import Router, Schema, Field
-from financeiro_core.app.services.dre_repositories import DjangoRepositorioTaxas, DjangoRepositorioDespesas
+from ninja import Router, Schema, Field, File, UploadedFile
+from financeiro_core.app.services.periodos import filtro_mensal
+from financeiro_core.app.services import agregados_mensais, conciliacao_bancaria, conferencia_caixa, dashboard, despesas_lote, importacao_extrato, paginacao, periodos_fechados, permissoes_lojas, rateios, recebiveis, saldos
+from financeiro_core.app.services.ofx_parser import OfxParserService
 
 class DashboardResumoOut(Schema):
     percentual_pago: float
@@ -16,7 +18,9 @@ from typing import List, Optional
 from decimal import Decimal
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from datetime import date
+from django.http import HttpResponse
+from datetime import date, datetime, time
+from django.utils import timezone
 import traceback
 
 # Importações dos modelos e serviços
@@ -24,7 +28,6 @@ from ..models.entidades import (
     ContaPagar, RateioDespesa,
     CategoriaDespesa, 
     FechamentoMensal,
-    TaxaMaquininha, 
     PerfilTaxaCartao,
     Fornecedor,
     ContaBancaria,
@@ -32,87 +35,60 @@ from ..models.entidades import (
 )
 from ...infrastructure.vendas_client import VendasClientSQL, VendasAPIClientMock
 from ...domain.services import ProcessadorFechamento, FaturamentoItemDTO
-from .security import AuthBearer, check_permission
+from .security import AuthBearer, check_permission, get_current_username
 
 # Instância do Router
 router = Router(auth=AuthBearer())
 
-# ==============================================================================
-# 1. ADAPTERS E REPOSITÓRIOS INTERNOS
-# ==============================================================================
-
-class DjangoRepositorioTaxas:
-    """Busca as taxas configuradas no banco para o cálculo."""
-    def buscar_taxa(self, loja_id: int, tipo: str, bandeira: str, parcelas: int):
-        # 1. Tenta taxa específica
-        taxa = TaxaMaquininha.objects.filter(
-            perfil__loja_id_externo=loja_id,
-            perfil__ativo=True,
-            tipo=tipo,
-            bandeira=bandeira
-        ).first()
-        
-        # 2. Se não achar, tenta fallback para bandeira 'GERAL'
-        if not taxa:
-            taxa = TaxaMaquininha.objects.filter(
-                perfil__loja_id_externo=loja_id,
-                perfil__ativo=True,
-                tipo=tipo,
-                bandeira='GERAL'
-            ).first()
-            
-        if taxa:
-            return type('TaxaDTO', (), {'percentual': taxa.taxa_percentual, 'valor_fixo': taxa.taxa_fixa})
-        return None
+def verificar_periodo_aberto(loja_id: int, data, mensagem: str):
+    """Bloqueio de mês fechado (registro em cache por loja) convertido em erro 400 da API."""
+    try:
+        periodos_fechados.verificar_aberto(loja_id, data, mensagem)
+    except periodos_fechados.PeriodoFechadoError as e:
+        raise HttpError(400, str(e))
 
 @router.get("/dashboard/resumo/{loja_id}/{mes}/{ano}", response=DashboardResumoOut)
 def obter_resumo_dashboard(request, loja_id: int, mes: int, ano: int):
     """Retorna dados agregados para o dashboard usando Regime de Caixa (data_transacao)."""
-    print(f"DEBUG: Endpoint Dashboard acessado pelo usuário {request.auth}")
     check_permission(request, loja_id)
 
-    despesas = ContaPagar.objects.filter(
-        loja_id_externo=loja_id,
-        data_transacao__month=mes,
-        data_transacao__year=ano
-    ).prefetch_related('splits')
-
-    total = despesas.count()
-    if total == 0:
-        return {
-            "percentual_pago": 100.0,
-            "percentual_atrasado": 0.0,
-            "percentual_previsto": 0.0,
-            "total_despesas_mes": 0,
-            "despesas_vencendo_semana": 0,
-            "despesas_atrasadas": 0,
-            "saude_financeira": "SAUDAVEL",
-            "mensagem_assistente": "Nenhuma despesa lançada no regime de caixa para este período."
-        }
-
-    total_despesas_mes = 0
-
-    for d in despesas:
-        if d.splits.exists():
-            for split in d.splits.all():
-                total_despesas_mes += float(split.valor)
-        else:
-            total_despesas_mes += float(d.valor_liquido)
-
-    # Como filtramos por data_transacao, consideramos tudo como pago/caixa.
-    perc_pago = 100.0
-    perc_atrasado = 0.0
-    perc_previsto = 0.0
+    resumo = dashboard.resumo_despesas(loja_id, mes, ano)
+    total = resumo['total_mes']
+
+    if resumo['quantidade_mes'] == 0:
+        perc_pago, perc_atrasado, perc_previsto = 100.0, 0.0, 0.0
+    else:
+        perc_pago = float(resumo['pago_mes'] / total * 100) if total else 100.0
+        perc_atrasado = float(resumo['atrasado_mes'] / total * 100) if total else 0.0
+        perc_previsto = float(resumo['previsto_mes'] / total * 100) if total else 0.0
+
+    atrasadas = resumo['despesas_atrasadas']
+    vencendo = resumo['despesas_vencendo_semana']
+    if perc_atrasado >= 20:
+        saude = "CRITICO"
+    elif atrasadas:
+        saude = "ATENCAO"
+    else:
+        saude = "SAUDAVEL"
+
+    if atrasadas:
+        mensagem = f"{atrasadas} despesa(s) em atraso somando R$ {resumo['valor_atrasado']:.2f}."
+    elif vencendo:
+        mensagem = f"{vencendo} despesa(s) vencendo nos próximos {dashboard.DIAS_VENCENDO} dias."
+    elif resumo['quantidade_mes'] == 0:
+        mensagem = "Nenhuma despesa lançada no regime de caixa para este período."
+    else:
+        mensagem = "Nenhuma despesa em atraso."
 
     return {
         "percentual_pago": round(perc_pago, 1),
         "percentual_atrasado": round(perc_atrasado, 1),
         "percentual_previsto": round(perc_previsto, 1),
-        "total_despesas_mes": round(total_despesas_mes, 2),
-        "despesas_vencendo_semana": 0,
-        "despesas_atrasadas": 0,
-        "saude_financeira": "SAUDAVEL",
-        "mensagem_assistente": "Resumo calculado em regime de caixa com sucesso."
+        "total_despesas_mes": round(float(total), 2),
+        "despesas_vencendo_semana": vencendo,
+        "despesas_atrasadas": atrasadas,
+        "saude_financeira": saude,
+        "mensagem_assistente": mensagem
     }
 def listar_contas(request):
     """Lista contas bancárias e cofres da loja ativa."""
@@ -183,7 +159,14 @@ def registrar_transferencia(request, payload: TransferenciaIn):
     if payload.valor <= 0:
         raise HttpError(400, "O valor da transferência deve ser maior que zero.")
 
+    verificar_periodo_aberto(
+        active_loja_id, payload.data,
+        f"Não é possível registrar transferência em mês fechado ({payload.data.strftime('%m/%Y')})."
+    )
+
     user_id = getattr(request, 'user_id', None)
+    # O schema recebe apenas a data; a movimentação guarda data e hora (meia-noite no fuso do projeto)
+    data_ocorrencia = timezone.make_aware(datetime.combine(payload.data, time.min))
 
     with transaction.atomic():
         MovimentacaoCaixa.objects.create(
@@ -191,7 +174,7 @@ def registrar_transferencia(request, payload: TransferenciaIn):
             tipo_movimentacao='TRANSFERENCIA_SAIDA',
             descricao=payload.descricao,
             valor=payload.valor,
-            data_ocorrencia=payload.data_ocorrencia,
+            data_ocorrencia=data_ocorrencia,
             loja_id_externo=active_loja_id,
             criado_por_id=user_id
         )
@@ -201,13 +184,114 @@ def registrar_transferencia(request, payload: TransferenciaIn):
             tipo_movimentacao='TRANSFERENCIA_ENTRADA',
             descricao=payload.descricao,
             valor=payload.valor,
-            data_ocorrencia=payload.data_ocorrencia,
+            data_ocorrencia=data_ocorrencia,
             loja_id_externo=active_loja_id,
             criado_por_id=user_id
         )
 
     return {"success": True, "message": "Transferência realizada com sucesso."}
 
+class ExtratoItemOut(Schema):
+    id: int
+    data_ocorrencia: datetime
+    tipo_movimentacao: str
+    descricao: str
+    valor: Decimal
+    saldo: Decimal
+
+LIMITE_PADRAO_EXTRATO = 100
+LIMITE_MAXIMO_EXTRATO = 500
+
+@router.get("/contas/{conta_id}/extrato", response=List[ExtratoItemOut])
+def extrato_conta(
+    request,
+    conta_id: int,
+    response: HttpResponse,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limite: int = LIMITE_PADRAO_EXTRATO,
+):
+    """
+    Movimentações da conta em ordem cronológica (data_ocorrencia, id), cada uma com o saldo
+    após ela. Paginação por chave: o cabeçalho X-Proximo-Cursor traz o `cursor` da página seguinte.
+    """
+    active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
+    if not active_loja_id:
+        raise HttpError(400, "Nenhuma loja ativa no contexto")
+
+    conta = get_object_or_404(ContaBancaria, id=conta_id, loja_id_externo=active_loja_id)
+    limite = max(1, min(limite, LIMITE_MAXIMO_EXTRATO))
+
+    apos = None
+    if cursor:
+        try:
+            apos = paginacao.decodificar_cursor(cursor, tipo=datetime)
+        except ValueError:
+            raise HttpError(400, "Cursor inválido.")
+        if apos[0] is None:
+            raise HttpError(400, "Cursor inválido.")
+
+    linhas = saldos.extrato(conta, limite + 1, apos=apos, data_inicio=data_inicio, data_fim=data_fim)
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        response['X-Proximo-Cursor'] = paginacao.codificar_cursor(linhas[-1]['data_ocorrencia'], linhas[-1]['id'])
+    return linhas
+
+class ImportacaoExtratoOut(Schema):
+    importadas: int
+    ja_importadas: int
+    em_periodo_fechado: int
+
+@router.post("/contas/{conta_id}/importar-ofx", response=ImportacaoExtratoOut)
+def importar_ofx(request, conta_id: int, arquivo: UploadedFile = File(...)):
+    """
+    Importa um extrato OFX como movimentações da conta. Idempotente: linhas já importadas
+    (mesmo FITID ou mesmo conteúdo) são ignoradas, então o extrato pode ser reenviado com sobreposição.
+    """
+    active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
+    if not active_loja_id:
+        raise HttpError(400, "Nenhuma loja ativa no contexto")
+
+    conta = get_object_or_404(ContaBancaria, id=conta_id, loja_id_externo=active_loja_id, ativo=True)
+    return importacao_extrato.importar_extrato(
+        conta, OfxParserService.iterar_transacoes(arquivo), criado_por_id=getattr(request, 'user_id', None)
+    )
+
+class ParConciliadoOut(Schema):
+    indice: int
+    fitid: Optional[str] = None
+    despesa_id: int
+    diferenca_dias: int
+    similaridade: float
+
+class ConciliacaoOut(Schema):
+    pares: List[ParConciliadoOut]
+    lancamentos_sem_par: List[int]
+    despesas_sem_par: List[int]
+    em_periodo_fechado: List[int]
+
+@router.post("/contas/{conta_id}/conciliar-ofx", response=ConciliacaoOut)
+def conciliar_ofx(request, conta_id: int, arquivo: UploadedFile = File(...), tolerancia_dias: int = 3, aplicar: bool = False):
+    """
+    Casa os débitos do extrato OFX com as despesas em aberto da loja (mesmo valor, data dentro
+    da tolerância). Com `aplicar`, as despesas casadas são baixadas como pagas por esta conta,
+    exceto as de mês fechado (listadas em `em_periodo_fechado`).
+    """
+    active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
+    if not active_loja_id:
+        raise HttpError(400, "Nenhuma loja ativa no contexto")
+    if tolerancia_dias < 0:
+        raise HttpError(400, "A tolerância em dias não pode ser negativa.")
+
+    conta = get_object_or_404(ContaBancaria, id=conta_id, loja_id_externo=active_loja_id, ativo=True)
+    return conciliacao_bancaria.conciliar_despesas(
+        active_loja_id,
+        OfxParserService.iterar_transacoes(arquivo),
+        tolerancia_dias=tolerancia_dias,
+        conta=conta if aplicar else None,
+    )
+
 # --- CATEGORIAS (CRUD) ---
 
     id: int
@@ -290,6 +374,7 @@ def listar_perfis_taxas(request, loja_id: Optional[int] = None):
 # --- DESPESAS (CRUD) ---
 
 class RateioIn(Schema):
+    id: Optional[int] = None
     descricao: str
     valor: Decimal
     categoria_id: Optional[int] = None
@@ -323,24 +408,122 @@ class DespesaDetailOut(DespesaOut):
     valor_desconto: Decimal
     valor_acrescimo: Decimal
     splits: List[RateioOut] = []
+LIMITE_PADRAO_DESPESAS = 100
+LIMITE_MAXIMO_DESPESAS = 500
+
+# Somente os campos de DespesaOut (e da categoria) são lidos do banco
+_CAMPOS_LISTAGEM_DESPESAS = (
+    'id', 'descricao', 'valor_liquido', 'data_transacao', 'data_competencia',
+    'categoria_id', 'categoria__nome', 'categoria__grupo_contabil', 'categoria__ativa',
+)
+
 @router.get("/despesas/", response=List[DespesaOut])
 def listar_despesas(
-    request, 
+    request,
+    response: HttpResponse,
     loja_id: Optional[int] = None,
     mes: Optional[int] = None,
-    ano: Optional[int] = None
+    ano: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    fornecedor_id: Optional[int] = None,
+    valor_min: Optional[Decimal] = None,
+    valor_max: Optional[Decimal] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limite: int = LIMITE_PADRAO_DESPESAS,
 ):
-    """Lista despesas, opcionalmente filtrando por loja e competência."""
+    """
+    Lista despesas da loja ativa, mais recentes primeiro (data_transacao, id).
+
+    Paginação por chave: se houver mais resultados, o cabeçalho X-Proximo-Cursor traz o
+    valor a ser enviado em `cursor` para buscar a página seguinte.
+    """
     active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
     if not active_loja_id:
         raise HttpError(400, "Nenhuma loja ativa no contexto")
 
-    qs = ContaPagar.objects.filter(loja_id_externo=active_loja_id).select_related('categoria')
-    
+    limite = max(1, min(limite, LIMITE_MAXIMO_DESPESAS))
+    qs = ContaPagar.objects.filter(loja_id_externo=active_loja_id)
+
     if mes and ano:
-        qs = qs.filter(data_transacao__month=mes, data_transacao__year=ano)
-        
-    return qs
+        qs = qs.filter(**filtro_mensal('data_transacao', mes, ano))
+    if categoria_id is not None:
+        qs = qs.filter(categoria_id=categoria_id)
+    if fornecedor_id is not None:
+        qs = qs.filter(fornecedor_id=fornecedor_id)
+    if valor_min is not None:
+        qs = qs.filter(valor_liquido__gte=valor_min)
+    if valor_max is not None:
+        qs = qs.filter(valor_liquido__lte=valor_max)
+    if data_inicio is not None:
+        qs = qs.filter(data_transacao__gte=data_inicio)
+    if data_fim is not None:
+        qs = qs.filter(data_transacao__lte=data_fim)
+
+    apos = None
+    if cursor:
+        try:
+            apos = paginacao.decodificar_cursor(cursor)
+        except ValueError:
+            raise HttpError(400, "Cursor inválido.")
+
+    linhas = paginacao.pagina_decrescente(
+        qs.values(*_CAMPOS_LISTAGEM_DESPESAS), 'data_transacao', limite + 1, apos
+    )
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        response['X-Proximo-Cursor'] = paginacao.codificar_cursor(linhas[-1]['data_transacao'], linhas[-1]['id'])
+
+    return [
+        {
+            "id": linha['id'],
+            "descricao": linha['descricao'],
+            "valor_liquido": linha['valor_liquido'],
+            "data_transacao": linha['data_transacao'],
+            "data_competencia": linha['data_competencia'],
+            "categoria": {
+                "id": linha['categoria_id'],
+                "nome": linha['categoria__nome'],
+                "grupo_contabil": linha['categoria__grupo_contabil'],
+                "ativa": linha['categoria__ativa'],
+            },
+        }
+        for linha in linhas
+    ]
+
+class DespesasLoteIn(Schema):
+    itens: List[DespesaIn]
+
+class ItemLoteCriadoOut(Schema):
+    indice: int
+    id: int
+
+class ItemLoteErroOut(Schema):
+    indice: int
+    erro: str
+
+class DespesasLoteOut(Schema):
+    criadas: List[ItemLoteCriadoOut]
+    erros: List[ItemLoteErroOut]
+
+# Declarada antes de /despesas/{despesa_id} para que "bulk" não seja lido como id
+@router.post("/despesas/bulk", response=DespesasLoteOut)
+def criar_despesas_lote(request, payload: DespesasLoteIn):
+    """
+    Cria várias despesas de uma vez (ex: importação de planilha). Sucesso parcial:
+    os itens válidos são gravados e os inválidos voltam em `erros` com o índice recebido.
+    """
+    active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
+    if not active_loja_id:
+        raise HttpError(400, "Nenhuma loja ativa no contexto")
+    if len(payload.itens) > despesas_lote.LIMITE_ITENS_LOTE:
+        raise HttpError(400, f"Máximo de {despesas_lote.LIMITE_ITENS_LOTE} despesas por lote.")
+
+    criadas, erros = despesas_lote.criar_despesas_em_lote(
+        active_loja_id, payload.itens, criado_por_id=getattr(request, 'user_id', None)
+    )
+    return {"criadas": criadas, "erros": erros}
 
 @router.get("/despesas/{despesa_id}", response=DespesaDetailOut)
 def obter_despesa(request, despesa_id: int):
@@ -362,38 +545,46 @@ def criar_despesa(request, payload: DespesaIn):
         if not loja_id_do_token:
             raise HttpError(400, "Nenhuma loja ativa no contexto")
 
-        if not CategoriaDespesa.objects.filter(id=payload.categoria_id).exists():
-            raise HttpError(404, f"Categoria de Despesa com ID {payload.categoria_id} não encontrada.")
+        verificar_periodo_aberto(
+            loja_id_do_token, payload.data_competencia,
+            f"Não é possível lançar despesa em mês fechado ({payload.data_competencia.strftime('%m/%Y')})."
+        )
 
-        categoria = CategoriaDespesa.objects.get(id=payload.categoria_id)
+        categoria = CategoriaDespesa.objects.filter(id=payload.categoria_id).first()
+        if categoria is None:
+            raise HttpError(404, f"Categoria de Despesa com ID {payload.categoria_id} não encontrada.")
 
         fornecedor = None
         if payload.fornecedor_id:
-            if not Fornecedor.objects.filter(id=payload.fornecedor_id).exists():
+            fornecedor = Fornecedor.objects.filter(id=payload.fornecedor_id).first()
+            if fornecedor is None:
                 raise HttpError(404, f"Fornecedor com ID {payload.fornecedor_id} não encontrado.")
-            fornecedor = Fornecedor.objects.get(id=payload.fornecedor_id)
 
-        despesa = ContaPagar.objects.create(
-            descricao=payload.descricao,
-            loja_id_externo=loja_id_do_token,
-            categoria=categoria,
-            fornecedor=fornecedor,
-            valor_bruto=payload.valor,
-            data_competencia=payload.data_competencia,
-            data_transacao=payload.data_transacao,
-            criado_por_id=getattr(request, 'user_id', None)
-        )
-        for r in payload.rateios:
-            cat_id = r.categoria_id if r.categoria_id else categoria.id
-            cat_rateio = CategoriaDespesa.objects.get(id=cat_id)
-            RateioDespesa.objects.create(
-                despesa=despesa,
-                descricao=r.descricao,
-                valor=r.valor,
-                categoria=cat_rateio
+        with transaction.atomic():
+            despesa = ContaPagar.objects.create(
+                descricao=payload.descricao,
+                loja_id_externo=loja_id_do_token,
+                categoria=categoria,
+                fornecedor=fornecedor,
+                valor_bruto=payload.valor,
+                data_competencia=payload.data_competencia,
+                data_transacao=payload.data_transacao,
+                criado_por_id=getattr(request, 'user_id', None)
             )
+            for r in payload.rateios:
+                cat_id = r.categoria_id if r.categoria_id else categoria.id
+                cat_rateio = CategoriaDespesa.objects.get(id=cat_id)
+                RateioDespesa.objects.create(
+                    despesa=despesa,
+                    descricao=r.descricao,
+                    valor=r.valor,
+                    categoria=cat_rateio
+                )
+            agregados_mensais.recalcular_periodos(agregados_mensais.periodos_de_despesas([despesa]))
         return despesa
 
+    except HttpError:
+        raise
     except Exception as e:
         print("======= ERRO AO SALVAR DESPESA =======")
         traceback.print_exc()
@@ -409,50 +600,47 @@ def editar_despesa(request, despesa_id: int, payload: DespesaIn):
 
     despesa = get_object_or_404(ContaPagar, id=despesa_id, loja_id_externo=active_loja_id)
 
-    fechamento_atual = FechamentoMensal.objects.filter(
-        loja_id_externo=active_loja_id,
-        mes=despesa.data_competencia.month,
-        ano=despesa.data_competencia.year
-    ).first()
-
-    if fechamento_atual and fechamento_atual.status == 'CONCLUIDO':
-        raise HttpError(400, f"Não é possível editar despesa de mês fechado ({despesa.data_competencia.strftime('%m/%Y')}).")
-
-    if payload.data_competencia != despesa.data_competencia:
-        fechamento_novo = FechamentoMensal.objects.filter(
-            loja_id_externo=active_loja_id,
-            mes=payload.data_competencia.month,
-            ano=payload.data_competencia.year
-        ).first()
-        if fechamento_novo and fechamento_novo.status == 'CONCLUIDO':
-            raise HttpError(400, f"Não é possível mover despesa para mês fechado ({payload.data_competencia.strftime('%m/%Y')}).")
+    verificar_periodo_aberto(
+        active_loja_id, despesa.data_competencia,
+        f"Não é possível editar despesa de mês fechado ({despesa.data_competencia.strftime('%m/%Y')})."
+    )
+    verificar_periodo_aberto(
+        active_loja_id, payload.data_competencia,
+        f"Não é possível mover despesa para mês fechado ({payload.data_competencia.strftime('%m/%Y')})."
+    )
 
-    if not CategoriaDespesa.objects.filter(id=payload.categoria_id).exists():
+    # Categoria da despesa e dos rateios numa única consulta
+    ids_categorias = {payload.categoria_id} | {r.categoria_id for r in payload.rateios if r.categoria_id}
+    categorias = CategoriaDespesa.objects.in_bulk(ids_categorias)
+    categoria = categorias.get(payload.categoria_id)
+    if categoria is None:
         raise HttpError(404, f"Categoria {payload.categoria_id} não encontrada.")
-    categoria = CategoriaDespesa.objects.get(id=payload.categoria_id)
+    faltantes = ids_categorias - set(categorias)
+    if faltantes:
+        raise HttpError(404, f"Categoria {min(faltantes)} não encontrada.")
 
     fornecedor = None
     if payload.fornecedor_id:
         fornecedor = get_object_or_404(Fornecedor, id=payload.fornecedor_id)
 
+    # Períodos de origem: a despesa pode estar saindo de um mês para outro
+    periodos_afetados = agregados_mensais.periodos_de_despesas([despesa])
+
     despesa.descricao = payload.descricao
     despesa.categoria = categoria
     despesa.fornecedor = fornecedor
     despesa.valor_bruto = payload.valor
     despesa.data_competencia = payload.data_competencia
     despesa.data_transacao = payload.data_transacao
-    despesa.save()
-    
-    despesa.splits.all().delete()
-    for r in payload.rateios:
-        cat_id = r.categoria_id if r.categoria_id else categoria.id
-        cat_rateio = CategoriaDespesa.objects.get(id=cat_id)
-        RateioDespesa.objects.create(
-            despesa=despesa,
-            descricao=r.descricao,
-            valor=r.valor,
-            categoria=cat_rateio
-        )
+
+    with transaction.atomic():
+        despesa.save()
+
+        # Só os splits que mudaram são gravados (save() acima já invalida o DRE dos meses)
+        rateios.sincronizar_rateios(despesa, payload.rateios, categoria.id)
+
+        periodos_afetados |= agregados_mensais.periodos_de_despesas([despesa])
+        agregados_mensais.recalcular_periodos(periodos_afetados)
 
     return despesa
 
@@ -464,14 +652,93 @@ def excluir_despesa(request, despesa_id: int):
         raise HttpError(400, "Nenhuma loja ativa no contexto")
 
     despesa = get_object_or_404(ContaPagar, id=despesa_id, loja_id_externo=active_loja_id)
-    despesa.delete()
+    verificar_periodo_aberto(
+        active_loja_id, despesa.data_competencia,
+        f"Não é possível excluir despesa de mês fechado ({despesa.data_competencia.strftime('%m/%Y')})."
+    )
+    with transaction.atomic():
+        despesa.delete()
+        agregados_mensais.recalcular_periodos(agregados_mensais.periodos_de_despesas([despesa]))
     return {"success": True, "message": f"Despesa {despesa_id} excluída."}
 
+# --- RECEBÍVEIS DE CARTÃO ---
+
+class ConferenciaRecebivelOut(Schema):
+    data_prevista: date
+    valor_bruto: Decimal
+    taxas: Decimal
+    valor_liquido_previsto: Decimal
+    valor_recebido: Optional[Decimal] = None
+    data_recebimento: Optional[date] = None
+    origem: Optional[str] = None
+    chave_credito: Optional[str] = None
+    diferenca: Decimal
+    status: str
+
+@router.get("/recebiveis/{loja_id}/{mes}/{ano}", response=List[ConferenciaRecebivelOut])
+def conferir_recebiveis(request, loja_id: int, mes: int, ano: int, tolerancia_dias: int = 1, tolerancia_valor: Decimal = Decimal('1.00')):
+    """Repasses de cartão esperados das vendas do mês x entradas registradas nas contas da loja."""
+    active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
+    if not active_loja_id or int(active_loja_id) != loja_id:
+        raise HttpError(403, "Acesso negado à loja solicitada.")
+    if not (1 <= mes <= 12):
+        raise HttpError(400, "Mês inválido.")
+
+    check_permission(request, loja_id)
+
+    try:
+        return recebiveis.conferir_recebiveis(
+            [loja_id], mes, ano, tolerancia_dias=max(0, tolerancia_dias), tolerancia_valor=tolerancia_valor
+        )
+    except Exception:
+        traceback.print_exc()
+        raise HttpError(503, "Serviço indisponível no momento.")
+
+# --- CONFERÊNCIA DE CAIXA ---
+
+class CaixaDinheiroOut(Schema):
+    caixa_id: int
+    total: Decimal
+
+class ConferenciaCaixaOut(Schema):
+    loja_id: int
+    data: date
+    dinheiro_vendido: Decimal
+    caixas: List[CaixaDinheiroOut]
+    recolhido: Decimal
+    entradas: Decimal
+    diferenca: Decimal
+    status: str
+
+@router.get("/caixas/conferencia/{mes}/{ano}", response=List[ConferenciaCaixaOut])
+def conferir_caixas(request, mes: int, ano: int, loja_id: Optional[int] = None, tolerancia: Decimal = Decimal('0.00')):
+    """
+    Dinheiro vendido x recolhido dos caixas físicos, por loja e dia, em todas as lojas do
+    usuário (ou só em `loja_id`, se informada e permitida).
+    """
+    if not (1 <= mes <= 12):
+        raise HttpError(400, "Mês inválido.")
+    user_id = getattr(request, 'user_id', None)
+    if not user_id:
+        raise HttpError(401, "Usuário não identificado.")
+
+    lojas = [loja['id'] for loja in permissoes_lojas.lojas_do_usuario(user_id)]
+    if loja_id is not None:
+        if loja_id not in lojas:
+            raise HttpError(403, "Acesso negado à loja solicitada.")
+        lojas = [loja_id]
+
+    try:
+        return conferencia_caixa.conferir_caixas(lojas, mes, ano, tolerancia=tolerancia)
+    except Exception:
+        traceback.print_exc()
+        raise HttpError(503, "Serviço indisponível no momento.")
+
 # --- FECHAMENTO ---
 
 @router.get("/dre/{loja_id}/{mes}/{ano}")
-def get_dre(request, loja_id: int, mes: int, ano: int):
-    """Calcula o DRE sem efeitos colaterais"""
+def get_dre(request, loja_id: int, mes: int, ano: int, detalhado: bool = True):
+    """Calcula o DRE sem efeitos colaterais. Com `detalhado=false` omite os lançamentos analíticos."""
     active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
     if not active_loja_id or int(active_loja_id) != loja_id:
         raise HttpError(403, "Acesso negado à loja solicitada.")
@@ -480,22 +747,14 @@ def get_dre(request, loja_id: int, mes: int, ano: int):
 
     check_permission(request, loja_id)
 
-    # Extrair info do usuario do request se der, senao default
-    from django.contrib.auth.models import User
-    try:
-        user_id = getattr(request, 'user_id', None) or request.auth.get('user_id')
-        user = User.objects.get(id=user_id)
-        gerado_por = user.username
-    except:
-        gerado_por = "Sistema"
+    gerado_por = get_current_username(request)
 
     # Extrair nome da loja (apenas genérico para teste sem dependencias fortes de outros models)
     loja_nome = request.auth.get('loja_nome', f"Loja {loja_id}") if isinstance(request.auth, dict) else f"Loja {loja_id}"
 
-    from financeiro_core.app.services.dre_service import DREService
+    from financeiro_core.app.services.dre_cache import obter_dre
     try:
-        service = DREService()
-        dre_data = service.gerar(loja_id, mes, ano, loja_nome, gerado_por)
+        dre_data = obter_dre(loja_id, mes, ano, loja_nome, gerado_por, incluir_lancamentos=detalhado)
         return dre_data
     except Exception as e:
         import traceback
@@ -512,24 +771,17 @@ def get_dre_pdf(request, loja_id: int, mes: int, ano: int):
 
     check_permission(request, loja_id)
 
-    from django.contrib.auth.models import User
-    try:
-        user_id = getattr(request, 'user_id', None) or request.auth.get('user_id')
-        user = User.objects.get(id=user_id)
-        gerado_por = user.username
-    except:
-        gerado_por = "Sistema"
+    gerado_por = get_current_username(request)
 
     loja_nome = request.auth.get('loja_nome', f"Loja {loja_id}") if isinstance(request.auth, dict) else f"Loja {loja_id}"
 
-    from financeiro_core.app.services.dre_service import DREService
+    from financeiro_core.app.services.dre_cache import obter_dre
     from financeiro_core.reports.dre_pdf import DREPDFGenerator
     from django.http import HttpResponse
     import unicodedata
 
     try:
-        service = DREService()
-        dre_data = service.gerar(loja_id, mes, ano, loja_nome, gerado_por)
+        dre_data = obter_dre(loja_id, mes, ano, loja_nome, gerado_por)
 
         response = HttpResponse(content_type='application/pdf')
         nome_arquivo = unicodedata.normalize('NFKD', loja_nome).encode('ASCII', 'ignore').decode('utf-8').replace(' ', '_').upper()
@@ -551,24 +803,17 @@ def get_dre_xml(request, loja_id: int, mes: int, ano: int):
 
     check_permission(request, loja_id)
 
-    from django.contrib.auth.models import User
-    try:
-        user_id = getattr(request, 'user_id', None) or request.auth.get('user_id')
-        user = User.objects.get(id=user_id)
-        gerado_por = user.username
-    except:
-        gerado_por = "Sistema"
+    gerado_por = get_current_username(request)
 
     loja_nome = request.auth.get('loja_nome', f"Loja {loja_id}") if isinstance(request.auth, dict) else f"Loja {loja_id}"
 
-    from financeiro_core.app.services.dre_service import DREService
+    from financeiro_core.app.services.dre_cache import obter_dre
     from financeiro_core.reports.dre_xml import DREXMLGenerator
     from django.http import HttpResponse
     import unicodedata
 
     try:
-        service = DREService()
-        dre_data = service.gerar(loja_id, mes, ano, loja_nome, gerado_por)
+        dre_data = obter_dre(loja_id, mes, ano, loja_nome, gerado_por)
 
         response = HttpResponse(content_type='application/xml; charset=utf-8')
         nome_arquivo = unicodedata.normalize('NFKD', loja_nome).encode('ASCII', 'ignore').decode('utf-8').replace(' ', '_').upper()
@@ -597,27 +842,9 @@ class FechamentoOut(Schema):
     despesas_financeiras: Decimal
     lucro_liquido: Decimal
 
-@router.post("/fechamento/calcular/{loja_id}/{mes}/{ano}", response=FechamentoOut)
-class FechamentoOut(Schema):
-    loja_id_externo: int
-    mes: int
-    ano: int
-    receita_bruta: Decimal
-    total_dinheiro: Decimal = Decimal('0.00')
-    total_cartao: Decimal = Decimal('0.00')
-    total_pix: Decimal = Decimal('0.00')
-    impostos: Decimal
-    receita_liquida: Decimal
-    custos_produtos: Decimal
-    lucro_bruto: Decimal
-    despesas_operacionais: Decimal
-    resultado_operacional: Decimal
-    despesas_financeiras: Decimal
-    lucro_liquido: Decimal
-
 @router.post("/fechamento/calcular/{loja_id}/{mes}/{ano}", response=FechamentoOut)
 def calcular_fechamento(request, loja_id: int, mes: int, ano: int):
-    """Calcula e persiste o fechamento mensal, chamando DREService."""
+    """Calcula e persiste o fechamento mensal a partir de um DRE recalculado (nunca do cache)."""
     active_loja_id = request.auth.get('active_loja_id') if isinstance(request.auth, dict) else getattr(request, 'active_loja_id', None)
     if not active_loja_id or int(active_loja_id) != loja_id:
         raise HttpError(403, "Acesso negado à loja solicitada.")
@@ -626,12 +853,12 @@ def calcular_fechamento(request, loja_id: int, mes: int, ano: int):
 
     check_permission(request, loja_id)
 
-    from financeiro_core.app.services.dre_service import DREService
+    from financeiro_core.app.services.dre_cache import recalcular_dre
+    from financeiro_core.app.services import dre_snapshot
     try:
-        service = DREService()
         loja_nome = request.auth.get('loja_nome', f"Loja {loja_id}") if isinstance(request.auth, dict) else f"Loja {loja_id}"
         gerado_por = "Sistema"
-        dre_data = service.gerar(loja_id, mes, ano, loja_nome, gerado_por)
+        dre_data = recalcular_dre(loja_id, mes, ano, loja_nome, gerado_por)
         resumo = dre_data['resumo']
 
         with transaction.atomic():
@@ -646,7 +873,7 @@ def calcular_fechamento(request, loja_id: int, mes: int, ano: int):
             fechamento.receita_liquida = resumo['receita_liquida']
             fechamento.total_despesas = resumo['despesas_operacionais']
             fechamento.resultado_operacional = resumo['resultado_operacional']
-            fechamento.dados_auditoria_snapshot = dre_data
+            fechamento.dados_auditoria_snapshot = dre_snapshot.preparar_snapshot(dre_data)
             fechamento.save()
 
         return {
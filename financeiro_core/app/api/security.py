@@ -1,46 +1,117 @@
+from dataclasses import dataclass
 from typing import Optional, List
 from ninja.security import HttpBearer
 from django.conf import settings
+from django.core.cache import cache
 import jwt
 from ninja.errors import HttpError
 from django.contrib.auth.models import User
 
 SECRET_KEY = settings.SECRET_KEY
 
-class AuthBearer(HttpBearer):
-    def authenticate(self, request, token):
-        print("DEBUG: Token recebido")
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            print(f"DEBUG: Payload decodificado: {payload}")
+# Versão dos claims gravados por auth.create_token.
+# v1 (sem o claim "ver"): apenas user_id/active_loja_id, o usuário é buscado no banco de vendas.
+# v2: inclui username e is_superuser assinados; não exige consulta ao banco a cada requisição.
+VERSAO_TOKEN = 2
 
-            # Fetch user strictly from the secondary DB to validate
-            user = User.objects.using('vendas').get(id=payload["user_id"])
 
-            request.user_id = payload["user_id"]
-            request.active_loja_id = payload.get("active_loja_id")
-            request.user = user  # Attach user object to the request
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    """Usuário resolvido a partir do token (não é um model; não há consulta ao banco)."""
+    id: int
+    username: str
+    is_superuser: bool = False
+    first_name: str = ''
+    email: str = ''
+    is_authenticated: bool = True
 
-            return user
-        except jwt.ExpiredSignatureError as e:
-            print(f"DEBUG: Erro ao validar usuário: {e}")
-            return None
-        except jwt.InvalidTokenError as e:
-            print(f"DEBUG: Erro ao validar usuário: {e}")
+
+def claims_usuario(user) -> dict:
+    """Claims de identidade embutidos no token."""
+    return {
+        "user_id": user.id,
+        "username": user.username,
+        "is_superuser": user.is_superuser,
+        "ver": VERSAO_TOKEN,
+    }
+
+
+def _chave_usuario(user_id: int) -> str:
+    return f'auth:usuario:{user_id}'
+
+
+def estado_usuario(user_id: int) -> Optional[dict]:
+    """
+    Situação do usuário no banco de vendas (username, is_superuser, is_active, nome, e-mail), revalidada
+    no máximo uma vez por AUTH_USUARIO_CACHE_TIMEOUT em cada processo. None se não existe.
+    """
+    chave = _chave_usuario(user_id)
+    estado = cache.get(chave)
+    if estado is None:
+        linha = User.objects.using('vendas').filter(id=user_id).values(
+            'username', 'is_superuser', 'is_active', 'first_name', 'email'
+        ).first()
+        # Usuário inexistente também é guardado, para não repetir a consulta a cada requisição
+        estado = linha or {}
+        cache.set(chave, estado, getattr(settings, 'AUTH_USUARIO_CACHE_TIMEOUT', 60))
+    return estado or None
+
+
+def invalidar_usuario(user_id: int):
+    cache.delete(_chave_usuario(user_id))
+
+
+def resolver_usuario(payload: dict) -> Optional[UsuarioAutenticado]:
+    """Usuário do token decodificado, ou None se foi desativado/removido ou mudou de permissão."""
+    user_id = payload.get("user_id")
+    estado = estado_usuario(user_id) if user_id is not None else None
+    if not estado or not estado['is_active']:
+        return None
+
+    if payload.get("ver") == VERSAO_TOKEN:
+        # Permissão mudou depois da emissão: exige novo login
+        if payload.get("is_superuser") != estado['is_superuser']:
             return None
-        except User.DoesNotExist as e:
-            print(f"DEBUG: Erro ao validar usuário: User {payload.get('user_id')} não encontrado no banco vendas. Erro: {e}")
+        username = payload["username"]
+    else:
+        # Token antigo: identidade vem do banco (via cache)
+        username = estado['username']
+
+    return UsuarioAutenticado(
+        id=user_id,
+        username=username,
+        is_superuser=estado['is_superuser'],
+        first_name=estado.get('first_name') or '',
+        email=estado.get('email') or '',
+    )
+
+
+class AuthBearer(HttpBearer):
+    def authenticate(self, request, token):
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        except jwt.InvalidTokenError:
             return None
-        except Exception as e:
-            print(f"DEBUG: Erro ao validar usuário: {e}")
+
+        user = resolver_usuario(payload)
+        if user is None:
             return None
 
+        request.user_id = user.id
+        request.active_loja_id = payload.get("active_loja_id")
+        request.user = user
+        return user
+
 def get_current_user_id(request):
     return getattr(request, "user_id", None)
 
 def get_current_active_loja_id(request):
     return getattr(request, "active_loja_id", None)
 
+def get_current_username(request, padrao: str = "Sistema") -> str:
+    user = getattr(request, "user", None)
+    return getattr(user, "username", None) or padrao
+
 def check_permission(request, loja_id_requested: int):
     active = get_current_active_loja_id(request)
     if not active:
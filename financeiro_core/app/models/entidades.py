@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from decimal import Decimal
 
 # --- Cadastros de Apoio ---
@@ -79,31 +81,61 @@ class MovimentacaoCaixa(models.Model):
     loja_id_externo = models.IntegerField(db_index=True)
     criado_por_id = models.IntegerField(null=True, blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    chave_importacao = models.CharField(
+        max_length=80, null=True, blank=True,
+        help_text="Identidade da linha do extrato importado (FITID ou hash do conteúdo); vazia nos lançamentos manuais"
+    )
 
     class Meta:
         verbose_name = "Movimentação de Caixa"
         verbose_name_plural = "Movimentações de Caixa"
+        # NULLs não colidem: só as linhas importadas são únicas por conta
+        unique_together = ('conta', 'chave_importacao')
+        indexes = [
+            models.Index(fields=['loja_id_externo', 'data_ocorrencia'], name='movcaixa_loja_ocorrencia_idx'),
+            # Extrato da conta: ordem (data_ocorrencia, id) e paginação por chave
+            models.Index(fields=['conta', 'data_ocorrencia', 'id'], name='movcaixa_conta_ocorr_id_idx'),
+        ]
 
-    def save(self, *args, **kwargs):
-        # Controle para não duplicar valores se for um update (simples)
-        is_new = self.pk is None
+    # Tipos que somam ao saldo da conta; os demais subtraem
+    TIPOS_CREDITO = ('ENTRADA', 'TRANSFERENCIA_ENTRADA')
 
-        super().save(*args, **kwargs)
+    @property
+    def valor_com_sinal(self) -> Decimal:
+        return self.valor if self.tipo_movimentacao in self.TIPOS_CREDITO else -self.valor
 
-        # O gatilho atualiza o saldo apenas na inserção inicial para evitar corrupção em edições complexas
-        if is_new:
-            if self.tipo_movimentacao in ['ENTRADA', 'TRANSFERENCIA_ENTRADA']:
-                self.conta.saldo_atual += self.valor
-            elif self.tipo_movimentacao in ['SAIDA', 'TRANSFERENCIA_SAIDA']:
-                self.conta.saldo_atual -= self.valor
+    def save(self, *args, **kwargs):
+        # O saldo da conta e os saldos diários são ajustados pelos signals (incrementos F()),
+        # na mesma transação da gravação (ver app/services/saldos.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-            self.conta.save(update_fields=['saldo_atual'])
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
-        sinal = "+" if self.tipo_movimentacao in ['ENTRADA', 'TRANSFERENCIA_ENTRADA'] else "-"
+        sinal = "+" if self.tipo_movimentacao in self.TIPOS_CREDITO else "-"
         return f"{self.data_ocorrencia.strftime('%d/%m/%Y')} | {self.conta.nome}: {sinal} R$ {self.valor}"
 
 
+class SaldoDiarioConta(models.Model):
+    """
+    Ponto de controle do saldo da conta ao fim de um dia (fuso do projeto), já incluindo o
+    saldo inicial. Gerado pelo comando `reconciliar_saldos --pontos-controle` (ou, para uma
+    conta ainda sem nenhum, na primeira consulta de saldo/extrato) e mantido nas gravações
+    de MovimentacaoCaixa com data igual ou anterior.
+    """
+    conta = models.ForeignKey(ContaBancaria, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    saldo = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Saldo Diário da Conta"
+        verbose_name_plural = "Saldos Diários das Contas"
+        unique_together = ('conta', 'data')
+
+
 class PerfilTaxaCartao(models.Model):
     nome = models.CharField(max_length=100, help_text="Ex: Contrato Stone 2024")
     loja_id_externo = models.IntegerField(verbose_name="ID da Loja (Sistema Vendas)")
@@ -158,6 +190,22 @@ class ContaPagar(models.Model):
     class Meta:
         verbose_name = "Conta a Pagar"
         verbose_name_plural = "Contas a Pagar"
+        indexes = [
+            # Consultas mensais filtram por loja + intervalo de datas (ver app/services/periodos.py)
+            # Mesma ordem da listagem de /despesas/ (data_transacao DESC NULLS LAST, id DESC): a página
+            # por chave é uma faixa do índice lida na direção dele (lida ao contrário, seria NULLS FIRST)
+            models.Index(
+                'loja_id_externo', F('data_transacao').desc(nulls_last=True), F('id').desc(),
+                name='contapagar_loja_trans_id_idx',
+            ),
+            models.Index(fields=['loja_id_externo', 'data_competencia'], name='contapagar_loja_compet_idx'),
+            # Pendências do painel (atrasadas / vencendo na semana): só despesas sem pagamento
+            models.Index(
+                fields=['loja_id_externo', 'data_transacao'],
+                name='contapagar_loja_pendente_idx',
+                condition=models.Q(data_pagamento__isnull=True),
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         self.valor_liquido = self.valor_bruto - self.valor_desconto + self.valor_acrescimo
@@ -181,11 +229,124 @@ class FechamentoMensal(models.Model):
     status = models.CharField(max_length=20, choices=[('ABERTO', 'Aberto'), ('CONCLUIDO', 'Concluído')], default='ABERTO')
     data_fechamento = models.DateTimeField(auto_now=True)
     
-    dados_auditoria_snapshot = models.JSONField(null=True, blank=True)
+    dados_auditoria_snapshot = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
 
     class Meta:
         unique_together = ('loja_id_externo', 'mes', 'ano')
 
+class PeriodoAgregadoDespesa(models.Model):
+    """
+    Marca um (loja, mês, regime) como materializado em AgregadoMensalDespesa
+    e guarda os indicadores de qualidade do período.
+    """
+    REGIME_CHOICES = [
+        ('CAIXA', 'Caixa (data_transacao)'),
+        ('COMPETENCIA', 'Competência (data_competencia)'),
+    ]
+
+    loja_id_externo = models.IntegerField()
+    ano = models.IntegerField()
+    mes = models.IntegerField()
+    regime = models.CharField(max_length=15, choices=REGIME_CHOICES)
+
+    quantidade_despesas_consideradas = models.IntegerField(default=0)
+    quantidade_despesas_sem_rateio = models.IntegerField(default=0)
+    quantidade_despesas_com_rateio_valido = models.IntegerField(default=0)
+    quantidade_despesas_com_rateio_invalido = models.IntegerField(default=0)
+    valor_despesas_com_rateio_invalido = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    valor_total_despesas_consideradas = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    valor_splits_rateio_invalido = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Período Agregado de Despesas"
+        verbose_name_plural = "Períodos Agregados de Despesas"
+        unique_together = ('loja_id_externo', 'ano', 'mes', 'regime')
+
+class AgregadoMensalDespesa(models.Model):
+    """Total mensal de despesas por categoria (já aplicadas as regras de rateio do DRE)."""
+    loja_id_externo = models.IntegerField()
+    ano = models.IntegerField()
+    mes = models.IntegerField()
+    regime = models.CharField(max_length=15, choices=PeriodoAgregadoDespesa.REGIME_CHOICES)
+    categoria = models.ForeignKey(CategoriaDespesa, on_delete=models.CASCADE, related_name='agregados_mensais')
+    grupo_contabil = models.CharField(max_length=50)
+
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    quantidade_lancamentos = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Agregado Mensal de Despesas"
+        verbose_name_plural = "Agregados Mensais de Despesas"
+        unique_together = ('loja_id_externo', 'ano', 'mes', 'regime', 'categoria', 'grupo_contabil')
+
+class VendaDiariaConsolidada(models.Model):
+    """
+    Total diário de vendas por (loja, dia, forma, bandeira) copiado do banco legado (vendas).
+    Mantido pelo comando `sincronizar_vendas`; forma/bandeira ficam como vêm do legado
+    e o mapeamento para o tipo de pagamento continua no VendasClientSQL.
+    """
+    loja_id_externo = models.IntegerField()
+    data = models.DateField(help_text="Data do caixa diário (vendas_caixadiario.data)")
+    forma = models.CharField(max_length=50, blank=True, default='')
+    bandeira = models.CharField(max_length=50, default='GERAL')
+    total = models.DecimalField(max_digits=15, decimal_places=2)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Venda Diária Consolidada"
+        verbose_name_plural = "Vendas Diárias Consolidadas"
+        unique_together = ('loja_id_externo', 'data', 'forma', 'bandeira')
+
+class SincronizacaoVendas(models.Model):
+    """Marca d'água (registro único) da sincronização incremental de VendaDiariaConsolidada."""
+    ultimo_caixa_id = models.BigIntegerField(default=0, help_text="Maior vendas_caixadiario.id já consolidado")
+    ultimo_estorno_id = models.BigIntegerField(default=0, help_text="Maior vendas_estorno.id já processado")
+    consolidado_ate = models.DateField(null=True, blank=True, help_text="Dias anteriores a esta data estão consolidados")
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sincronização de Vendas"
+        verbose_name_plural = "Sincronizações de Vendas"
+
+class VersaoCacheDRE(models.Model):
+    """
+    Versões que compõem a chave do DRE em cache (global, da loja e do período; ver
+    app/services/dre_cache.py). Ficam no banco para valer em todos os workers: o conteúdo do
+    cache é local a cada processo, mas a troca de versão feita por uma escrita é vista por todos.
+    """
+    chave = models.CharField(max_length=80, unique=True)
+    versao = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Versão do Cache de DRE"
+        verbose_name_plural = "Versões do Cache de DRE"
+
+class PermissaoLojaUsuario(models.Model):
+    """
+    Espelho local das permissões de loja do banco de vendas (grupo, gestor, perfil, conferência),
+    já resolvidas para o papel de maior prioridade por (usuário, loja).
+    """
+    user_id_externo = models.IntegerField()
+    loja_id_externo = models.IntegerField()
+    loja_nome = models.CharField(max_length=255)
+    role = models.CharField(max_length=20)
+
+    class Meta:
+        verbose_name = "Permissão de Loja"
+        verbose_name_plural = "Permissões de Loja"
+        unique_together = ('user_id_externo', 'loja_id_externo')
+
+class SincronizacaoPermissoesUsuario(models.Model):
+    """Momento da última leitura das permissões do usuário no banco de vendas (controla o TTL)."""
+    user_id_externo = models.IntegerField(unique=True)
+    sincronizado_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Sincronização de Permissões"
+        verbose_name_plural = "Sincronizações de Permissões"
+
 class AuditoriaLog(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     acao = models.CharField(max_length=100)
@@ -0,0 +1,215 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from financeiro_core.app.models.entidades import (
+    AgregadoMensalDespesa,
+    PeriodoAgregadoDespesa,
+    ContaPagar,
+    RateioDespesa,
+)
+from financeiro_core.app.services.dre_agregacao import AgregadorDespesasDRE
+
+REGIME_CAIXA = 'CAIXA'
+REGIME_COMPETENCIA = 'COMPETENCIA'
+
+# Campo de data que define o mês de cada regime
+CAMPOS_REGIME = {
+    REGIME_CAIXA: 'data_transacao',
+    REGIME_COMPETENCIA: 'data_competencia',
+}
+
+_CAMPOS_QUALIDADE = (
+    'quantidade_despesas_consideradas',
+    'quantidade_despesas_sem_rateio',
+    'quantidade_despesas_com_rateio_valido',
+    'quantidade_despesas_com_rateio_invalido',
+    'valor_despesas_com_rateio_invalido',
+    'valor_total_despesas_consideradas',
+)
+
+# (loja_id, mes, ano, regime)
+Periodo = Tuple[int, int, int, str]
+
+
+def periodos_da_despesa(loja_id: Optional[int], data_transacao: Optional[date], data_competencia: Optional[date]) -> Set[Periodo]:
+    """Períodos (nos dois regimes) em que uma despesa com essas datas é contabilizada."""
+    periodos = set()
+    if loja_id is None:
+        return periodos
+    for regime, data in ((REGIME_CAIXA, data_transacao), (REGIME_COMPETENCIA, data_competencia)):
+        if data is not None:
+            periodos.add((loja_id, data.month, data.year, regime))
+    return periodos
+
+
+def periodos_de_despesas(despesas: Iterable[ContaPagar]) -> Set[Periodo]:
+    periodos = set()
+    for despesa in despesas:
+        periodos |= periodos_da_despesa(despesa.loja_id_externo, despesa.data_transacao, despesa.data_competencia)
+    return periodos
+
+
+def periodos_da_categoria_em_rateios(categoria_id: int) -> Set[Periodo]:
+    """Períodos das despesas cujos splits apontam para a categoria (usado antes de excluí-la)."""
+    linhas = RateioDespesa.objects.filter(categoria_id=categoria_id).values_list(
+        'despesa__loja_id_externo', 'despesa__data_transacao', 'despesa__data_competencia'
+    ).distinct()
+    periodos = set()
+    for linha in linhas:
+        periodos |= periodos_da_despesa(*linha)
+    return periodos
+
+
+def periodos_existentes(loja_id: Optional[int] = None) -> Set[Periodo]:
+    """
+    Todos os períodos com despesas lançadas (nos dois regimes) mais os já materializados,
+    para que meses que ficaram vazios também sejam revistos.
+    """
+    despesas = ContaPagar.objects.order_by()
+    materializados = PeriodoAgregadoDespesa.objects.order_by()
+    if loja_id is not None:
+        despesas = despesas.filter(loja_id_externo=loja_id)
+        materializados = materializados.filter(loja_id_externo=loja_id)
+
+    periodos = set(materializados.values_list('loja_id_externo', 'mes', 'ano', 'regime'))
+    for regime, campo in CAMPOS_REGIME.items():
+        linhas = despesas.filter(**{f'{campo}__isnull': False}).annotate(
+            _mes=ExtractMonth(campo), _ano=ExtractYear(campo)
+        ).values_list('loja_id_externo', '_mes', '_ano').distinct()
+        periodos.update((loja, mes, ano, regime) for loja, mes, ano in linhas)
+    return periodos
+
+
+@transaction.atomic
+def recalcular_periodo(loja_id: int, mes: int, ano: int, regime: str = REGIME_CAIXA) -> Dict[str, Any]:
+    """
+    Recalcula o agregado de um período a partir das despesas e substitui as linhas gravadas.
+
+    O custo é proporcional às despesas do período alterado (não do histórico), e a
+    operação roda na mesma transação da escrita que a disparou.
+
+    A linha de PeriodoAgregadoDespesa do período é bloqueada (SELECT ... FOR UPDATE) antes da
+    agregação e fica presa até o commit: escritas concorrentes no mesmo período recalculam uma
+    depois da outra, e a segunda, já em READ COMMITTED, enxerga as despesas da primeira.
+    """
+    chave = {'loja_id_externo': loja_id, 'ano': ano, 'mes': mes, 'regime': regime}
+    periodo, _ = PeriodoAgregadoDespesa.objects.select_for_update().get_or_create(**chave)
+
+    agregado = AgregadorDespesasDRE(CAMPOS_REGIME[regime]).agregar(loja_id, mes, ano)
+
+    AgregadoMensalDespesa.objects.filter(**chave).delete()
+    AgregadoMensalDespesa.objects.bulk_create([
+        AgregadoMensalDespesa(
+            categoria_id=cat_id,
+            grupo_contabil=grupo,
+            total=dados['total'],
+            quantidade_lancamentos=dados['quantidade_lancamentos'],
+            **chave
+        )
+        for (grupo, cat_id), dados in agregado['categorias'].items()
+    ])
+
+    qualidade = agregado['qualidade']
+    for campo in _CAMPOS_QUALIDADE:
+        setattr(periodo, campo, qualidade[campo])
+    periodo.valor_splits_rateio_invalido = agregado['valor_splits_rateio_invalido']
+    periodo.save()
+    return agregado
+
+
+def recalcular_periodos(periodos: Iterable[Periodo]):
+    # Ordem fixa: escritas concorrentes bloqueiam os períodos na mesma sequência (sem deadlock)
+    for loja_id, mes, ano, regime in sorted(periodos):
+        recalcular_periodo(loja_id, mes, ano, regime)
+
+
+def sincronizar_grupo_categoria(categoria_id: int, grupo_contabil: str):
+    """O grupo é derivado da categoria, então a troca de grupo não exige recálculo."""
+    AgregadoMensalDespesa.objects.filter(categoria_id=categoria_id).exclude(
+        grupo_contabil=grupo_contabil
+    ).update(grupo_contabil=grupo_contabil)
+
+
+def ler_periodo(loja_id: int, mes: int, ano: int, regime: str = REGIME_CAIXA) -> Optional[Dict[str, Any]]:
+    """
+    Lê o agregado materializado no mesmo formato de AgregadorDespesasDRE.agregar().
+    Retorna None se o período ainda não foi materializado.
+    """
+    periodo = PeriodoAgregadoDespesa.objects.filter(
+        loja_id_externo=loja_id, ano=ano, mes=mes, regime=regime
+    ).first()
+    if periodo is None:
+        return None
+
+    grupos_totais: Dict[str, Decimal] = {}
+    categorias: Dict[tuple, Dict[str, Any]] = {}
+    linhas = AgregadoMensalDespesa.objects.filter(
+        loja_id_externo=loja_id, ano=ano, mes=mes, regime=regime
+    ).values_list('grupo_contabil', 'categoria_id', 'categoria__nome', 'total', 'quantidade_lancamentos')
+
+    for grupo, cat_id, cat_nome, total, quantidade in linhas:
+        grupos_totais[grupo] = grupos_totais.get(grupo, Decimal('0.00')) + total
+        categorias[(grupo, cat_id)] = {
+            "categoria_nome": cat_nome,
+            "total": total,
+            "quantidade_lancamentos": quantidade,
+        }
+
+    qualidade = {campo: getattr(periodo, campo) for campo in _CAMPOS_QUALIDADE}
+    qualidade["possui_rateios_invalidos"] = periodo.quantidade_despesas_com_rateio_invalido > 0
+
+    return {
+        "grupos_totais": grupos_totais,
+        "categorias": categorias,
+        "qualidade": qualidade,
+        "valor_splits_rateio_invalido": periodo.valor_splits_rateio_invalido,
+    }
+
+
+def divergencias_periodo(loja_id: int, mes: int, ano: int, regime: str = REGIME_CAIXA) -> list:
+    """Compara o agregado gravado com um recálculo completo e descreve as diferenças."""
+    gravado = ler_periodo(loja_id, mes, ano, regime)
+    if gravado is None:
+        return ['período não materializado']
+
+    esperado = AgregadorDespesasDRE(CAMPOS_REGIME[regime]).agregar(loja_id, mes, ano)
+    divergencias = []
+
+    for chave in sorted(set(gravado['categorias']) | set(esperado['categorias']), key=str):
+        atual = gravado['categorias'].get(chave, {})
+        correto = esperado['categorias'].get(chave, {})
+        for campo in ('total', 'quantidade_lancamentos'):
+            if atual.get(campo) != correto.get(campo):
+                divergencias.append(f'{chave} {campo}: gravado={atual.get(campo)} esperado={correto.get(campo)}')
+
+    for campo, valor in esperado['qualidade'].items():
+        if gravado['qualidade'][campo] != valor:
+            divergencias.append(f'qualidade.{campo}: gravado={gravado["qualidade"][campo]} esperado={valor}')
+
+    if gravado['valor_splits_rateio_invalido'] != esperado['valor_splits_rateio_invalido']:
+        divergencias.append(
+            f'valor_splits_rateio_invalido: gravado={gravado["valor_splits_rateio_invalido"]} '
+            f'esperado={esperado["valor_splits_rateio_invalido"]}'
+        )
+    return divergencias
+
+
+class AgregadorDespesasMaterializado(AgregadorDespesasDRE):
+    """
+    Lê os totais do DRE da tabela de agregados (O(categorias)) quando o período
+    está materializado; caso contrário recorre às consultas agrupadas sobre as despesas.
+    """
+
+    def __init__(self, regime: str = REGIME_CAIXA):
+        super().__init__(CAMPOS_REGIME[regime])
+        self.regime = regime
+
+    def agregar(self, loja_id: int, mes: int, ano: int) -> Dict[str, Any]:
+        materializado = ler_periodo(loja_id, mes, ano, self.regime)
+        if materializado is not None:
+            return materializado
+        return super().agregar(loja_id, mes, ano)
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Q
+
+from financeiro_core.app.models.entidades import ContaBancaria, ContaPagar
+from financeiro_core.app.services import periodos_fechados
+from financeiro_core.domain.conciliacao import (
+    DespesaConciliavelDTO,
+    LancamentoExtratoDTO,
+    MotorConciliacao,
+)
+
+
+def conciliar_despesas(
+    loja_id: int,
+    transacoes: Iterable[dict],
+    tolerancia_dias: int = 3,
+    conta: Optional[ContaBancaria] = None,
+) -> Dict[str, Any]:
+    """
+    Concilia os débitos do extrato (formato de OfxParserService.iterar_transacoes) com as
+    despesas ainda não pagas da loja na janela de datas do extrato (uma consulta).
+
+    Com `conta`, as despesas casadas recebem data_pagamento = data do débito e conta_origem = conta
+    (bulk_update; esses campos não entram no DRE nem nos agregados mensais), exceto as de
+    competência em mês fechado da loja, que não podem ser editadas.
+    Retorna pares (índice da linha no extrato, fitid, despesa_id, diferenca_dias, similaridade),
+    os índices das linhas sem par, os ids das despesas da janela sem par e os ids das despesas
+    casadas que estão em mês fechado (em_periodo_fechado; nunca baixadas).
+    """
+    lancamentos = [
+        LancamentoExtratoDTO(chave=(indice, t.get('fitid')), data=t['data_transacao'], valor=t['valor'], descricao=t['descricao_original'])
+        for indice, t in enumerate(transacoes)
+        if t['tipo'] == 'SAIDA'
+    ]
+    if not lancamentos:
+        return {"pares": [], "lancamentos_sem_par": [], "despesas_sem_par": [], "em_periodo_fechado": []}
+
+    inicio = min(l.data for l in lancamentos) - timedelta(days=tolerancia_dias)
+    fim = max(l.data for l in lancamentos) + timedelta(days=tolerancia_dias)
+    # Sem data_transacao, a saída é esperada na competência
+    candidatas = ContaPagar.objects.filter(
+        Q(data_transacao__range=(inicio, fim)) | Q(data_transacao__isnull=True, data_competencia__range=(inicio, fim)),
+        loja_id_externo=loja_id,
+        data_pagamento__isnull=True,
+    ).values_list('id', 'descricao', 'valor_liquido', 'data_transacao', 'data_competencia')
+    despesas, competencias = [], {}
+    for pk, descricao, valor, data_transacao, data_competencia in candidatas:
+        despesas.append(DespesaConciliavelDTO(id=pk, data=data_transacao or data_competencia, valor=valor, descricao=descricao))
+        competencias[pk] = data_competencia
+
+    resultado = MotorConciliacao(tolerancia_dias).conciliar(lancamentos, despesas)
+
+    fechadas = periodos_fechados.datas_fechadas(loja_id, {competencias[par.despesa.id] for par in resultado.pares})
+    abertos = [par for par in resultado.pares if competencias[par.despesa.id] not in fechadas]
+
+    if conta is not None and abertos:
+        pagas = [
+            ContaPagar(id=par.despesa.id, data_pagamento=par.lancamento.data, conta_origem=conta)
+            for par in abertos
+        ]
+        with transaction.atomic():
+            ContaPagar.objects.bulk_update(pagas, ['data_pagamento', 'conta_origem'], batch_size=1000)
+
+    return {
+        "pares": [
+            {
+                "indice": par.lancamento.chave[0],
+                "fitid": par.lancamento.chave[1],
+                "despesa_id": par.despesa.id,
+                "diferenca_dias": par.diferenca_dias,
+                "similaridade": round(par.similaridade, 3),
+            }
+            for par in resultado.pares
+        ],
+        "lancamentos_sem_par": [l.chave[0] for l in resultado.lancamentos_sem_par],
+        "despesas_sem_par": [d.id for d in resultado.despesas_sem_par],
+        "em_periodo_fechado": [par.despesa.id for par in resultado.pares if competencias[par.despesa.id] in fechadas],
+    }
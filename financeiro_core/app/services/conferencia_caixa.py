@@ -0,0 +1,97 @@
+"""
+Conferência diária de caixa: dinheiro vendido (banco de vendas, por caixa) x dinheiro recolhido
+dos caixas físicos da loja no razão local (MovimentacaoCaixa nas contas CAIXA_FISICO).
+
+Recolhido no dia = sangrias (SAIDA) + depósitos (TRANSFERENCIA_SAIDA) - reforços de troco
+(TRANSFERENCIA_ENTRADA). Uma consulta agrupada em cada banco para todas as lojas do mês;
+o cruzamento por (loja, dia) é em memória.
+"""
+from datetime import datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import MovimentacaoCaixa
+from financeiro_core.app.services.periodos import intervalo_mensal
+from financeiro_core.infrastructure.vendas_client import VendasClientSQL
+
+STATUS_OK = 'OK'
+STATUS_DIVERGENTE = 'DIVERGENTE'
+STATUS_SEM_REGISTRO = 'SEM_REGISTRO'  # Houve venda em dinheiro e nada foi recolhido
+STATUS_SEM_VENDA = 'SEM_VENDA'        # Recolhimento sem venda em dinheiro no dia
+
+_ZERO = Decimal('0.00')
+
+
+def movimentos_caixa_fisico(lojas: List[int], inicio, fim) -> Dict[tuple, Dict[str, Decimal]]:
+    """{(loja_id, dia): {"recolhido", "entradas"}} dos caixas físicos em [inicio, fim), em uma consulta."""
+    linhas = MovimentacaoCaixa.objects.filter(
+        conta__tipo='CAIXA_FISICO',
+        loja_id_externo__in=lojas,
+        data_ocorrencia__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+        data_ocorrencia__lt=timezone.make_aware(datetime.combine(fim, time.min)),
+    ).annotate(dia=TruncDate('data_ocorrencia')).values('loja_id_externo', 'dia').annotate(
+        retiradas=Sum('valor', filter=Q(tipo_movimentacao__in=['SAIDA', 'TRANSFERENCIA_SAIDA'])),
+        reforcos=Sum('valor', filter=Q(tipo_movimentacao='TRANSFERENCIA_ENTRADA')),
+        entradas=Sum('valor', filter=Q(tipo_movimentacao='ENTRADA')),
+    ).order_by()
+
+    return {
+        (linha['loja_id_externo'], linha['dia']): {
+            "recolhido": (linha['retiradas'] or _ZERO) - (linha['reforcos'] or _ZERO),
+            "entradas": linha['entradas'] or _ZERO,
+        }
+        for linha in linhas
+    }
+
+
+def conferir_caixas(
+    lojas: Iterable[int],
+    mes: int,
+    ano: int,
+    client=None,
+    tolerancia: Decimal = _ZERO,
+) -> List[Dict[str, Any]]:
+    """
+    Uma linha por (loja, dia) com venda em dinheiro ou movimento de caixa físico no mês,
+    ordenadas por loja e dia. `diferenca` = recolhido - vendido; acima da `tolerancia`, DIVERGENTE.
+    """
+    lojas = sorted(set(lojas))
+    if not lojas:
+        return []
+    inicio, fim = intervalo_mensal(mes, ano)
+    client = client or VendasClientSQL()
+
+    vendido = client.get_dinheiro_por_caixa(lojas, inicio, fim)
+    razao = movimentos_caixa_fisico(lojas, inicio, fim)
+
+    relatorio = []
+    for loja_id, dia in sorted(set(vendido) | set(razao)):
+        caixas = vendido.get((loja_id, dia), {})
+        movimentos = razao.get((loja_id, dia), {"recolhido": _ZERO, "entradas": _ZERO})
+        total_vendido = sum(caixas.values(), _ZERO)
+        diferenca = movimentos["recolhido"] - total_vendido
+
+        if (loja_id, dia) not in razao:
+            status = STATUS_SEM_REGISTRO
+        elif not caixas:
+            status = STATUS_SEM_VENDA
+        elif abs(diferenca) > tolerancia:
+            status = STATUS_DIVERGENTE
+        else:
+            status = STATUS_OK
+
+        relatorio.append({
+            "loja_id": loja_id,
+            "data": dia,
+            "dinheiro_vendido": total_vendido,
+            "caixas": [{"caixa_id": caixa_id, "total": total} for caixa_id, total in sorted(caixas.items())],
+            "recolhido": movimentos["recolhido"],
+            "entradas": movimentos["entradas"],
+            "diferenca": diferenca,
+            "status": status,
+        })
+    return relatorio
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import ContaPagar, RateioDespesa
+from financeiro_core.app.services.periodos import intervalo_mensal
+
+# Janela (em dias, a partir de hoje) das despesas "vencendo na semana"
+DIAS_VENCENDO = 7
+
+_ZERO = Value(Decimal('0.00'), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+def _valor_efetivo():
+    """Soma dos splits quando a despesa tem rateio (mesmo inválido); senão o valor líquido."""
+    soma_splits = RateioDespesa.objects.filter(despesa=OuterRef('pk')).order_by().values('despesa').annotate(
+        soma=Sum('valor')
+    ).values('soma')
+    return Coalesce(Subquery(soma_splits), F('valor_liquido'), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+def resumo_despesas(loja_id: int, mes: int, ano: int, hoje: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Totais do painel em uma única consulta agregada.
+
+    - Mês (regime de caixa, por data_transacao): total, pago, em atraso e previsto.
+    - Pendências da loja (data_pagamento vazia), independentes do mês escolhido:
+      atrasadas (data_transacao < hoje) e vencendo em até DIAS_VENCENDO dias.
+
+    O filtro combina o intervalo do mês (índice loja + data_transacao) com as pendências até
+    o fim da janela (índice parcial de despesas sem pagamento).
+    """
+    hoje = hoje or timezone.localdate()
+    inicio, fim = intervalo_mensal(mes, ano)
+    limite_semana = hoje + timedelta(days=DIAS_VENCENDO)
+
+    no_mes = Q(data_transacao__gte=inicio, data_transacao__lt=fim)
+    pendente = Q(data_pagamento__isnull=True)
+    atrasada = pendente & Q(data_transacao__lt=hoje)
+    vencendo = pendente & Q(data_transacao__gte=hoje, data_transacao__lte=limite_semana)
+
+    resultado = ContaPagar.objects.filter(
+        no_mes | (pendente & Q(data_transacao__lte=limite_semana)),
+        loja_id_externo=loja_id,
+    ).annotate(valor_efetivo=_valor_efetivo()).aggregate(
+        quantidade_mes=Count('id', filter=no_mes),
+        total_mes=Coalesce(Sum('valor_efetivo', filter=no_mes), _ZERO),
+        pago_mes=Coalesce(Sum('valor_efetivo', filter=no_mes & Q(data_pagamento__isnull=False)), _ZERO),
+        atrasado_mes=Coalesce(Sum('valor_efetivo', filter=no_mes & atrasada), _ZERO),
+        despesas_atrasadas=Count('id', filter=atrasada),
+        valor_atrasado=Coalesce(Sum('valor_efetivo', filter=atrasada), _ZERO),
+        despesas_vencendo_semana=Count('id', filter=vencendo),
+    )
+    resultado['previsto_mes'] = resultado['total_mes'] - resultado['pago_mes'] - resultado['atrasado_mes']
+    return resultado
@@ -0,0 +1,98 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.db import transaction
+
+from financeiro_core.app.models.entidades import (
+    CategoriaDespesa,
+    ContaPagar,
+    Fornecedor,
+    RateioDespesa,
+)
+from financeiro_core.app.services import agregados_mensais, dre_cache, periodos_fechados, sugestao_categorias
+
+# Itens aceitos por chamada de /despesas/bulk
+LIMITE_ITENS_LOTE = 1000
+
+
+def _validar_item(item, categorias: set, fornecedores: set, competencias_fechadas: set) -> Optional[str]:
+    if item.categoria_id not in categorias:
+        return f"Categoria de Despesa com ID {item.categoria_id} não encontrada."
+    if item.fornecedor_id and item.fornecedor_id not in fornecedores:
+        return f"Fornecedor com ID {item.fornecedor_id} não encontrado."
+    for rateio in item.rateios:
+        if rateio.categoria_id and rateio.categoria_id not in categorias:
+            return f"Categoria do rateio '{rateio.descricao}' (ID {rateio.categoria_id}) não encontrada."
+    if item.data_competencia in competencias_fechadas:
+        return f"Não é possível lançar despesa em mês fechado ({item.data_competencia.strftime('%m/%Y')})."
+    return None
+
+
+def criar_despesas_em_lote(
+    loja_id: int, itens: Sequence[Any], criado_por_id: Optional[int] = None
+) -> Tuple[List[Dict[str, int]], List[Dict[str, Any]]]:
+    """
+    Cria várias despesas (objetos com os campos de DespesaIn) com número fixo de consultas.
+
+    Categorias e fornecedores são resolvidos em uma consulta cada e os meses fechados vêm do
+    registro de períodos (periodos_fechados); os itens válidos são gravados com bulk_create
+    (despesas e rateios) numa única transação. Itens inválidos não impedem os demais e voltam em `erros` com o índice na lista recebida;
+    os criados voltam em `criadas` como {"indice", "id"}.
+    """
+    ids_categorias = {item.categoria_id for item in itens}
+    ids_categorias |= {r.categoria_id for item in itens for r in item.rateios if r.categoria_id}
+    ids_fornecedores = {item.fornecedor_id for item in itens if item.fornecedor_id}
+
+    categorias = set(CategoriaDespesa.objects.filter(id__in=ids_categorias).values_list('id', flat=True))
+    fornecedores = set(Fornecedor.objects.filter(id__in=ids_fornecedores).values_list('id', flat=True))
+    competencias_fechadas = periodos_fechados.datas_fechadas(loja_id, {item.data_competencia for item in itens})
+
+    indices, validos, erros = [], [], []
+    for indice, item in enumerate(itens):
+        erro = _validar_item(item, categorias, fornecedores, competencias_fechadas)
+        if erro:
+            erros.append({"indice": indice, "erro": erro})
+        else:
+            indices.append(indice)
+            validos.append(item)
+
+    # bulk_create não chama save(): o valor líquido é calculado aqui (sem desconto/acréscimo na entrada)
+    despesas = [
+        ContaPagar(
+            descricao=item.descricao,
+            loja_id_externo=loja_id,
+            categoria_id=item.categoria_id,
+            fornecedor_id=item.fornecedor_id or None,
+            valor_bruto=item.valor,
+            valor_desconto=Decimal('0.00'),
+            valor_acrescimo=Decimal('0.00'),
+            valor_liquido=item.valor,
+            data_competencia=item.data_competencia,
+            data_transacao=item.data_transacao,
+            criado_por_id=criado_por_id,
+        )
+        for item in validos
+    ]
+
+    with transaction.atomic():
+        ContaPagar.objects.bulk_create(despesas, batch_size=500)
+        RateioDespesa.objects.bulk_create([
+            RateioDespesa(
+                despesa=despesa,
+                descricao=rateio.descricao,
+                valor=rateio.valor,
+                categoria_id=rateio.categoria_id or item.categoria_id,
+            )
+            for despesa, item in zip(despesas, validos)
+            for rateio in item.rateios
+        ], batch_size=1000)
+        agregados_mensais.recalcular_periodos(agregados_mensais.periodos_de_despesas(despesas))
+
+    # bulk_create não dispara os signals que invalidam o DRE em cache e atualizam as sugestões
+    for data in {despesa.data_transacao for despesa in despesas}:
+        dre_cache.invalidar_data(loja_id, data)
+    for despesa in despesas:
+        sugestao_categorias.registrar_despesa(loja_id, despesa.descricao, despesa.categoria_id)
+
+    criadas = [{"indice": indice, "id": despesa.id} for indice, despesa in zip(indices, despesas)]
+    return criadas, erros
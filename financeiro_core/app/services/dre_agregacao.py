@@ -0,0 +1,221 @@
+from decimal import Decimal
+from typing import Dict, Any, List
+
+from django.db.models import Case, When, Value, F, Sum, Count, OuterRef, Subquery, DecimalField, CharField
+from django.db.models.functions import Abs, Coalesce
+
+from financeiro_core.app.models.entidades import ContaPagar, RateioDespesa
+from financeiro_core.app.services.periodos import filtro_mensal
+
+# Classificação de cada despesa quanto ao rateio (mesmas regras do DRE)
+SEM_RATEIO = 'SEM_RATEIO'
+RATEIO_VALIDO = 'RATEIO_VALIDO'
+RATEIO_INVALIDO = 'RATEIO_INVALIDO'
+
+# Diferença máxima aceita entre a soma dos splits e o valor líquido da despesa
+TOLERANCIA_RATEIO = Decimal('0.01')
+
+_VALOR_FIELD = DecimalField(max_digits=15, decimal_places=2)
+
+
+class AgregadorDespesasDRE:
+    """
+    Motor de agregação das despesas do DRE executado no banco de dados.
+
+    Substitui o laço em Python por consultas agrupadas:
+    - Consulta 1: despesas agrupadas por (classificação do rateio, categoria),
+      de onde saem os totais das despesas sem rateio / com rateio inválido
+      e todos os indicadores de `qualidade_dados`.
+    - Consulta 2: splits das despesas com rateio válido agrupados pela
+      categoria efetiva (categoria do split ou, na falta, a da despesa).
+
+    Os lançamentos analíticos só são lidos quando solicitados.
+
+    `campo_data` define o regime: data_transacao (caixa, usado no DRE) ou
+    data_competencia (competência).
+    """
+
+    def __init__(self, campo_data: str = 'data_transacao'):
+        self.campo_data = campo_data
+
+    def _filtro_periodo(self, loja_id: int, mes: int, ano: int, prefixo: str = '') -> Dict[str, Any]:
+        return {
+            f'{prefixo}loja_id_externo': loja_id,
+            **filtro_mensal(f'{prefixo}{self.campo_data}', mes, ano),
+        }
+
+    def _despesas_classificadas(self, loja_id: int, mes: int, ano: int):
+        soma_rateios = RateioDespesa.objects.filter(
+            despesa=OuterRef('pk')
+        ).order_by().values('despesa').annotate(soma=Sum('valor')).values('soma')
+
+        return ContaPagar.objects.filter(
+            **self._filtro_periodo(loja_id, mes, ano)
+        ).order_by().annotate(
+            soma_rateios=Subquery(soma_rateios, output_field=_VALOR_FIELD)
+        ).annotate(
+            diferenca_rateio=Abs(F('soma_rateios') - F('valor_liquido'), output_field=_VALOR_FIELD)
+        ).annotate(
+            classificacao=Case(
+                When(soma_rateios__isnull=True, then=Value(SEM_RATEIO)),
+                When(diferenca_rateio__lte=TOLERANCIA_RATEIO, then=Value(RATEIO_VALIDO)),
+                default=Value(RATEIO_INVALIDO),
+                output_field=CharField(),
+            )
+        )
+
+    def _rateios_validos(self, loja_id: int, mes: int, ano: int):
+        soma_irmaos = RateioDespesa.objects.filter(
+            despesa=OuterRef('despesa')
+        ).order_by().values('despesa').annotate(soma=Sum('valor')).values('soma')
+
+        return RateioDespesa.objects.filter(
+            **self._filtro_periodo(loja_id, mes, ano, prefixo='despesa__')
+        ).order_by().annotate(
+            soma_rateios=Subquery(soma_irmaos, output_field=_VALOR_FIELD)
+        ).annotate(
+            diferenca_rateio=Abs(F('soma_rateios') - F('despesa__valor_liquido'), output_field=_VALOR_FIELD)
+        ).filter(
+            diferenca_rateio__lte=TOLERANCIA_RATEIO
+        ).annotate(
+            # Fallback seguro para categoria: split sem categoria herda a da despesa
+            cat_id=Coalesce('categoria_id', 'despesa__categoria_id'),
+            cat_nome=Coalesce('categoria__nome', 'despesa__categoria__nome'),
+            cat_grupo=Coalesce('categoria__grupo_contabil', 'despesa__categoria__grupo_contabil'),
+        )
+
+    def agregar(self, loja_id: int, mes: int, ano: int) -> Dict[str, Any]:
+        """
+        Retorna os totais por grupo contábil, por categoria e os indicadores de qualidade.
+
+        Estrutura:
+        {
+            "grupos_totais": {grupo: Decimal},
+            "categorias": {(grupo, categoria_id): {"categoria_nome", "total", "quantidade_lancamentos"}},
+            "qualidade": {...},  # mesmas chaves de `qualidade_dados` do contrato
+            "valor_splits_rateio_invalido": Decimal  # soma dos splits das despesas com rateio inválido
+        }
+        """
+        grupos_totais: Dict[str, Decimal] = {}
+        categorias: Dict[tuple, Dict[str, Any]] = {}
+
+        def acumular(grupo, cat_id, cat_nome, total, quantidade):
+            grupos_totais[grupo] = grupos_totais.get(grupo, Decimal('0.00')) + total
+            chave = (grupo, cat_id)
+            if chave not in categorias:
+                categorias[chave] = {"categoria_nome": cat_nome, "total": Decimal('0.00'), "quantidade_lancamentos": 0}
+            categorias[chave]["total"] += total
+            categorias[chave]["quantidade_lancamentos"] += quantidade
+
+        qtd_consideradas = 0
+        qtd_sem_rateio = 0
+        qtd_rateio_valido = 0
+        qtd_rateio_invalido = 0
+        valor_rateio_invalido = Decimal('0.00')
+        valor_total_consideradas = Decimal('0.00')
+        valor_splits_invalidos = Decimal('0.00')
+
+        # Consulta 1: despesas agrupadas por classificação e categoria
+        linhas_despesas = self._despesas_classificadas(loja_id, mes, ano).values(
+            'classificacao', 'categoria_id', 'categoria__nome', 'categoria__grupo_contabil'
+        ).annotate(quantidade=Count('id'), total=Sum('valor_liquido'), total_splits=Sum('soma_rateios'))
+
+        for linha in linhas_despesas:
+            quantidade = linha['quantidade']
+            total = linha['total'] or Decimal('0.00')
+
+            qtd_consideradas += quantidade
+            valor_total_consideradas += total
+
+            if linha['classificacao'] == RATEIO_VALIDO:
+                # Regra B: o valor entra pelos splits (consulta 2)
+                qtd_rateio_valido += quantidade
+                continue
+
+            if linha['classificacao'] == SEM_RATEIO:
+                # Regra A: Sem splits
+                qtd_sem_rateio += quantidade
+            else:
+                # Regra D: Splits Inválidos
+                qtd_rateio_invalido += quantidade
+                valor_rateio_invalido += total
+                valor_splits_invalidos += linha['total_splits'] or Decimal('0.00')
+
+            acumular(
+                linha['categoria__grupo_contabil'], linha['categoria_id'], linha['categoria__nome'],
+                total, quantidade
+            )
+
+        # Consulta 2: splits válidos agrupados pela categoria efetiva
+        if qtd_rateio_valido:
+            linhas_rateios = self._rateios_validos(loja_id, mes, ano).values(
+                'cat_id', 'cat_nome', 'cat_grupo'
+            ).annotate(quantidade=Count('id'), total=Sum('valor'))
+
+            for linha in linhas_rateios:
+                acumular(
+                    linha['cat_grupo'], linha['cat_id'], linha['cat_nome'],
+                    linha['total'] or Decimal('0.00'), linha['quantidade']
+                )
+
+        return {
+            "grupos_totais": grupos_totais,
+            "categorias": categorias,
+            "qualidade": {
+                "quantidade_despesas_consideradas": qtd_consideradas,
+                "quantidade_despesas_sem_rateio": qtd_sem_rateio,
+                "quantidade_despesas_com_rateio_valido": qtd_rateio_valido,
+                "quantidade_despesas_com_rateio_invalido": qtd_rateio_invalido,
+                "valor_despesas_com_rateio_invalido": valor_rateio_invalido,
+                "valor_total_despesas_consideradas": valor_total_consideradas,
+                "possui_rateios_invalidos": qtd_rateio_invalido > 0
+            },
+            "valor_splits_rateio_invalido": valor_splits_invalidos
+        }
+
+    def listar_lancamentos(self, loja_id: int, mes: int, ano: int) -> Dict[tuple, List[Dict[str, Any]]]:
+        """
+        Monta a lista analítica de lançamentos indexada por (grupo, categoria_id).
+        Lê apenas as colunas usadas no contrato (projeção via values()).
+        """
+        lancamentos: Dict[tuple, List[Dict[str, Any]]] = {}
+
+        despesas = self._despesas_classificadas(loja_id, mes, ano).exclude(
+            classificacao=RATEIO_VALIDO
+        ).values(
+            'id', 'classificacao', 'data_transacao', 'descricao', 'valor_liquido',
+            'categoria_id', 'categoria__grupo_contabil', 'fornecedor__razao_social'
+        ).order_by('id')
+
+        for d in despesas:
+            descricao = d['descricao']
+            if d['classificacao'] == RATEIO_INVALIDO:
+                descricao = f"[RATEIO INVÁLIDO] {descricao}"
+
+            lancamentos.setdefault((d['categoria__grupo_contabil'], d['categoria_id']), []).append({
+                "despesa_id": d['id'],
+                "rateio_id": None,
+                "tipo_origem": "DESPESA",
+                "data_transacao": str(d['data_transacao']),
+                "descricao": descricao,
+                "fornecedor_nome": d['fornecedor__razao_social'],
+                "valor": d['valor_liquido']
+            })
+
+        rateios = self._rateios_validos(loja_id, mes, ano).values(
+            'id', 'despesa_id', 'descricao', 'valor', 'cat_id', 'cat_grupo',
+            'despesa__data_transacao', 'despesa__descricao', 'despesa__fornecedor__razao_social'
+        ).order_by('despesa_id', 'id')
+
+        for r in rateios:
+            lancamentos.setdefault((r['cat_grupo'], r['cat_id']), []).append({
+                "despesa_id": r['despesa_id'],
+                "rateio_id": r['id'],
+                "tipo_origem": "RATEIO",
+                "data_transacao": str(r['despesa__data_transacao']),
+                "descricao": r['descricao'] or r['despesa__descricao'],
+                "fornecedor_nome": r['despesa__fornecedor__razao_social'],
+                "valor": r['valor']
+            })
+
+        return lancamentos
@@ -0,0 +1,170 @@
+import time
+from datetime import date
+from functools import partial
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import VersaoCacheDRE
+from financeiro_core.app.services import dre_snapshot
+
+REGIME_CAIXA = 'CAIXA'
+
+_PREFIXO = 'dre'
+_CHAVE_VERSAO_GLOBAL = f'{_PREFIXO}:v:global'
+
+
+def _cache():
+    return caches[getattr(settings, 'DRE_CACHE_ALIAS', 'dre')]
+
+
+def _chave_versao_loja(loja_id: int) -> str:
+    return f'{_PREFIXO}:v:loja:{loja_id}'
+
+
+def _chave_versao_periodo(loja_id: int, mes: int, ano: int) -> str:
+    return f'{_PREFIXO}:v:periodo:{loja_id}:{ano}:{mes}'
+
+
+def _versoes(loja_id: int, mes: int, ano: int) -> str:
+    """
+    Lê (ou inicializa) as três versões que compõem a chave do DRE: global, da loja e do período.
+
+    As versões ficam no banco (VersaoCacheDRE), não no cache: o cache é local a cada worker,
+    e uma invalidação feita em um processo precisa mudar a chave lida por todos. Versões novas
+    começam no relógio em nanossegundos, para nunca repetir um valor já usado por uma entrada antiga.
+    """
+    chaves = [_CHAVE_VERSAO_GLOBAL, _chave_versao_loja(loja_id), _chave_versao_periodo(loja_id, mes, ano)]
+    atuais = dict(VersaoCacheDRE.objects.filter(chave__in=chaves).values_list('chave', 'versao'))
+
+    faltantes = [chave for chave in chaves if chave not in atuais]
+    if faltantes:
+        VersaoCacheDRE.objects.bulk_create(
+            [VersaoCacheDRE(chave=chave, versao=time.time_ns()) for chave in faltantes], ignore_conflicts=True
+        )
+        atuais = dict(VersaoCacheDRE.objects.filter(chave__in=chaves).values_list('chave', 'versao'))
+    return '.'.join(str(atuais[chave]) for chave in chaves)
+
+
+def _gravar_nova_versao(chave: str):
+    if not VersaoCacheDRE.objects.filter(chave=chave).update(versao=F('versao') + 1):
+        VersaoCacheDRE.objects.bulk_create(
+            [VersaoCacheDRE(chave=chave, versao=time.time_ns())],
+            update_conflicts=True, unique_fields=['chave'], update_fields=['versao'],
+        )
+
+
+def _renovar_versao(chave: str):
+    # Depois do commit da escrita: a linha da versão não fica bloqueada durante a transação
+    # (escritas concorrentes no mesmo mês não se enfileiram nela), e um DRE calculado antes
+    # do commit fica guardado sob a versão antiga, já inalcançável.
+    transaction.on_commit(partial(_gravar_nova_versao, chave))
+
+
+def invalidar_periodo(loja_id: int, mes: int, ano: int):
+    """Invalida o DRE de um mês específico da loja (ex: despesa criada/alterada)."""
+    _renovar_versao(_chave_versao_periodo(loja_id, mes, ano))
+
+
+def invalidar_data(loja_id: Optional[int], data: Optional[date]):
+    """Atalho para invalidar o mês que contém `data`. Ignora valores nulos."""
+    if loja_id is not None and data is not None:
+        invalidar_periodo(loja_id, data.month, data.year)
+
+
+def invalidar_loja(loja_id: int):
+    """Invalida todos os meses da loja (ex: alteração nas taxas de cartão)."""
+    _renovar_versao(_chave_versao_loja(loja_id))
+
+
+def invalidar_tudo():
+    """Invalida todos os DREs em cache (ex: categoria mudou de grupo contábil)."""
+    _renovar_versao(_CHAVE_VERSAO_GLOBAL)
+
+
+def _timeout(mes: int, ano: int) -> int:
+    # O faturamento do mês corrente continua mudando no banco de vendas,
+    # então ele expira bem antes dos meses já encerrados.
+    hoje = timezone.localdate()
+    if (ano, mes) >= (hoje.year, hoje.month):
+        return getattr(settings, 'DRE_CACHE_TIMEOUT_MES_ABERTO', 60)
+    return getattr(settings, 'DRE_CACHE_TIMEOUT', 300)
+
+
+def _sem_lancamentos(dre: Dict[str, Any]) -> Dict[str, Any]:
+    for grupo in dre.get('grupos_detalhados', []):
+        for categoria in grupo.get('categorias', []):
+            categoria['lancamentos'] = []
+    return dre
+
+
+def _chave_dre(loja_id: int, mes: int, ano: int) -> str:
+    return f'{_PREFIXO}:{loja_id}:{ano}:{mes}:{REGIME_CAIXA}:{_versoes(loja_id, mes, ano)}'
+
+
+def _gerar(loja_id: int, mes: int, ano: int, loja_nome: str, gerado_por: str, service) -> Dict[str, Any]:
+    if service is None:
+        from financeiro_core.app.services.dre_service import DREService
+        service = DREService()
+    return service.gerar(loja_id, mes, ano, loja_nome, gerado_por, incluir_lancamentos=True)
+
+
+def obter_dre(
+    loja_id: int,
+    mes: int,
+    ano: int,
+    loja_nome: str,
+    gerado_por: str,
+    incluir_lancamentos: bool = True,
+    service=None,
+) -> Dict[str, Any]:
+    """
+    Retorna o contrato do DRE usando o cache compartilhado entre JSON, PDF e XML.
+
+    Meses CONCLUIDO são servidos do snapshot do fechamento (sem acessar o banco de vendas).
+
+    A chave é (loja, mês, ano, regime) + versões; qualquer escrita que afete o período
+    renova a versão (no banco, vista por todos os workers) e torna a entrada anterior
+    inalcançável. O cache guarda sempre a versão com lançamentos; apenas os campos
+    dependentes da requisição em `identificacao` (gerado_em, gerado_por e loja_nome)
+    são reescritos a cada chamada.
+    """
+    dre = dre_snapshot.obter_dre_fechado(loja_id, mes, ano)
+    if dre is not None:
+        return _identificar(dre, loja_nome, gerado_por, incluir_lancamentos)
+
+    cache = _cache()
+    chave = _chave_dre(loja_id, mes, ano)
+
+    dre = cache.get(chave)
+    if dre is None:
+        dre = _gerar(loja_id, mes, ano, loja_nome, gerado_por, service)
+        cache.set(chave, dre, _timeout(mes, ano))
+
+    return _identificar(dre, loja_nome, gerado_por, incluir_lancamentos)
+
+
+def recalcular_dre(loja_id: int, mes: int, ano: int, loja_nome: str, gerado_por: str, service=None) -> Dict[str, Any]:
+    """
+    Calcula o DRE sem ler o cache nem o snapshot (base do fechamento, que congela os totais)
+    e guarda o resultado para as leituras seguintes. A chave é lida antes do cálculo: se uma
+    escrita renovar a versão no meio dele, a entrada gravada já nasce inalcançável.
+    """
+    chave = _chave_dre(loja_id, mes, ano)
+    dre = _gerar(loja_id, mes, ano, loja_nome, gerado_por, service)
+    _cache().set(chave, dre, _timeout(mes, ano))
+    return _identificar(dre, loja_nome, gerado_por, True)
+
+
+def _identificar(dre: Dict[str, Any], loja_nome: str, gerado_por: str, incluir_lancamentos: bool) -> Dict[str, Any]:
+    dre['identificacao']['loja_nome'] = loja_nome
+    dre['identificacao']['gerado_por'] = gerado_por
+    dre['identificacao']['gerado_em'] = timezone.now().isoformat()
+
+    if not incluir_lancamentos:
+        dre = _sem_lancamentos(dre)
+    return dre
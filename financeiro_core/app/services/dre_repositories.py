@@ -1,38 +1,103 @@
 from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
 from financeiro_core.app.models.entidades import TaxaMaquininha, ContaPagar
 from financeiro_core.domain.services import IRepositorioTaxas, TaxaAplicavelDTO, IRepositorioDespesas
+from financeiro_core.app.services.periodos import filtro_mensal
 
-class DjangoRepositorioTaxas(IRepositorioTaxas):
-    def buscar_taxa(self, loja_id: int, tipo: str, bandeira: str, parcelas: int) -> TaxaAplicavelDTO | None:
-        qs = TaxaMaquininha.objects.filter(
-            perfil__loja_id_externo=loja_id,
-            perfil__ativo=True,
-            tipo=tipo,
-            parcela_inicial__lte=parcelas,
-            parcela_final__gte=parcelas
-        )
+BANDEIRA_GERAL = 'GERAL'
 
-        if bandeira:
-            qs_bandeira = qs.filter(bandeira__iexact=bandeira)
-            if qs_bandeira.exists():
-                taxa = qs_bandeira.first()
-                return TaxaAplicavelDTO(taxa.taxa_percentual, taxa.taxa_fixa)
+# v2: as linhas incluem dias_para_recebimento
+_CHAVE_CACHE_TAXAS = 'taxas:v2:loja:{}'
+
+
+def _chave_taxas(loja_id: int) -> str:
+    return _CHAVE_CACHE_TAXAS.format(loja_id)
+
+
+def invalidar_taxas_loja(loja_id: int):
+    """Descarta a matriz de taxas em cache da loja (ex: perfil ou taxa alterados)."""
+    cache.delete(_chave_taxas(loja_id))
+
+
+class MatrizTaxasLoja:
+    """
+    Índice em memória das taxas ativas de uma loja.
+
+    As linhas chegam ordenadas por id, reproduzindo o `.first()` das consultas antigas:
+    dentro de cada chave vence a primeira faixa de parcelas que contém a quantidade pedida.
+    """
+
+    def __init__(self, linhas):
+        # (tipo, BANDEIRA) -> [(parcela_inicial, parcela_final, percentual, fixo, dias_para_recebimento)]
+        self._especificas = {}
+        # tipo -> [...] apenas das linhas cadastradas exatamente como 'GERAL'
+        self._gerais = {}
 
-        qs_geral = qs.filter(bandeira='GERAL')
-        if qs_geral.exists():
-            taxa = qs_geral.first()
-            return TaxaAplicavelDTO(taxa.taxa_percentual, taxa.taxa_fixa)
+        for tipo, bandeira, inicial, final, percentual, fixo, dias in linhas:
+            faixa = (inicial, final, percentual, fixo, dias)
+            self._especificas.setdefault((tipo, bandeira.upper()), []).append(faixa)
+            if bandeira == BANDEIRA_GERAL:
+                self._gerais.setdefault(tipo, []).append(faixa)
 
+    @staticmethod
+    def _na_faixa(faixas, parcelas: int) -> TaxaAplicavelDTO | None:
+        for inicial, final, percentual, fixo, dias in faixas:
+            if inicial <= parcelas <= final:
+                return TaxaAplicavelDTO(percentual, fixo, dias)
         return None
 
+    def buscar(self, tipo: str, bandeira: str, parcelas: int) -> TaxaAplicavelDTO | None:
+        if bandeira:
+            taxa = self._na_faixa(self._especificas.get((tipo, bandeira.upper()), ()), parcelas)
+            if taxa:
+                return taxa
+        return self._na_faixa(self._gerais.get(tipo, ()), parcelas)
+
+
+class DjangoRepositorioTaxas(IRepositorioTaxas):
+    """
+    Repositório de taxas baseado na matriz pré-carregada da loja.
+
+    Uma única consulta traz todas as taxas ativas da loja; o resultado fica em cache
+    entre requisições (invalidado pelos signals de PerfilTaxaCartao/TaxaMaquininha)
+    e memorizado na instância durante o cálculo de um DRE.
+    """
+
+    def __init__(self):
+        self._matrizes = {}
+
+    def _carregar_linhas(self, loja_id: int):
+        return list(
+            TaxaMaquininha.objects.filter(
+                perfil__loja_id_externo=loja_id,
+                perfil__ativo=True
+            ).order_by('id').values_list(
+                'tipo', 'bandeira', 'parcela_inicial', 'parcela_final', 'taxa_percentual', 'taxa_fixa',
+                'dias_para_recebimento'
+            )
+        )
+
+    def matriz(self, loja_id: int) -> MatrizTaxasLoja:
+        if loja_id not in self._matrizes:
+            chave = _chave_taxas(loja_id)
+            linhas = cache.get(chave)
+            if linhas is None:
+                linhas = self._carregar_linhas(loja_id)
+                cache.set(chave, linhas, getattr(settings, 'TAXAS_CACHE_TIMEOUT', 600))
+            self._matrizes[loja_id] = MatrizTaxasLoja(linhas)
+        return self._matrizes[loja_id]
+
+    def buscar_taxa(self, loja_id: int, tipo: str, bandeira: str, parcelas: int) -> TaxaAplicavelDTO | None:
+        return self.matriz(loja_id).buscar(tipo, bandeira, parcelas)
+
 class DjangoRepositorioDespesas(IRepositorioDespesas):
     """Soma despesas para o fechamento."""
     def somar_despesas_competencia(self, loja_id, mes, ano):
         from django.db.models import Sum
         val = ContaPagar.objects.filter(
             loja_id_externo=loja_id,
-            data_transacao__month=mes,
-            data_transacao__year=ano
+            **filtro_mensal('data_transacao', mes, ano)
         ).aggregate(Sum('valor_liquido'))['valor_liquido__sum']
         return val or Decimal('0.00')
 
@@ -40,8 +105,7 @@ class DjangoRepositorioDespesas(IRepositorioDespesas):
         from django.db.models import Sum
         qs = ContaPagar.objects.filter(
             loja_id_externo=loja_id,
-            data_competencia__month=mes,
-            data_transacao__year=ano
+            **filtro_mensal('data_competencia', mes, ano)
         ).values('categoria__grupo_contabil').annotate(total=Sum('valor_liquido'))
 
         return {item['categoria__grupo_contabil']: item['total'] for item in qs if item['categoria__grupo_contabil']}
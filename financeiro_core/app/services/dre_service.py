@@ -1,19 +1,50 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import datetime
+from datetime import date, datetime
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
 # Imports das regras de domínio e infraestrutura existentes
 from financeiro_core.domain.services import CalculadoraFinanceira
 from financeiro_core.infrastructure.vendas_client import VendasClientSQL, VendasAPIClientMock
 from financeiro_core.app.services.dre_repositories import DjangoRepositorioTaxas
-from financeiro_core.app.models.entidades import ContaPagar
+from financeiro_core.app.services.agregados_mensais import AgregadorDespesasMaterializado
+from financeiro_core.app.services.periodos import intervalo_mensal
+
+_executor_vendas = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor() -> ThreadPoolExecutor:
+    """Pool compartilhado pelo processo para as consultas ao banco de vendas."""
+    global _executor_vendas
+    with _executor_lock:
+        if _executor_vendas is None:
+            _executor_vendas = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'DRE_VENDAS_MAX_WORKERS', 4),
+                thread_name_prefix='dre-vendas'
+            )
+    return _executor_vendas
+
+
+def _executar_no_worker(funcao, *args):
+    try:
+        return funcao(*args)
+    finally:
+        # As conexões do Django são por thread: o worker encerra as suas como ao fim de uma requisição
+        # (fecha se CONN_MAX_AGE expirou ou se a conexão ficou inutilizável por erro).
+        close_old_connections()
+
 
 class DREService:
-    def __init__(self, vendas_client=None, repositorio_taxas=None):
+    def __init__(self, vendas_client=None, repositorio_taxas=None, agregador_despesas=None):
         self.vendas_client = vendas_client or VendasClientSQL()
 
         self.repositorio_taxas = repositorio_taxas or DjangoRepositorioTaxas()
+        self.agregador_despesas = agregador_despesas or AgregadorDespesasMaterializado()
 
     @staticmethod
     def _round(val: Decimal) -> Decimal:
@@ -21,19 +52,104 @@ class DREService:
             return Decimal('0.00')
         return Decimal(str(val)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-    def gerar(self, loja_id: int, mes: int, ano: int, loja_nome: str, gerado_por: str) -> Dict[str, Any]:
+    def gerar(self, loja_id: int, mes: int, ano: int, loja_nome: str, gerado_por: str, incluir_lancamentos: bool = False) -> Dict[str, Any]:
         """
         Gera a estrutura consolidada do DRE sem nenhum efeito colateral.
         - Filtra estritamente por regime de caixa (data_transacao)
         - Distribui despesas aplicando a regra de splits (rateio válido/inválido)
         - Aplica taxas de cartão separadamente.
+        - Os lançamentos analíticos só são carregados se `incluir_lancamentos` for True.
+        - O faturamento (banco de vendas) é buscado em paralelo com as despesas (banco financeiro).
         """
-        # 1. Consulta Vendas Base e Taxas de Cartão
+        # 1. Dispara a consulta de vendas em outra thread
+        futuro_vendas = self._disparar_vendas(self.vendas_client.get_faturamento_por_loja, loja_id, mes, ano)
+
+        # 2. Agregar Despesas com lógica de Splits (tabela de agregados ou consultas agrupadas)
+        try:
+            agregado, lancamentos = self._coletar_despesas(loja_id, mes, ano, incluir_lancamentos)
+        except BaseException:
+            if futuro_vendas is not None:
+                futuro_vendas.cancel()
+            raise
+
+        # 3. Vendas Base
+        dados_vendas_api = self._aguardar_vendas(
+            futuro_vendas, self.vendas_client.get_faturamento_por_loja, loja_id, mes, ano
+        )
+        return self._montar_contrato(loja_id, mes, ano, loja_nome, gerado_por, dados_vendas_api, agregado, lancamentos)
+
+    def gerar_periodos(
+        self,
+        loja_id: int,
+        periodos: Iterable[Tuple[int, int]],
+        loja_nome: str,
+        gerado_por: str,
+        incluir_lancamentos: bool = False
+    ) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """
+        Gera o DRE de vários meses (mes, ano) da loja com uma única consulta ao banco de vendas
+        (VendasClientSQL.get_faturamento_lote). Retorna {(mes, ano): contrato}.
+        """
+        periodos = sorted(set(periodos), key=lambda p: (p[1], p[0]))
+        if not periodos:
+            return {}
+
+        inicio = intervalo_mensal(*periodos[0])[0]
+        fim = intervalo_mensal(*periodos[-1])[1]
+        futuro_vendas = self._disparar_vendas(self.vendas_client.get_faturamento_lote, [loja_id], inicio, fim)
+
         try:
-            dados_vendas_api = self.vendas_client.get_faturamento_por_loja(loja_id, mes, ano)
+            despesas = {
+                (mes, ano): self._coletar_despesas(loja_id, mes, ano, incluir_lancamentos)
+                for mes, ano in periodos
+            }
+        except BaseException:
+            if futuro_vendas is not None:
+                futuro_vendas.cancel()
+            raise
+
+        faturamento = self._aguardar_vendas(
+            futuro_vendas, self.vendas_client.get_faturamento_lote, [loja_id], inicio, fim
+        )
+
+        contratos = {}
+        for (mes, ano), (agregado, lancamentos) in despesas.items():
+            dados_vendas_api = faturamento.get((loja_id, date(ano, mes, 1)), [])
+            contratos[(mes, ano)] = self._montar_contrato(
+                loja_id, mes, ano, loja_nome, gerado_por, dados_vendas_api, agregado, lancamentos
+            )
+        return contratos
+
+    def _disparar_vendas(self, funcao, *args) -> Optional[Future]:
+        """Submete a consulta ao banco de vendas ao pool (DRE_VENDAS_PARALELO=False desliga)."""
+        if getattr(settings, 'DRE_VENDAS_PARALELO', True):
+            return _obter_executor().submit(_executar_no_worker, funcao, *args)
+        return None
+
+    def _aguardar_vendas(self, futuro: Optional[Future], funcao, *args):
+        try:
+            if futuro is not None:
+                return futuro.result()
+            return funcao(*args)
         except Exception as e:
-            raise Exception(f"Falha ao obter faturamento. O banco de vendas está indisponível. Detalhe: {str(e)}")
+            raise Exception(f"Falha ao obter faturamento. O banco de vendas está indisponível. Detalhe: {str(e)}") from e
+
+    def _coletar_despesas(self, loja_id: int, mes: int, ano: int, incluir_lancamentos: bool):
+        agregado = self.agregador_despesas.agregar(loja_id, mes, ano)
+
+        # Lista analítica (grupo, categoria_id) -> lancamentos[], montada apenas sob demanda
+        lancamentos = self.agregador_despesas.listar_lancamentos(loja_id, mes, ano) if incluir_lancamentos else {}
 
+        # Pré-carrega a matriz de taxas enquanto as vendas ainda estão em consulta
+        if hasattr(self.repositorio_taxas, 'matriz'):
+            self.repositorio_taxas.matriz(loja_id)
+        return agregado, lancamentos
+
+    def _montar_contrato(
+        self, loja_id: int, mes: int, ano: int, loja_nome: str, gerado_por: str,
+        dados_vendas_api, agregado: Dict[str, Any], lancamentos
+    ) -> Dict[str, Any]:
+        # Taxas de Cartão
         vendas = CalculadoraFinanceira.calcular_liquido_vendas(
             dados_vendas_api, self.repositorio_taxas, loja_id
         )
@@ -41,14 +157,6 @@ class DREService:
         faturamento_bruto = vendas['total_bruto']
         taxas_cartao = vendas['total_taxas']
 
-        # 2. Obter e Processar Despesas com lógica de Splits
-        despesas_qs = ContaPagar.objects.filter(
-            loja_id_externo=loja_id,
-            data_transacao__month=mes,
-            data_transacao__year=ano,
-            data_transacao__isnull=False
-        ).select_related('categoria', 'fornecedor').prefetch_related('splits', 'splits__categoria')
-
         grupos_totais = {
             'IMPOSTOS': Decimal('0.00'),
             'CUSTOS': Decimal('0.00'),
@@ -57,102 +165,9 @@ class DREService:
             'MARKETING': Decimal('0.00'),
             'FINANCEIRA': Decimal('0.00'),
         }
+        grupos_totais.update(agregado['grupos_totais'])
 
-        # Dicionário aninhado: grupo -> categoria_id -> lancamentos[]
-        estrutura_analitica = {}
-
-        qtd_consideradas = 0
-        qtd_sem_rateio = 0
-        qtd_rateio_valido = 0
-        qtd_rateio_invalido = 0
-        valor_rateio_invalido = Decimal('0.00')
-        valor_total_consideradas = Decimal('0.00')
-
-        for despesa in despesas_qs:
-            valor_liq = despesa.valor_liquido
-            splits = list(despesa.splits.all())
-
-            qtd_consideradas += 1
-            valor_total_consideradas += valor_liq
-
-            if not splits:
-                # Regra A: Sem splits
-                qtd_sem_rateio += 1
-                grupo = despesa.categoria.grupo_contabil
-                cat_id = despesa.categoria.id
-                cat_nome = despesa.categoria.nome
-
-                grupos_totais[grupo] = grupos_totais.get(grupo, Decimal('0.00')) + valor_liq
-
-                self._adicionar_lancamento(
-                    estrutura_analitica, grupo, cat_id, cat_nome,
-                    {
-                        "despesa_id": despesa.id,
-                        "rateio_id": None,
-                        "tipo_origem": "DESPESA",
-                        "data_transacao": str(despesa.data_transacao),
-                        "descricao": despesa.descricao,
-                        "fornecedor_nome": despesa.fornecedor.razao_social if despesa.fornecedor else None,
-                        "valor": valor_liq
-                    },
-                    valor_liq
-                )
-            else:
-                soma_splits = sum([s.valor for s in splits])
-
-                if abs(soma_splits - valor_liq) <= Decimal('0.01'):
-                    # Regra B: Splits Válidos
-                    qtd_rateio_valido += 1
-                    for split in splits:
-                        v_split = split.valor
-
-                        # Fallback seguro para categoria
-                        cat = split.categoria if split.categoria else despesa.categoria
-                        grupo = cat.grupo_contabil
-                        cat_id = cat.id
-                        cat_nome = cat.nome
-
-                        grupos_totais[grupo] = grupos_totais.get(grupo, Decimal('0.00')) + v_split
-
-                        self._adicionar_lancamento(
-                            estrutura_analitica, grupo, cat_id, cat_nome,
-                            {
-                                "despesa_id": despesa.id,
-                                "rateio_id": split.id,
-                                "tipo_origem": "RATEIO",
-                                "data_transacao": str(despesa.data_transacao),
-                                "descricao": split.descricao or despesa.descricao,
-                                "fornecedor_nome": despesa.fornecedor.razao_social if despesa.fornecedor else None,
-                                "valor": v_split
-                            },
-                            v_split
-                        )
-                else:
-                    # Regra D: Splits Inválidos
-                    qtd_rateio_invalido += 1
-                    valor_rateio_invalido += valor_liq
-
-                    grupo = despesa.categoria.grupo_contabil
-                    cat_id = despesa.categoria.id
-                    cat_nome = despesa.categoria.nome
-
-                    grupos_totais[grupo] = grupos_totais.get(grupo, Decimal('0.00')) + valor_liq
-
-                    self._adicionar_lancamento(
-                        estrutura_analitica, grupo, cat_id, cat_nome,
-                        {
-                            "despesa_id": despesa.id,
-                            "rateio_id": None,
-                            "tipo_origem": "DESPESA",
-                            "data_transacao": str(despesa.data_transacao),
-                            "descricao": f"[RATEIO INVÁLIDO] {despesa.descricao}",
-                            "fornecedor_nome": despesa.fornecedor.razao_social if despesa.fornecedor else None,
-                            "valor": valor_liq
-                        },
-                        valor_liq
-                    )
-
-        # 3. Cascata DRE
+        # Cascata DRE
         impostos = grupos_totais.get('IMPOSTOS', Decimal('0.00'))
         receita_liquida = faturamento_bruto - impostos
 
@@ -233,56 +248,35 @@ class DREService:
                 {"codigo": "13", "descricao": "Total de Despesas Financeiras", "tipo": "TOTAL", "nivel": 1, "ordem": 13, "valor": despesas_financeiras_total, "percentual_receita": calc_perc(despesas_financeiras_total)},
                 {"codigo": "14", "descricao": "Resultado Líquido do Exercício", "tipo": "TOTAL", "nivel": 0, "ordem": 14, "valor": lucro_liquido, "percentual_receita": calc_perc(lucro_liquido)}
             ],
-            "grupos_detalhados": self._formatar_grupos_detalhados(estrutura_analitica, calc_perc),
-            "qualidade_dados": {
-                "quantidade_despesas_consideradas": qtd_consideradas,
-                "quantidade_despesas_sem_rateio": qtd_sem_rateio,
-                "quantidade_despesas_com_rateio_valido": qtd_rateio_valido,
-                "quantidade_despesas_com_rateio_invalido": qtd_rateio_invalido,
-                "valor_despesas_com_rateio_invalido": valor_rateio_invalido,
-                "valor_total_despesas_consideradas": valor_total_consideradas,
-                "possui_rateios_invalidos": qtd_rateio_invalido > 0
-            }
+            "grupos_detalhados": self._formatar_grupos_detalhados(agregado['categorias'], lancamentos, calc_perc),
+            "qualidade_dados": agregado['qualidade']
         }
         return contrato
 
-    def _adicionar_lancamento(self, estrutura, grupo, cat_id, cat_nome, lancamento, valor):
-        if grupo not in estrutura:
-            estrutura[grupo] = {"descricao": self._obter_nome_grupo(grupo), "categorias": {}}
+    def _formatar_grupos_detalhados(self, categorias, lancamentos, calc_perc_func):
+        estrutura = {}
+        for (grupo, cat_id), cat_data in categorias.items():
+            if grupo not in estrutura:
+                estrutura[grupo] = {"descricao": self._obter_nome_grupo(grupo), "categorias": []}
 
-        if cat_id not in estrutura[grupo]["categorias"]:
-            estrutura[grupo]["categorias"][cat_id] = {
+            estrutura[grupo]["categorias"].append({
                 "categoria_id": cat_id,
-                "categoria_nome": cat_nome,
-                "lancamentos": [],
-                "total": Decimal('0.00')
-            }
-
-        estrutura[grupo]["categorias"][cat_id]["lancamentos"].append(lancamento)
-        estrutura[grupo]["categorias"][cat_id]["total"] += valor
+                "categoria_nome": cat_data["categoria_nome"],
+                "total": cat_data["total"],
+                "quantidade_lancamentos": cat_data["quantidade_lancamentos"],
+                "lancamentos": sorted(lancamentos.get((grupo, cat_id), []), key=lambda x: x["data_transacao"])
+            })
 
-    def _formatar_grupos_detalhados(self, estrutura, calc_perc_func):
         retorno = []
         for grupo, data in estrutura.items():
-            categorias_list = []
-            grupo_total = Decimal('0.00')
-
-            for cat_id, cat_data in data["categorias"].items():
-                grupo_total += cat_data["total"]
-                categorias_list.append({
-                    "categoria_id": cat_data["categoria_id"],
-                    "categoria_nome": cat_data["categoria_nome"],
-                    "total": cat_data["total"],
-                    "quantidade_lancamentos": len(cat_data["lancamentos"]),
-                    "lancamentos": sorted(cat_data["lancamentos"], key=lambda x: x["data_transacao"])
-                })
+            grupo_total = sum((c["total"] for c in data["categorias"]), Decimal('0.00'))
 
             retorno.append({
                 "grupo_contabil": grupo,
                 "descricao": data["descricao"],
                 "total": grupo_total,
                 "percentual_receita": calc_perc_func(grupo_total),
-                "categorias": sorted(categorias_list, key=lambda x: x["categoria_nome"])
+                "categorias": sorted(data["categorias"], key=lambda x: x["categoria_nome"])
             })
 
         # Ordenar os grupos pela ordem contábil clássica para a listagem analítica
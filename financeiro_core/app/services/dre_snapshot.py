@@ -0,0 +1,105 @@
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Optional
+
+from financeiro_core.app.models.entidades import FechamentoMensal
+
+# Versão do formato gravado em FechamentoMensal.dados_auditoria_snapshot.
+# v1: contrato do DRE sem o campo `versao_schema` (valores Decimal serializados como texto)
+# v2: contrato do DRE com `versao_schema` e lançamentos analíticos
+VERSAO_SCHEMA = 2
+
+_CAMPOS_VALOR_QUALIDADE = ('valor_despesas_com_rateio_invalido', 'valor_total_despesas_consideradas')
+
+
+def _decimal(valor):
+    if isinstance(valor, str):
+        try:
+            return Decimal(valor)
+        except InvalidOperation:
+            return valor
+    if isinstance(valor, float):
+        return Decimal(str(valor))
+    return valor
+
+
+def _restaurar_decimais(dre: Dict[str, Any]) -> Dict[str, Any]:
+    """O JSONField grava Decimal como texto; devolve os valores ao tipo do contrato gerado ao vivo."""
+    dre['resumo'] = {campo: _decimal(valor) for campo, valor in dre.get('resumo', {}).items()}
+
+    for linha in dre.get('linhas', []):
+        linha['valor'] = _decimal(linha.get('valor'))
+        linha['percentual_receita'] = _decimal(linha.get('percentual_receita'))
+
+    for grupo in dre.get('grupos_detalhados', []):
+        grupo['total'] = _decimal(grupo.get('total'))
+        grupo['percentual_receita'] = _decimal(grupo.get('percentual_receita'))
+        for categoria in grupo.get('categorias', []):
+            categoria['total'] = _decimal(categoria.get('total'))
+            for lancamento in categoria.get('lancamentos', []):
+                lancamento['valor'] = _decimal(lancamento.get('valor'))
+
+    qualidade = dre.get('qualidade_dados', {})
+    for campo in _CAMPOS_VALOR_QUALIDADE:
+        if campo in qualidade:
+            qualidade[campo] = _decimal(qualidade[campo])
+    return dre
+
+
+def _v1_para_v2(dre: Dict[str, Any]) -> Dict[str, Any]:
+    dre.setdefault('qualidade_dados', {})
+    for grupo in dre.get('grupos_detalhados', []):
+        for categoria in grupo.get('categorias', []):
+            categoria.setdefault('lancamentos', [])
+    return dre
+
+
+# versão de origem -> função que leva o snapshot à versão seguinte
+_ATUALIZACOES = {
+    1: _v1_para_v2,
+}
+
+
+def _versao(snapshot: Dict[str, Any]) -> Optional[int]:
+    if 'versao_schema' in snapshot:
+        return snapshot['versao_schema']
+    if 'resumo' in snapshot and 'identificacao' in snapshot:
+        return 1
+    # Formato do ProcessadorFechamento (chave "dre" com floats): não é um contrato do DRE
+    return None
+
+
+def preparar_snapshot(dre: Dict[str, Any]) -> Dict[str, Any]:
+    """Marca o contrato com a versão atual antes de gravá-lo no fechamento."""
+    return {**dre, 'versao_schema': VERSAO_SCHEMA}
+
+
+def carregar_snapshot(snapshot: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Converte o snapshot gravado no contrato do DRE, atualizando versões antigas em memória
+    (nada é regravado numa leitura). Retorna None se o formato não puder ser atualizado.
+    """
+    if not isinstance(snapshot, dict):
+        return None
+
+    versao = _versao(snapshot)
+    if versao is None or versao > VERSAO_SCHEMA:
+        return None
+
+    while versao < VERSAO_SCHEMA:
+        snapshot = _ATUALIZACOES[versao](snapshot)
+        versao += 1
+
+    # A versão é metadado do armazenamento; o contrato servido é o mesmo do cálculo ao vivo
+    snapshot.pop('versao_schema', None)
+    return _restaurar_decimais(snapshot)
+
+
+def obter_dre_fechado(loja_id: int, mes: int, ano: int) -> Optional[Dict[str, Any]]:
+    """
+    DRE congelado de um mês CONCLUIDO, lido do snapshot em uma única consulta ao banco financeiro.
+    Retorna None se o mês não está concluído ou se o snapshot não é aproveitável.
+    """
+    snapshot = FechamentoMensal.objects.filter(
+        loja_id_externo=loja_id, mes=mes, ano=ano, status='CONCLUIDO'
+    ).values_list('dados_auditoria_snapshot', flat=True).first()
+    return carregar_snapshot(snapshot)
@@ -0,0 +1,119 @@
+"""
+Importação idempotente de extratos (OFX) como MovimentacaoCaixa de uma conta.
+
+Cada linha recebe uma chave_importacao, única por conta (índice único no banco): o FITID do banco
+ou, na falta dele, um hash do conteúdo + a ordem da linha entre as idênticas do mesmo arquivo.
+As linhas já importadas são filtradas com uma consulta por lote, as novas entram com bulk_create e
+o saldo da conta recebe um único incremento líquido; reimportar o mesmo extrato não altera nada.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import ContaBancaria, MovimentacaoCaixa
+from financeiro_core.app.services import periodos_fechados, saldos, sugestao_categorias
+
+# Linhas por consulta de duplicadas / bulk_create
+TAMANHO_LOTE = 2000
+
+_TAMANHO_CHAVE = MovimentacaoCaixa._meta.get_field('chave_importacao').max_length
+
+
+def _chaves(transacoes: Iterable[dict]) -> Iterator[tuple]:
+    """Gera (chave_importacao, transação) na ordem do arquivo."""
+    ocorrencias: Dict[str, int] = defaultdict(int)
+    for transacao in transacoes:
+        fitid = (transacao.get('fitid') or '').strip()
+        if fitid:
+            chave = f"fitid:{fitid}"
+            if len(chave) > _TAMANHO_CHAVE:
+                chave = "fitid#" + hashlib.sha256(fitid.encode()).hexdigest()
+        else:
+            conteudo = "|".join(str(transacao[campo]) for campo in ('data_transacao', 'tipo', 'valor', 'descricao_original'))
+            ocorrencias[conteudo] += 1
+            chave = "hash:" + hashlib.sha256(f"{conteudo}|{ocorrencias[conteudo]}".encode()).hexdigest()
+        yield chave, transacao
+
+
+def _lotes(iteravel, tamanho: int) -> Iterator[list]:
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+def importar_extrato(
+    conta: ContaBancaria,
+    transacoes: Iterable[dict],
+    criado_por_id: Optional[int] = None,
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> Dict[str, int]:
+    """
+    Grava as transações (formato de OfxParserService.iterar_transacoes) ainda não importadas na conta.
+
+    As saídas recebem a categoria sugerida pelo histórico da loja. Linhas em meses fechados da loja
+    não são gravadas. Tudo roda numa transação, com a conta bloqueada (SELECT ... FOR UPDATE) para
+    que importações simultâneas do mesmo extrato não dupliquem linhas.
+    Retorna {"importadas", "ja_importadas", "em_periodo_fechado"}.
+    """
+    resultado = {"importadas": 0, "ja_importadas": 0, "em_periodo_fechado": 0}
+    deltas: Dict[date, Decimal] = defaultdict(Decimal)
+    loja_id = conta.loja_id_externo
+
+    with transaction.atomic():
+        ContaBancaria.objects.select_for_update().filter(pk=conta.pk).first()
+
+        for lote in _lotes(_chaves(transacoes), tamanho_lote):
+            # Uma linha por chave (o banco pode repetir FITID dentro do arquivo)
+            novas = dict(lote)
+            existentes = set(MovimentacaoCaixa.objects.filter(
+                conta=conta, chave_importacao__in=list(novas)
+            ).values_list('chave_importacao', flat=True))
+            resultado["ja_importadas"] += len(lote) - len(novas) + len(existentes)
+
+            fechadas = periodos_fechados.datas_fechadas(
+                loja_id, {t['data_transacao'] for chave, t in novas.items() if chave not in existentes}
+            )
+            pendentes: List[tuple] = []
+            for chave, transacao in novas.items():
+                if chave in existentes:
+                    continue
+                if transacao['data_transacao'] in fechadas:
+                    resultado["em_periodo_fechado"] += 1
+                    continue
+                pendentes.append((chave, transacao))
+
+            categorias = sugestao_categorias.sugerir_categorias(
+                loja_id, [t['descricao_original'] for _, t in pendentes if t['tipo'] == 'SAIDA']
+            )
+            categorias = iter(categorias)
+
+            movimentacoes = []
+            for chave, transacao in pendentes:
+                movimentacao = MovimentacaoCaixa(
+                    conta=conta,
+                    tipo_movimentacao=transacao['tipo'],
+                    descricao=transacao['descricao_original'][:255],
+                    valor=transacao['valor'],
+                    # O extrato traz só a data: meia-noite no fuso do projeto, como nas transferências
+                    data_ocorrencia=timezone.make_aware(datetime.combine(transacao['data_transacao'], time.min)),
+                    categoria_id=next(categorias) if transacao['tipo'] == 'SAIDA' else None,
+                    loja_id_externo=loja_id,
+                    criado_por_id=criado_por_id,
+                    chave_importacao=chave,
+                )
+                deltas[transacao['data_transacao']] += movimentacao.valor_com_sinal
+                movimentacoes.append(movimentacao)
+
+            MovimentacaoCaixa.objects.bulk_create(movimentacoes, batch_size=1000)
+            resultado["importadas"] += len(movimentacoes)
+
+        # bulk_create não dispara os signals de saldo: um incremento líquido para o lote inteiro
+        saldos.aplicar_deltas_por_dia(conta.pk, deltas)
+
+    return resultado
@@ -1,63 +1,210 @@
-from datetime import datetime
-from decimal import Decimal
+import codecs
+import html
+import io
 import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, Optional
 
-class OfxParserService:
-    @staticmethod
-    def parse(file_content: str) -> list[dict]:
-        """
-        Parses OFX/OFC file content and returns a list of transactions.
-        Each transaction has: data_transacao, descricao_original, valor, tipo (ENTRADA/SAIDA)
-        """
-        transactions = []
+# Leitura em blocos: a memória usada fica limitada ao bloco + um token, qualquer que seja o arquivo
+TAMANHO_BLOCO = 64 * 1024
+# O primeiro bloco precisa conter o cabeçalho inteiro para a detecção da codificação
+_TAMANHO_CABECALHO = 4096
+
+# Elementos lidos de cada <STMTTRN>
+_CAMPOS = frozenset({'DTPOSTED', 'TRNAMT', 'FITID', 'NAME', 'MEMO'})
+# Tags que encerram a transação aberta (no SGML os elementos não têm fechamento, mas os agregados têm)
+_FIM_TRANSACAO = frozenset({'STMTTRN', '/STMTTRN', '/BANKTRANLIST'})
+
+_RE_ENCODING_XML = re.compile(r'encoding\s*=\s*["\']([\w.:-]+)', re.IGNORECASE)
+_RE_ENCODING_SGML = re.compile(r'^\s*ENCODING\s*:\s*([\w-]+)', re.IGNORECASE | re.MULTILINE)
+_RE_CHARSET_SGML = re.compile(r'^\s*CHARSET\s*:\s*([\w-]+)', re.IGNORECASE | re.MULTILINE)
+
+
+def _codificacao(inicio: bytes) -> str:
+    """
+    Codificação declarada no cabeçalho: `encoding="..."` no OFX 2.x (XML) ou ENCODING/CHARSET
+    no OFX 1.x (SGML). Sem declaração utilizável, cp1252 (padrão dos bancos brasileiros).
+    """
+    if inicio.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    fim_cabecalho = inicio.upper().find(b'<OFX>')
+    cabecalho = inicio[:fim_cabecalho if fim_cabecalho >= 0 else None].decode('ascii', errors='ignore')
+
+    candidatos = []
+    xml = _RE_ENCODING_XML.search(cabecalho)
+    if xml:
+        candidatos.append(xml.group(1))
+    encoding = _RE_ENCODING_SGML.search(cabecalho)
+    if encoding and encoding.group(1).upper().replace('-', '') == 'UTF8':
+        candidatos.append('utf-8')
+    charset = _RE_CHARSET_SGML.search(cabecalho)
+    if charset:
+        # "CHARSET:1252" é a página de código do Windows
+        valor = charset.group(1)
+        candidatos.append(f'cp{valor}' if valor.isdigit() else valor)
 
-        stmtrs_blocks = re.split(r'<STMTTRN>', file_content, flags=re.IGNORECASE)
+    for nome in candidatos:
+        try:
+            return codecs.lookup(nome).name
+        except LookupError:
+            continue
+    return 'cp1252'
 
-        for block in stmtrs_blocks[1:]:
-            try:
-                # Find date (DTPOSTED)
-                dt_match = re.search(r'<DTPOSTED>\s*(\d{8})', block, flags=re.IGNORECASE)
-                if not dt_match:
-                    continue
-                date_str = dt_match.group(1)
-                dt = datetime.strptime(date_str, "%Y%m%d").date()
 
-                # Find amount (TRNAMT)
-                amt_match = re.search(r'<TRNAMT>\s*([-\d\.]+)', block, flags=re.IGNORECASE)
-                if not amt_match:
-                    continue
-                amt = Decimal(amt_match.group(1))
+def _blocos_de_texto(fonte, tamanho_bloco: int) -> Iterator[str]:
+    """Texto da fonte (str, bytes ou arquivo binário/texto) em blocos de até `tamanho_bloco`."""
+    if isinstance(fonte, str):
+        for inicio in range(0, len(fonte), tamanho_bloco):
+            yield fonte[inicio:inicio + tamanho_bloco]
+        return
+    if isinstance(fonte, (bytes, bytearray, memoryview)):
+        fonte = io.BytesIO(fonte)
 
-                # Find description (MEMO or NAME)
-                desc_match = re.search(r'<MEMO>\s*(.*?)(?:\r?\n|<|$)', block, flags=re.IGNORECASE)
-                desc = desc_match.group(2).strip() if desc_match else "Sem descrição"
+    bloco = fonte.read(max(tamanho_bloco, _TAMANHO_CABECALHO))
+    if isinstance(bloco, str):
+        while bloco:
+            yield bloco
+            bloco = fonte.read(tamanho_bloco)
+        return
 
-                tipo = "SAIDA" if amt < 0 else "ENTRADA"
+    decodificador = codecs.getincrementaldecoder(_codificacao(bloco))(errors='replace')
+    while bloco:
+        texto = decodificador.decode(bloco)
+        if texto:
+            yield texto
+        bloco = fonte.read(tamanho_bloco)
+    resto = decodificador.decode(b'', final=True)
+    if resto:
+        yield resto
 
-                transactions.append({
-                    "data_transacao": dt,
-                    "descricao_original": desc,
-                    "valor": abs(amt),
-                    "tipo": tipo
-                })
 
-            except Exception as e:
-                continue
+def _tags(blocos: Iterator[str]) -> Iterator[tuple]:
+    """
+    Tokenizador incremental: gera (TAG, texto até a próxima tag) para cada tag encontrada.
+    Serve para SGML (<NAME>valor) e XML (<NAME>valor</NAME>); o texto fora de tags é ignorado.
+    Só tags cujo texto já terminou (seguidas de "<") saem de cada bloco; o resto fica pendente.
+    """
+    pendente = ''
+    for bloco in blocos:
+        pendente += bloco
+        pos = 0
+        while True:
+            inicio = pendente.find('<', pos)
+            if inicio < 0:
+                pos = len(pendente)
+                break
+            fim = pendente.find('>', inicio)
+            proxima = pendente.find('<', fim) if fim >= 0 else -1
+            if proxima < 0:
+                pos = inicio
+                break
+            yield pendente[inicio + 1:fim].strip().upper(), pendente[fim + 1:proxima]
+            pos = proxima
+        pendente = pendente[pos:]
 
-        return transactions
+    fim = pendente.find('>')
+    if pendente.startswith('<') and fim >= 0:
+        yield pendente[1:fim].strip().upper(), pendente[fim + 1:]
+
+
+def _valor(texto: str) -> Decimal:
+    """
+    TRNAMT com ponto ou vírgula decimal ("-12.50", "-12,50", "1.234,56", "1,234.56").
+
+    O último separador é a marca decimal e o outro só pode agrupar milhares. Um único
+    separador seguido de exatamente três dígitos ("1,234") é ambíguo e gera ValueError.
+    """
+    texto = texto.strip()
+    posicao = max(texto.rfind('.'), texto.rfind(','))
+    if posicao < 0:
+        return Decimal(texto)
+
+    inteiro, fracao = texto[:posicao], texto[posicao + 1:]
+    milhar = ',' if texto[posicao] == '.' else '.'
+    if texto[posicao] in inteiro:
+        # O mesmo separador repetido ("1.234.567") só pode ser de milhar
+        inteiro, fracao, milhar = texto, '', texto[posicao]
+    elif milhar not in inteiro and len(fracao) == 3:
+        raise ValueError(f"Valor ambíguo: {texto!r}")
+
+    if milhar in inteiro:
+        if not re.fullmatch(r'[+-]?\d{1,3}(?:%s\d{3})+' % re.escape(milhar), inteiro):
+            raise ValueError(f"Separador de milhar inválido: {texto!r}")
+        inteiro = inteiro.replace(milhar, '')
+    return Decimal(f"{inteiro}.{fracao}" if fracao else inteiro)
+
+
+def _transacao(campos: dict) -> Optional[dict]:
+    dt = campos.get('DTPOSTED', '')
+    if len(dt) < 8 or not dt[:8].isdigit() or 'TRNAMT' not in campos:
+        return None
+    try:
+        data = date(int(dt[:4]), int(dt[4:6]), int(dt[6:8]))
+        valor = _valor(campos['TRNAMT'])
+    except (ValueError, InvalidOperation):
+        return None
+
+    return {
+        "data_transacao": data,
+        "descricao_original": campos.get('MEMO') or campos.get('NAME') or "Sem descrição",
+        "valor": abs(valor),
+        "tipo": "SAIDA" if valor < 0 else "ENTRADA",
+        "fitid": campos.get('FITID'),
+    }
+
+
+class OfxParserService:
+    @staticmethod
+    def iterar_transacoes(fonte, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[dict]:
+        """
+        Lê um arquivo OFX/OFC (SGML 1.x ou XML 2.x) de forma incremental e gera as transações.
+
+        `fonte` pode ser str, bytes ou um arquivo aberto (ex.: UploadedFile); bytes são
+        decodificados pela codificação declarada no cabeçalho. Cada transação tem:
+        data_transacao, descricao_original (MEMO, ou NAME), valor, tipo (ENTRADA/SAIDA) e fitid.
+        Transações sem data ou valor válidos são ignoradas.
+        """
+        campos = None  # elementos do <STMTTRN> aberto
+        for tag, texto in _tags(_blocos_de_texto(fonte, tamanho_bloco)):
+            if tag in _FIM_TRANSACAO:
+                if campos is not None:
+                    transacao = _transacao(campos)
+                    if transacao:
+                        yield transacao
+                campos = {} if tag == 'STMTTRN' else None
+            elif campos is not None and tag in _CAMPOS and tag not in campos:
+                texto = texto.strip()
+                if texto:
+                    campos[tag] = html.unescape(texto) if '&' in texto else texto
+
+        if campos is not None:
+            transacao = _transacao(campos)
+            if transacao:
+                yield transacao
+
+    @staticmethod
+    def parse(file_content) -> list[dict]:
+        """
+        Parses OFX/OFC file content and returns a list of transactions.
+        Each transaction has: data_transacao, descricao_original, valor, tipo (ENTRADA/SAIDA), fitid
+        """
+        return list(OfxParserService.iterar_transacoes(file_content))
 
     @staticmethod
     def adivinhar_categoria(descricao_original: str, loja_id: int) -> int | None:
         """
-        Searches recent ContaPagar entries for similar descriptions to guess the category.
+        Guesses the category from the store's expense history (see sugestao_categorias).
         """
-        from financeiro_core.models import ContaPagar
+        from financeiro_core.app.services import sugestao_categorias
 
-        words = [w for w in descricao_original.split() if len(w) > 3]
+        return sugestao_categorias.sugerir_categoria(loja_id, descricao_original)
 
-        for word in words:
-            recent_expenses = ContaPagar.objects.filter(loja_id_externo=loja_id, descricao__icontains=word).order_by('-id')[:10]
-            if recent_expenses.exists():
-                return recent_expenses.first().categoria_id
+    @staticmethod
+    def adivinhar_categorias(descricoes: list[str], loja_id: int) -> list[int | None]:
+        """
+        Same as adivinhar_categoria for a whole statement: one index load, in-memory lookups.
+        """
+        from financeiro_core.app.services import sugestao_categorias
 
-        return None
+        return sugestao_categorias.sugerir_categorias(loja_id, descricoes)
@@ -0,0 +1,71 @@
+import base64
+from datetime import date, datetime
+from typing import List, Optional, Tuple, Union
+
+from django.db.models import F, Q, QuerySet
+
+# Cursor opaco da paginação por chave (keyset): "<data ISO>|id" em base64 url-safe.
+# A data pode ser date ou datetime; vazia representa registros com a data nula,
+# que ficam no fim da listagem.
+
+
+def codificar_cursor(data: Optional[Union[date, datetime]], pk: int) -> str:
+    bruto = f"{data.isoformat() if data else ''}|{pk}"
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str, tipo=date) -> Tuple[Optional[Union[date, datetime]], int]:
+    """`tipo` é date ou datetime. Levanta ValueError se o cursor não foi gerado por codificar_cursor."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data, pk = bruto.split('|')
+        return (tipo.fromisoformat(data) if data else None), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def ordenacao_decrescente(campo_data: str) -> tuple:
+    """
+    Mais recentes primeiro, datas nulas no fim; o id desempata (chave única).
+    O índice que atende a listagem precisa ter exatamente essa ordem (DESC NULLS LAST, id DESC).
+    """
+    return (F(campo_data).desc(nulls_last=True), '-id')
+
+
+def faixas_apos_cursor_decrescente(campo_data: str, data: Optional[date], pk: int) -> List[Q]:
+    """
+    Registros que vêm depois de (data, pk) na ordenação de ordenacao_decrescente(), como faixas
+    contíguas do índice a consultar em sequência: as datas até `data` (o limite `<= data` é a
+    condição de índice; o desempate pelo id só descarta as linhas do próprio dia) e depois a
+    cauda de datas nulas. Um OR entre as faixas não vira intervalo de índice no Postgres.
+    """
+    if data is None:
+        return [Q(**{f'{campo_data}__isnull': True}, id__lt=pk)]
+    return [
+        Q(**{f'{campo_data}__lte': data}) & (Q(**{f'{campo_data}__lt': data}) | Q(id__lt=pk)),
+        Q(**{f'{campo_data}__isnull': True}),
+    ]
+
+
+def pagina_decrescente(qs: QuerySet, campo_data: str, limite: int, apos: Optional[Tuple[Optional[date], int]] = None) -> list:
+    """
+    Até `limite` linhas de `qs` (já com .values()/.only() se for o caso) na ordenação de
+    ordenacao_decrescente(), depois da posição `apos` = (data, pk). Cada consulta é uma
+    varredura de faixa do índice que para no LIMIT; a cauda de nulos só é lida se a faixa
+    das datas não completar a página.
+    """
+    faixas = [Q()] if apos is None else faixas_apos_cursor_decrescente(campo_data, *apos)
+    linhas = []
+    for faixa in faixas:
+        linhas += qs.filter(faixa).order_by(*ordenacao_decrescente(campo_data))[:limite - len(linhas)]
+        if len(linhas) >= limite:
+            break
+    return linhas
+
+
+def apos_cursor_crescente(campo: str, valor, pk: int) -> Q:
+    """
+    Registros depois de (valor, pk) na ordem crescente (campo, id); `campo` não nulo.
+    O limite `>= valor` vira condição de índice; o desempate pelo id só filtra o próprio valor.
+    """
+    return Q(**{f'{campo}__gte': valor}) & (Q(**{f'{campo}__gt': valor}) | Q(id__gt=pk))
@@ -0,0 +1,22 @@
+from datetime import date
+from typing import Dict, Tuple
+
+
+def intervalo_mensal(mes: int, ano: int) -> Tuple[date, date]:
+    """
+    Retorna o intervalo semiaberto [primeiro_dia, primeiro_dia_do_mes_seguinte).
+
+    Filtrar por intervalo (em vez de `__month`/`__year`, que viram EXTRACT() no SQL)
+    mantém o predicado sargável: o Postgres consegue usar índices compostos como
+    (loja_id_externo, data_transacao) com um index range scan.
+    """
+    inicio = date(ano, mes, 1)
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def filtro_mensal(campo: str, mes: int, ano: int) -> Dict[str, date]:
+    """Kwargs de filtro `campo >= inicio AND campo < fim` para campos DateField."""
+    inicio, fim = intervalo_mensal(mes, ano)
+    return {f'{campo}__gte': inicio, f'{campo}__lt': fim}
+
@@ -0,0 +1,43 @@
+"""
+Meses fechados (FechamentoMensal CONCLUIDO) por loja, consultados por todos os fluxos de escrita.
+
+Cada validação é uma única consulta pelos meses envolvidos no índice único (loja, mes, ano),
+sem cache: um fechamento feito em qualquer worker vale para a escrita seguinte.
+"""
+from typing import Iterable, Optional
+
+from django.db.models import Q
+
+from financeiro_core.app.models.entidades import FechamentoMensal
+
+class PeriodoFechadoError(Exception):
+    """Escrita que afetaria um mês já fechado da loja."""
+
+    def __init__(self, loja_id: int, mes: int, ano: int, mensagem: Optional[str] = None):
+        self.loja_id, self.mes, self.ano = loja_id, mes, ano
+        super().__init__(mensagem or f"O mês {mes:02d}/{ano} está fechado para a loja {loja_id}.")
+
+
+def esta_fechado(loja_id: int, data) -> bool:
+    """`data` pode ser date ou datetime (só mês e ano importam)."""
+    return bool(datas_fechadas(loja_id, [data]))
+
+
+def verificar_aberto(loja_id: int, data, mensagem: Optional[str] = None):
+    """Levanta PeriodoFechadoError se o mês de `data` estiver fechado na loja."""
+    if data is not None and esta_fechado(loja_id, data):
+        raise PeriodoFechadoError(loja_id, data.month, data.year, mensagem)
+
+
+def datas_fechadas(loja_id: int, datas: Iterable) -> set:
+    """Validação em lote: subconjunto de `datas` que cai em meses fechados (uma consulta)."""
+    datas = {data for data in datas if data is not None}
+    if not datas:
+        return set()
+    filtro = Q()
+    for mes, ano in {(data.month, data.year) for data in datas}:
+        filtro |= Q(mes=mes, ano=ano)
+    fechados = set(FechamentoMensal.objects.filter(
+        filtro, loja_id_externo=loja_id, status='CONCLUIDO'
+    ).values_list('mes', 'ano'))
+    return {data for data in datas if (data.month, data.year) in fechados}
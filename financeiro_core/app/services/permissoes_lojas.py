@@ -0,0 +1,131 @@
+from datetime import timedelta
+from typing import Dict, Any, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import PermissaoLojaUsuario, SincronizacaoPermissoesUsuario
+
+# Ordem de prioridade dos papéis: quando o usuário chega a uma loja por mais de uma regra,
+# vale o primeiro da lista (mesma precedência da antiga montagem regra a regra).
+ROLES_POR_PRIORIDADE = ('GLOBAL', 'GESTOR_GRUPO', 'GESTOR', 'USUARIO', 'CONFERENTE')
+
+# Todas as regras em uma consulta; DISTINCT ON mantém o papel de maior prioridade por (usuário, loja).
+# Superusuários recebem todas as lojas ativas como GLOBAL.
+SQL_PERMISSOES = """
+    SELECT DISTINCT ON (p.user_id, p.loja_id) p.user_id, p.loja_id, p.nome, p.role
+    FROM (
+        SELECT u.id AS user_id, l.id AS loja_id, l.nome, 'GLOBAL' AS role, 0 AS prioridade
+        FROM auth_user u
+        CROSS JOIN vendas_loja l
+        WHERE u.is_superuser = true AND l.ativa = true
+
+        UNION ALL
+        SELECT gsu.user_id, l.id, l.nome, 'GESTOR_GRUPO', 1
+        FROM vendas_loja l
+        INNER JOIN vendas_grupolojas_super_usuarios_grupo gsu ON l.grupo_id = gsu.grupolojas_id
+        WHERE l.ativa = true
+
+        UNION ALL
+        SELECT lg.user_id, l.id, l.nome, 'GESTOR', 2
+        FROM vendas_loja l
+        INNER JOIN vendas_loja_gestores lg ON l.id = lg.loja_id
+        WHERE l.ativa = true
+
+        UNION ALL
+        SELECT up.user_id, l.id, l.nome, 'USUARIO', 3
+        FROM vendas_loja l
+        INNER JOIN vendas_userprofile up ON l.id = up.loja_id
+        WHERE l.ativa = true
+
+        UNION ALL
+        SELECT up.user_id, l.id, l.nome, 'CONFERENTE', 4
+        FROM vendas_loja l
+        INNER JOIN vendas_userprofile_lojas_conferencia uplc ON l.id = uplc.loja_id
+        INNER JOIN vendas_userprofile up ON uplc.userprofile_id = up.id
+        WHERE l.ativa = true
+    ) p
+    {filtro}
+    ORDER BY p.user_id, p.loja_id, p.prioridade
+"""
+
+
+def _ler_legado(alias: str, user_ids: Optional[List[int]]) -> Dict[tuple, tuple]:
+    """{(user_id, loja_id): (loja_nome, role)} lido do banco de vendas."""
+    filtro, params = '', []
+    if user_ids is not None:
+        filtro, params = 'WHERE p.user_id = ANY(%s)', [list(user_ids)]
+
+    with connections[alias].cursor() as cursor:
+        cursor.execute(SQL_PERMISSOES.format(filtro=filtro), params)
+        return {(user_id, loja_id): (nome, role) for user_id, loja_id, nome, role in cursor.fetchall()}
+
+
+@transaction.atomic
+def sincronizar(alias: str = 'vendas', user_ids: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    """
+    Atualiza o espelho de permissões (todos os usuários ou apenas `user_ids`) gravando só as diferenças.
+
+    Duas sincronizações simultâneas do mesmo usuário (ex.: /me e /switch-loja logo após o TTL)
+    calculam as mesmas criações; a segunda ignora as linhas que a primeira já gravou.
+    """
+    user_ids = None if user_ids is None else sorted(set(user_ids))
+    novas = _ler_legado(alias, user_ids)
+
+    atuais = PermissaoLojaUsuario.objects.all()
+    if user_ids is not None:
+        atuais = atuais.filter(user_id_externo__in=user_ids)
+    atuais = {(p.user_id_externo, p.loja_id_externo): p for p in atuais}
+
+    removidas = [p.pk for chave, p in atuais.items() if chave not in novas]
+    criadas, alteradas = [], []
+    for (user_id, loja_id), (nome, role) in novas.items():
+        permissao = atuais.get((user_id, loja_id))
+        if permissao is None:
+            criadas.append(PermissaoLojaUsuario(user_id_externo=user_id, loja_id_externo=loja_id, loja_nome=nome, role=role))
+        elif (permissao.loja_nome, permissao.role) != (nome, role):
+            permissao.loja_nome, permissao.role = nome, role
+            alteradas.append(permissao)
+
+    PermissaoLojaUsuario.objects.filter(pk__in=removidas).delete()
+    PermissaoLojaUsuario.objects.bulk_create(criadas, batch_size=1000, ignore_conflicts=True)
+    PermissaoLojaUsuario.objects.bulk_update(alteradas, ['loja_nome', 'role'], batch_size=1000)
+
+    # Usuários consultados sem nenhuma loja também ficam marcados, para respeitar o TTL
+    usuarios = set(user_ids or ()) | {user_id for user_id, _ in novas} | {user_id for user_id, _ in atuais}
+    agora = timezone.now()
+    SincronizacaoPermissoesUsuario.objects.bulk_create(
+        [SincronizacaoPermissoesUsuario(user_id_externo=user_id, sincronizado_em=agora) for user_id in usuarios],
+        update_conflicts=True,
+        unique_fields=['user_id_externo'],
+        update_fields=['sincronizado_em'],
+    )
+
+    return {"usuarios": len(usuarios), "criadas": len(criadas), "alteradas": len(alteradas), "removidas": len(removidas)}
+
+
+def _expirado(user_id: int) -> bool:
+    ttl = getattr(settings, 'PERMISSOES_LOJA_TTL', 900)
+    if not ttl:
+        # TTL desligado: o espelho é mantido apenas pelo comando de sincronização
+        return False
+    sincronizado_em = SincronizacaoPermissoesUsuario.objects.filter(
+        user_id_externo=user_id
+    ).values_list('sincronizado_em', flat=True).first()
+    return sincronizado_em is None or timezone.now() - sincronizado_em > timedelta(seconds=ttl)
+
+
+def lojas_do_usuario(user_id: int, alias: str = 'vendas') -> List[dict]:
+    """
+    Lojas e papéis do usuário a partir do espelho local. O banco de vendas só é consultado
+    quando as permissões do usuário nunca foram lidas ou passaram do PERMISSOES_LOJA_TTL.
+    """
+    if _expirado(user_id):
+        sincronizar(alias, [user_id])
+
+    permissoes = PermissaoLojaUsuario.objects.filter(user_id_externo=user_id).values_list(
+        'loja_id_externo', 'loja_nome', 'role'
+    )
+    permissoes = sorted(permissoes, key=lambda p: (ROLES_POR_PRIORIDADE.index(p[2]), p[0]))
+    return [{"id": loja_id, "nome": nome, "role": role} for loja_id, nome, role in permissoes]
@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Sequence
+
+from financeiro_core.app.models.entidades import ContaPagar, RateioDespesa
+
+
+def _conteudo(descricao, valor, categoria_id) -> tuple:
+    return (descricao, valor, categoria_id)
+
+
+def sincronizar_rateios(despesa: ContaPagar, rateios: Sequence[Any], categoria_padrao_id: int) -> Dict[str, int]:
+    """
+    Aplica os rateios recebidos (objetos com descricao, valor, categoria_id e id opcional)
+    aos splits gravados da despesa, emitindo só os INSERT/UPDATE/DELETE necessários.
+
+    Pareamento: primeiro pelo id; depois splits idênticos (descrição, valor, categoria) são
+    mantidos como estão; os que sobram são reaproveitados em ordem (UPDATE) antes de inserir
+    ou excluir. Deve rodar dentro da transação da edição da despesa.
+    """
+    existentes = {split.id: split for split in despesa.splits.all()}
+    desejados = [
+        (getattr(r, 'id', None), _conteudo(r.descricao, r.valor, r.categoria_id or categoria_padrao_id))
+        for r in rateios
+    ]
+
+    pares = []  # (split existente, conteúdo desejado)
+    pendentes = []
+    for rateio_id, conteudo in desejados:
+        split = existentes.pop(rateio_id, None) if rateio_id is not None else None
+        if split is not None:
+            pares.append((split, conteudo))
+        else:
+            pendentes.append(conteudo)
+
+    # Splits sem id correspondente: preserva os que já estão iguais
+    sobras: List[RateioDespesa] = []
+    por_conteudo: Dict[tuple, List[RateioDespesa]] = {}
+    for split in existentes.values():
+        por_conteudo.setdefault(_conteudo(split.descricao, split.valor, split.categoria_id), []).append(split)
+    novos = []
+    for conteudo in pendentes:
+        iguais = por_conteudo.get(conteudo)
+        if iguais:
+            iguais.pop()
+        else:
+            novos.append(conteudo)
+    for iguais in por_conteudo.values():
+        sobras.extend(iguais)
+
+    sobras.sort(key=lambda split: split.id)
+    pares += list(zip(sobras, novos))
+    excluir = sobras[len(novos):]
+    inserir = novos[len(sobras):]
+
+    alterados = []
+    for split, (descricao, valor, categoria_id) in pares:
+        if _conteudo(split.descricao, split.valor, split.categoria_id) != (descricao, valor, categoria_id):
+            split.descricao, split.valor, split.categoria_id = descricao, valor, categoria_id
+            alterados.append(split)
+
+    if excluir:
+        RateioDespesa.objects.filter(id__in=[split.id for split in excluir]).delete()
+    if alterados:
+        RateioDespesa.objects.bulk_update(alterados, ['descricao', 'valor', 'categoria'])
+    if inserir:
+        RateioDespesa.objects.bulk_create([
+            RateioDespesa(despesa=despesa, descricao=descricao, valor=valor, categoria_id=categoria_id)
+            for descricao, valor, categoria_id in inserir
+        ])
+
+    return {"inseridos": len(inserir), "alterados": len(alterados), "excluidos": len(excluir)}
@@ -0,0 +1,96 @@
+"""
+Conferência dos repasses de cartão: o líquido diário esperado das adquirentes (faturamento
+diário do banco de vendas - taxas do perfil da loja, na data D+dias_para_recebimento) contra
+as entradas de fato registradas nas contas da loja.
+
+Tudo em lote: uma consulta agrupada ao banco de vendas para todas as lojas e dias do mês,
+a matriz de taxas em cache por loja e uma consulta às entradas do período; o cruzamento é em memória.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import MovimentacaoCaixa
+from financeiro_core.app.services.dre_repositories import DjangoRepositorioTaxas
+from financeiro_core.app.services.periodos import intervalo_mensal
+from financeiro_core.domain.recebiveis import (
+    ConciliadorRecebiveis,
+    CreditoRecebidoDTO,
+    ProjetorRecebiveis,
+)
+from financeiro_core.infrastructure.vendas_client import GRANULARIDADE_DIA, VendasClientSQL
+
+
+def creditos_do_razao(lojas: List[int], inicio, fim) -> List[CreditoRecebidoDTO]:
+    """Entradas (tipo ENTRADA, sem transferências) das contas das lojas em [inicio, fim)."""
+    entradas = MovimentacaoCaixa.objects.filter(
+        loja_id_externo__in=lojas,
+        tipo_movimentacao='ENTRADA',
+        data_ocorrencia__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+        data_ocorrencia__lt=timezone.make_aware(datetime.combine(fim, time.min)),
+    ).values_list('id', 'loja_id_externo', 'data_ocorrencia', 'valor')
+    return [
+        CreditoRecebidoDTO(loja_id, timezone.localdate(data_ocorrencia), valor, 'MOVIMENTACAO', pk)
+        for pk, loja_id, data_ocorrencia, valor in entradas
+    ]
+
+
+def creditos_do_extrato(loja_id: int, transacoes: Iterable[dict]) -> List[CreditoRecebidoDTO]:
+    """Linhas ENTRADA de um extrato (formato de OfxParserService.iterar_transacoes) ainda não importado."""
+    return [
+        CreditoRecebidoDTO(loja_id, t['data_transacao'], t['valor'], 'OFX', t.get('fitid') or indice)
+        for indice, t in enumerate(transacoes)
+        if t['tipo'] == 'ENTRADA'
+    ]
+
+
+def conferir_recebiveis(
+    lojas: Iterable[int],
+    mes: int,
+    ano: int,
+    client=None,
+    creditos: Optional[List[CreditoRecebidoDTO]] = None,
+    tolerancia_dias: int = 1,
+    tolerancia_valor: Decimal = Decimal('1.00'),
+) -> List[Dict[str, Any]]:
+    """
+    Confere os repasses das vendas de cartão do mês (por loja e data prevista).
+
+    Sem `creditos`, compara com as entradas do razão (MovimentacaoCaixa) das lojas; com eles
+    (ex.: creditos_do_extrato), usa só os créditos informados.
+    """
+    lojas = sorted(set(lojas))
+    inicio, fim = intervalo_mensal(mes, ano)
+    client = client or VendasClientSQL()
+
+    vendas = client.get_faturamento_lote(lojas, inicio, fim, granularidade=GRANULARIDADE_DIA)
+    previstos = ProjetorRecebiveis.projetar(vendas, DjangoRepositorioTaxas())
+    if not previstos:
+        return []
+
+    if creditos is None:
+        creditos = creditos_do_razao(
+            lojas,
+            min(p.data_prevista for p in previstos) - timedelta(days=tolerancia_dias),
+            max(p.data_prevista for p in previstos) + timedelta(days=tolerancia_dias + 1),
+        )
+
+    conferencias = ConciliadorRecebiveis(tolerancia_dias, tolerancia_valor).conciliar(previstos, creditos)
+    return [
+        {
+            "loja_id": c.previsto.loja_id,
+            "data_prevista": c.previsto.data_prevista,
+            "valor_bruto": c.previsto.valor_bruto,
+            "taxas": c.previsto.taxas,
+            "valor_liquido_previsto": c.previsto.valor_liquido,
+            "valor_recebido": c.credito.valor if c.credito else None,
+            "data_recebimento": c.credito.data if c.credito else None,
+            "origem": c.credito.origem if c.credito else None,
+            "chave_credito": str(c.credito.chave) if c.credito else None,
+            "diferenca": c.diferenca,
+            "status": c.status,
+        }
+        for c in conferencias
+    ]
@@ -0,0 +1,218 @@
+"""
+Saldos das contas a partir do razão de MovimentacaoCaixa.
+
+- saldo_atual e os pontos de controle diários (SaldoDiarioConta) são ajustados por incrementos
+  atômicos (UPDATE ... SET saldo = saldo + delta), sem ler-modificar-gravar em Python.
+- saldo_em(conta, data) = último ponto de controle até a data + soma das movimentações
+  posteriores a ele (intervalo limitado), em vez de somar o histórico inteiro. Conta sem
+  nenhum ponto de controle anterior tem os seus gerados na primeira consulta.
+- extrato(conta, ...) = página de movimentações em ordem (data_ocorrencia, id) com o saldo
+  acumulado calculado no banco (SUM OVER), a partir do saldo anterior à página.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import ContaBancaria, MovimentacaoCaixa, SaldoDiarioConta
+from financeiro_core.app.services import paginacao
+
+_TIPOS_CREDITO_SQL = ", ".join(f"'{tipo}'" for tipo in MovimentacaoCaixa.TIPOS_CREDITO)
+
+
+def _inicio_do_dia(dia: date) -> datetime:
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def valor_com_sinal_expr():
+    """Expressão ORM do valor com sinal (crédito positivo, débito negativo)."""
+    return Case(
+        When(tipo_movimentacao__in=MovimentacaoCaixa.TIPOS_CREDITO, then=F('valor')),
+        default=-F('valor'),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def aplicar_delta(conta_id: int, data_ocorrencia: datetime, delta: Decimal):
+    """Soma `delta` ao saldo da conta e aos pontos de controle do dia da movimentação em diante."""
+    if not delta:
+        return
+    ContaBancaria.objects.filter(pk=conta_id).update(saldo_atual=F('saldo_atual') + delta)
+    SaldoDiarioConta.objects.filter(
+        conta_id=conta_id, data__gte=timezone.localdate(data_ocorrencia)
+    ).update(saldo=F('saldo') + delta)
+
+
+def aplicar_deltas_por_dia(conta_id: int, deltas: Dict[date, Decimal]):
+    """
+    Versão em lote de aplicar_delta (ex.: importação com bulk_create, que não dispara signals):
+    um único incremento líquido em saldo_atual e um UPDATE por dia só se houver pontos de controle
+    a partir do dia mais antigo.
+    """
+    deltas = {dia: delta for dia, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ContaBancaria.objects.filter(pk=conta_id).update(saldo_atual=F('saldo_atual') + sum(deltas.values()))
+    if SaldoDiarioConta.objects.filter(conta_id=conta_id, data__gte=min(deltas)).exists():
+        for dia, delta in deltas.items():
+            SaldoDiarioConta.objects.filter(conta_id=conta_id, data__gte=dia).update(saldo=F('saldo') + delta)
+
+
+def _ponto_controle(conta: ContaBancaria, ate: date) -> Optional[Tuple[date, Decimal]]:
+    """
+    (data, saldo) do ponto de controle mais recente da conta até `ate`. Se não houver nenhum,
+    gera os da conta até `ate` (uma soma acumulada em SQL, só na primeira vez): sem isso, toda
+    consulta somaria o razão inteiro até o próximo `reconciliar_saldos --pontos-controle`.
+    """
+    pontos = SaldoDiarioConta.objects.filter(conta=conta, data__lte=ate).order_by('-data').values_list('data', 'saldo')
+    ponto = pontos.first()
+    if ponto is None and gerar_pontos_controle(ate, conta_id=conta.pk):
+        ponto = pontos.first()
+    return ponto
+
+
+def saldo_em(conta: ContaBancaria, dia: date) -> Decimal:
+    """Saldo da conta ao fim de `dia`: ponto de controle mais recente + movimentações seguintes."""
+    ponto = _ponto_controle(conta, dia)
+
+    movimentacoes = MovimentacaoCaixa.objects.filter(conta=conta, data_ocorrencia__lt=_inicio_do_dia(dia + timedelta(days=1)))
+    if ponto:
+        base = ponto[1]
+        movimentacoes = movimentacoes.filter(data_ocorrencia__gte=_inicio_do_dia(ponto[0] + timedelta(days=1)))
+    else:
+        base = conta.saldo_inicial
+
+    soma = movimentacoes.aggregate(soma=Sum(valor_com_sinal_expr()))['soma']
+    return base + (soma or Decimal('0.00'))
+
+
+def saldo_antes(conta: ContaBancaria, data_ocorrencia: datetime, pk: Optional[int] = None) -> Decimal:
+    """
+    Saldo imediatamente antes da movimentação (data_ocorrencia, pk) na ordem do extrato;
+    sem `pk`, antes de qualquer movimentação em `data_ocorrencia`.
+    """
+    ponto = _ponto_controle(conta, timezone.localdate(data_ocorrencia) - timedelta(days=1))
+
+    anteriores = Q(data_ocorrencia__lt=data_ocorrencia)
+    if pk is not None:
+        # O limite `<=` mantém a consulta como intervalo do índice (conta, data_ocorrencia, id)
+        anteriores = Q(data_ocorrencia__lte=data_ocorrencia) & (anteriores | Q(id__lt=pk))
+    movimentacoes = MovimentacaoCaixa.objects.filter(anteriores, conta=conta)
+    if ponto:
+        base = ponto[1]
+        movimentacoes = movimentacoes.filter(data_ocorrencia__gte=_inicio_do_dia(ponto[0] + timedelta(days=1)))
+    else:
+        base = conta.saldo_inicial
+
+    soma = movimentacoes.aggregate(soma=Sum(valor_com_sinal_expr()))['soma']
+    return base + (soma or Decimal('0.00'))
+
+
+def extrato(
+    conta: ContaBancaria,
+    limite: int,
+    apos: Optional[Tuple[datetime, int]] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Até `limite` movimentações da conta depois da posição `apos` = (data_ocorrencia, id), em
+    ordem crescente, cada uma com o `saldo` após ela. A soma acumulada é uma função de janela
+    sobre a mesma ordem do índice (conta, data_ocorrencia, id), então o banco para no LIMIT e
+    uma página profunda custa o mesmo que a primeira.
+    """
+    qs = MovimentacaoCaixa.objects.filter(conta=conta)
+    if data_inicio is not None:
+        qs = qs.filter(data_ocorrencia__gte=_inicio_do_dia(data_inicio))
+    if data_fim is not None:
+        qs = qs.filter(data_ocorrencia__lt=_inicio_do_dia(data_fim + timedelta(days=1)))
+
+    if apos is not None:
+        qs = qs.filter(paginacao.apos_cursor_crescente('data_ocorrencia', *apos))
+        # Saldo logo após a última linha da página anterior (ids são inteiros: id < pk + 1)
+        saldo_anterior = saldo_antes(conta, apos[0], apos[1] + 1)
+    elif data_inicio is not None:
+        saldo_anterior = saldo_antes(conta, _inicio_do_dia(data_inicio))
+    else:
+        saldo_anterior = conta.saldo_inicial
+
+    return list(
+        qs.annotate(
+            saldo=Value(saldo_anterior, output_field=DecimalField(max_digits=15, decimal_places=2))
+            + Window(
+                Sum(valor_com_sinal_expr()),
+                order_by=[F('data_ocorrencia').asc(), F('id').asc()],
+                frame=RowRange(start=None, end=0),
+            )
+        )
+        .order_by('data_ocorrencia', 'id')
+        .values('id', 'data_ocorrencia', 'tipo_movimentacao', 'descricao', 'valor', 'saldo')[:limite]
+    )
+
+
+SQL_SALDOS_RAZAO = f"""
+    SELECT c.id, c.nome, c.saldo_atual,
+           c.saldo_inicial + COALESCE(SUM(CASE WHEN m.tipo_movimentacao IN ({_TIPOS_CREDITO_SQL})
+                                              THEN m.valor ELSE -m.valor END), 0) AS saldo_razao
+    FROM {ContaBancaria._meta.db_table} c
+    LEFT JOIN {MovimentacaoCaixa._meta.db_table} m ON m.conta_id = c.id
+    GROUP BY c.id, c.nome, c.saldo_atual, c.saldo_inicial
+    ORDER BY c.id
+"""
+
+
+def divergencias_saldo(corrigir: bool = False) -> List[Dict[str, Any]]:
+    """
+    Recalcula no banco o saldo de todas as contas a partir do razão e devolve as que divergem
+    de saldo_atual. Com `corrigir`, grava o saldo do razão nessas contas.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_SALDOS_RAZAO)
+            divergentes = [
+                {"conta_id": conta_id, "nome": nome, "saldo_atual": atual, "saldo_razao": razao, "diferenca": atual - razao}
+                for conta_id, nome, atual, razao in cursor.fetchall()
+                if atual != razao
+            ]
+
+        if corrigir:
+            for item in divergentes:
+                ContaBancaria.objects.filter(pk=item['conta_id']).update(saldo_atual=item['saldo_razao'])
+    return divergentes
+
+
+SQL_PONTOS_CONTROLE = f"""
+    INSERT INTO {SaldoDiarioConta._meta.db_table} (conta_id, data, saldo)
+    SELECT d.conta_id, d.dia,
+           c.saldo_inicial + SUM(d.soma_dia) OVER (PARTITION BY d.conta_id ORDER BY d.dia)
+    FROM (
+        SELECT m.conta_id, (m.data_ocorrencia AT TIME ZONE %s)::date AS dia,
+               SUM(CASE WHEN m.tipo_movimentacao IN ({_TIPOS_CREDITO_SQL}) THEN m.valor ELSE -m.valor END) AS soma_dia
+        FROM {MovimentacaoCaixa._meta.db_table} m
+        WHERE m.data_ocorrencia < %s AND (%s::integer IS NULL OR m.conta_id = %s)
+        GROUP BY m.conta_id, dia
+    ) d
+    INNER JOIN {ContaBancaria._meta.db_table} c ON c.id = d.conta_id
+    ON CONFLICT (conta_id, data) DO UPDATE SET saldo = EXCLUDED.saldo
+"""
+
+
+def gerar_pontos_controle(ate: Optional[date] = None, conta_id: Optional[int] = None) -> int:
+    """
+    (Re)gera os pontos de controle de cada dia com movimentação até `ate` (padrão: ontem),
+    com uma soma acumulada por conta em SQL; com `conta_id`, só os dessa conta.
+    Retorna o número de linhas gravadas.
+    """
+    ate = ate or timezone.localdate() - timedelta(days=1)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SQL_PONTOS_CONTROLE,
+                [settings.TIME_ZONE, _inicio_do_dia(ate + timedelta(days=1)), conta_id, conta_id],
+            )
+            return cursor.rowcount
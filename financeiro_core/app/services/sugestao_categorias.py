@@ -0,0 +1,138 @@
+"""
+Sugestão de categoria para lançamentos importados (OFX) a partir do histórico de despesas da loja.
+
+Cada loja tem um índice invertido em memória: termo da descrição -> {categoria_id: despesas}.
+A sugestão é uma votação ponderada por TF-IDF: cada termo da descrição vota nas categorias em
+que aparece, proporcionalmente à fração das despesas com o termo em cada categoria e ao peso
+idf do termo (termos raros decidem mais que termos comuns como "pagamento").
+
+Os índices ficam num LRU por processo (SUGESTAO_CATEGORIAS_MAX_LOJAS), são montados com uma
+consulta por loja e atualizados incrementalmente pelas gravações de ContaPagar (signals e
+criação em lote). O SUGESTAO_CATEGORIAS_TTL limita a defasagem em relação aos demais processos.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+from financeiro_core.app.models.entidades import ContaPagar
+
+_RE_PALAVRA = re.compile(r'\w+')
+
+
+def termos(descricao: str) -> Set[str]:
+    """Termos indexados: minúsculos, sem acento, com mais de 3 caracteres e não só dígitos."""
+    sem_acento = unicodedata.normalize('NFKD', descricao or '').encode('ascii', 'ignore').decode()
+    return {
+        palavra for palavra in _RE_PALAVRA.findall(sem_acento.lower())
+        if len(palavra) > 3 and not palavra.isdigit()
+    }
+
+
+class IndiceCategorias:
+    """Índice invertido de uma loja. Não é thread-safe: o acesso passa pelo lock do módulo."""
+
+    def __init__(self):
+        self.despesas = 0
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.criado_em = time.monotonic()
+
+    def adicionar(self, descricao: str, categoria_id: int):
+        self.despesas += 1
+        for termo in termos(descricao):
+            categorias = self.postings.setdefault(termo, {})
+            categorias[categoria_id] = categorias.get(categoria_id, 0) + 1
+
+    def remover(self, descricao: str, categoria_id: int):
+        self.despesas = max(0, self.despesas - 1)
+        for termo in termos(descricao):
+            categorias = self.postings.get(termo)
+            if not categorias or categoria_id not in categorias:
+                continue
+            categorias[categoria_id] -= 1
+            if categorias[categoria_id] <= 0:
+                del categorias[categoria_id]
+                if not categorias:
+                    del self.postings[termo]
+
+    def sugerir(self, descricao: str) -> Optional[int]:
+        votos: Dict[int, float] = {}
+        for termo in termos(descricao):
+            categorias = self.postings.get(termo)
+            if not categorias:
+                continue
+            frequencia = sum(categorias.values())
+            idf = math.log(1 + self.despesas / frequencia)
+            for categoria_id, quantidade in categorias.items():
+                votos[categoria_id] = votos.get(categoria_id, 0.0) + idf * quantidade / frequencia
+
+        if not votos:
+            return None
+        # Empate: a categoria de menor id, para o resultado não depender da ordem do dicionário
+        return max(votos.items(), key=lambda item: (item[1], -item[0]))[0]
+
+
+_lock = threading.Lock()
+_indices: 'OrderedDict[int, IndiceCategorias]' = OrderedDict()
+
+
+def _montar(loja_id: int) -> IndiceCategorias:
+    indice = IndiceCategorias()
+    historico = ContaPagar.objects.filter(loja_id_externo=loja_id).values_list('descricao', 'categoria_id')
+    for descricao, categoria_id in historico.iterator(chunk_size=2000):
+        indice.adicionar(descricao, categoria_id)
+    return indice
+
+
+def indice_da_loja(loja_id: int) -> IndiceCategorias:
+    """Índice da loja (montado na primeira consulta ou após o TTL), marcado como o mais recente no LRU."""
+    ttl = getattr(settings, 'SUGESTAO_CATEGORIAS_TTL', 900)
+    with _lock:
+        indice = _indices.get(loja_id)
+        if indice is not None and time.monotonic() - indice.criado_em < ttl:
+            _indices.move_to_end(loja_id)
+            return indice
+
+    indice = _montar(loja_id)
+    with _lock:
+        _indices[loja_id] = indice
+        _indices.move_to_end(loja_id)
+        while len(_indices) > getattr(settings, 'SUGESTAO_CATEGORIAS_MAX_LOJAS', 32):
+            _indices.popitem(last=False)
+    return indice
+
+
+def sugerir_categorias(loja_id: int, descricoes: Iterable[str]) -> List[Optional[int]]:
+    """Categoria sugerida para cada descrição (None se nenhum termo for conhecido), com um só índice."""
+    indice = indice_da_loja(loja_id)
+    with _lock:
+        return [indice.sugerir(descricao) for descricao in descricoes]
+
+
+def sugerir_categoria(loja_id: int, descricao: str) -> Optional[int]:
+    return sugerir_categorias(loja_id, [descricao])[0]
+
+
+def registrar_despesa(loja_id: int, descricao: str, categoria_id: int):
+    """Inclui uma despesa no índice da loja, se ele estiver carregado neste processo."""
+    with _lock:
+        indice = _indices.get(loja_id)
+        if indice is not None:
+            indice.adicionar(descricao, categoria_id)
+
+
+def remover_despesa(loja_id: int, descricao: str, categoria_id: int):
+    with _lock:
+        indice = _indices.get(loja_id)
+        if indice is not None:
+            indice.remover(descricao, categoria_id)
+
+
+def limpar():
+    with _lock:
+        _indices.clear()
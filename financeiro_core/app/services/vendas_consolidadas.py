@@ -0,0 +1,154 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from django.db import connections, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from financeiro_core.app.models.entidades import VendaDiariaConsolidada, SincronizacaoVendas
+from financeiro_core.infrastructure.vendas_client import VendasClientSQL, GRANULARIDADE_MES, GRANULARIDADE_DIA
+
+# Caixas novos desde a última marca d'água (ordem de criação)
+SQL_CAIXAS_NOVOS = """
+    SELECT id, loja_id, data
+    FROM vendas_caixadiario
+    WHERE id > %s
+    ORDER BY id
+"""
+
+# Estornos novos e o dia (do caixa) da venda estornada
+SQL_ESTORNOS_NOVOS = """
+    SELECT e.id, v.loja_id, c.data
+    FROM vendas_estorno e
+    INNER JOIN vendas_venda v ON v.id = e.venda_id
+    INNER JOIN vendas_caixadiario c ON c.id = v.caixa_id
+    WHERE e.id > %s
+    ORDER BY e.id
+"""
+
+SQL_DIAS_DESDE = """
+    SELECT DISTINCT loja_id, data
+    FROM vendas_caixadiario
+    WHERE data >= %s AND data < %s
+"""
+
+Dia = Tuple[int, date]
+
+
+def consolidado_ate() -> Optional[date]:
+    """Dias anteriores à data retornada estão na tabela consolidada (None se nunca sincronizou)."""
+    return SincronizacaoVendas.objects.filter(pk=1).values_list('consolidado_ate', flat=True).first()
+
+
+def ler_consolidado(lojas: List[int], inicio: date, fim: date, granularidade: str = GRANULARIDADE_MES) -> List[tuple]:
+    """Linhas (loja_id, periodo, forma, bandeira, total) no mesmo formato da consulta ao legado."""
+    periodo = TruncMonth('data') if granularidade == GRANULARIDADE_MES else F('data')
+    return list(
+        VendaDiariaConsolidada.objects.filter(
+            loja_id_externo__in=lojas, data__gte=inicio, data__lt=fim
+        ).annotate(periodo=periodo).values(
+            'loja_id_externo', 'periodo', 'forma', 'bandeira'
+        ).annotate(soma=Sum('total')).values_list(
+            'loja_id_externo', 'periodo', 'forma', 'bandeira', 'soma'
+        ).order_by()
+    )
+
+
+def _intervalos_contiguos(dias: Iterable[date]) -> List[Tuple[date, date]]:
+    """Agrupa dias ordenados em intervalos semiabertos [inicio, fim) sem lacunas."""
+    intervalos = []
+    for dia in sorted(dias):
+        if intervalos and intervalos[-1][1] == dia:
+            intervalos[-1] = (intervalos[-1][0], dia + timedelta(days=1))
+        else:
+            intervalos.append((dia, dia + timedelta(days=1)))
+    return intervalos
+
+
+def _dias_a_atualizar(alias: str, controle: SincronizacaoVendas, hoje: date, desde: Optional[date]) -> Tuple[Set[Dia], int, int]:
+    dias: Set[Dia] = set()
+
+    with connections[alias].cursor() as cursor:
+        # 1. Caixas novos: consolida apenas dias encerrados. A marca d'água para antes do
+        #    primeiro caixa ainda aberto, que volta a ser examinado na próxima execução.
+        cursor.execute(SQL_CAIXAS_NOVOS, [controle.ultimo_caixa_id])
+        ultimo_caixa_id = controle.ultimo_caixa_id
+        primeiro_aberto = None
+        for caixa_id, loja_id, data in cursor.fetchall():
+            ultimo_caixa_id = caixa_id
+            if data >= hoje:
+                primeiro_aberto = primeiro_aberto or caixa_id
+            else:
+                dias.add((loja_id, data))
+        if primeiro_aberto is not None:
+            ultimo_caixa_id = primeiro_aberto - 1
+
+        # 2. Estornos novos alteram dias já consolidados
+        cursor.execute(SQL_ESTORNOS_NOVOS, [controle.ultimo_estorno_id])
+        ultimo_estorno_id = controle.ultimo_estorno_id
+        for estorno_id, loja_id, data in cursor.fetchall():
+            ultimo_estorno_id = estorno_id
+            if data < hoje:
+                dias.add((loja_id, data))
+
+        # 3. Reprocessamento manual (ex: vendas alteradas retroativamente no legado)
+        if desde is not None:
+            cursor.execute(SQL_DIAS_DESDE, [desde, hoje])
+            dias.update(cursor.fetchall())
+
+    return dias, ultimo_caixa_id, ultimo_estorno_id
+
+
+def sincronizar(alias: str = 'vendas', hoje: Optional[date] = None, desde: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Atualiza VendaDiariaConsolidada a partir do banco legado de forma incremental.
+
+    Relê do legado, por dia encerrado (< hoje), os dias de caixas novos e os dias de vendas
+    com estornos novos, substituindo as linhas desses dias. Os dias são agrupados em intervalos
+    contíguos por loja, cada um lido com uma consulta agrupada por dia.
+    """
+    hoje = hoje or timezone.localdate()
+    cliente = VendasClientSQL(alias=alias, usar_consolidado=False)
+
+    with transaction.atomic():
+        # Registro único; o lock impede duas sincronizações simultâneas
+        SincronizacaoVendas.objects.get_or_create(pk=1)
+        controle = SincronizacaoVendas.objects.select_for_update().get(pk=1)
+
+        dias, ultimo_caixa_id, ultimo_estorno_id = _dias_a_atualizar(alias, controle, hoje, desde)
+
+        dias_por_loja: Dict[int, Set[date]] = {}
+        for loja_id, data in dias:
+            dias_por_loja.setdefault(loja_id, set()).add(data)
+
+        novas_linhas = []
+        for loja_id, datas in sorted(dias_por_loja.items()):
+            totais: Dict[tuple, Decimal] = {}
+            for inicio, fim in _intervalos_contiguos(datas):
+                for _, data, forma, bandeira, total in cliente.consultar_lote_bruto([loja_id], inicio, fim, GRANULARIDADE_DIA):
+                    chave = (data, forma or '', bandeira or 'GERAL')
+                    totais[chave] = totais.get(chave, Decimal('0.00')) + (total or Decimal('0.00'))
+
+            # Dias que ficaram sem vendas (ex: tudo estornado) também perdem as linhas antigas
+            VendaDiariaConsolidada.objects.filter(loja_id_externo=loja_id, data__in=datas).delete()
+            novas_linhas += [
+                VendaDiariaConsolidada(loja_id_externo=loja_id, data=data, forma=forma, bandeira=bandeira, total=total)
+                for (data, forma, bandeira), total in totais.items()
+            ]
+
+        VendaDiariaConsolidada.objects.bulk_create(novas_linhas, batch_size=5000)
+
+        controle.ultimo_caixa_id = ultimo_caixa_id
+        controle.ultimo_estorno_id = ultimo_estorno_id
+        controle.consolidado_ate = hoje
+        controle.save()
+
+    return {
+        "dias_atualizados": len(dias),
+        "linhas_gravadas": len(novas_linhas),
+        "ultimo_caixa_id": ultimo_caixa_id,
+        "ultimo_estorno_id": ultimo_estorno_id,
+        "consolidado_ate": hoje,
+    }
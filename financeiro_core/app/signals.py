@@ -0,0 +1,163 @@
+"""
+Receivers que mantêm os caches derivados coerentes com as escritas no banco.
+Conectados em FinanceiroCoreConfig.ready().
+
+Os agregados mensais de despesas são recalculados explicitamente pelos fluxos de escrita
+(ver app/services/agregados_mensais.py); aqui ficam apenas os ajustes ligados à categoria.
+Os saldos das contas acompanham as movimentações de caixa (ver app/services/saldos.py).
+O índice de sugestão de categorias acompanha descrição/categoria das despesas; por ficar em
+memória (fora do rollback), só é atualizado depois do commit.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from financeiro_core.app.models.entidades import (
+    ContaPagar,
+    RateioDespesa,
+    CategoriaDespesa,
+    MovimentacaoCaixa,
+    PerfilTaxaCartao,
+    TaxaMaquininha,
+)
+from financeiro_core.app.services import dre_cache, agregados_mensais, saldos, sugestao_categorias
+from financeiro_core.app.services.dre_repositories import invalidar_taxas_loja
+
+
+# --- ContaPagar: afeta o mês (data_transacao) da loja, antes e depois da alteração ---
+
+@receiver(pre_save, sender=ContaPagar)
+def guardar_periodo_anterior_despesa(sender, instance, **kwargs):
+    instance._periodo_anterior = None
+    instance._categorizacao_anterior = None
+    if instance.pk and not instance._state.adding:
+        anterior = ContaPagar.objects.filter(pk=instance.pk).values_list(
+            'loja_id_externo', 'data_transacao', 'descricao', 'categoria_id'
+        ).first()
+        if anterior:
+            loja_id, data_transacao, descricao, categoria_id = anterior
+            instance._periodo_anterior = (loja_id, data_transacao)
+            instance._categorizacao_anterior = (loja_id, descricao, categoria_id)
+
+
+@receiver(post_save, sender=ContaPagar)
+def invalidar_dre_despesa_salva(sender, instance, **kwargs):
+    dre_cache.invalidar_data(instance.loja_id_externo, instance.data_transacao)
+    anterior = getattr(instance, '_periodo_anterior', None)
+    if anterior:
+        dre_cache.invalidar_data(*anterior)
+
+
+@receiver(post_save, sender=ContaPagar)
+def atualizar_sugestao_categorias(sender, instance, created, **kwargs):
+    atual = (instance.loja_id_externo, instance.descricao, instance.categoria_id)
+    anterior = getattr(instance, '_categorizacao_anterior', None)
+    if not created and anterior == atual:
+        return
+    if anterior:
+        transaction.on_commit(partial(sugestao_categorias.remover_despesa, *anterior))
+    transaction.on_commit(partial(sugestao_categorias.registrar_despesa, *atual))
+
+
+@receiver(post_delete, sender=ContaPagar)
+def invalidar_dre_despesa_excluida(sender, instance, **kwargs):
+    dre_cache.invalidar_data(instance.loja_id_externo, instance.data_transacao)
+    transaction.on_commit(partial(
+        sugestao_categorias.remover_despesa, instance.loja_id_externo, instance.descricao, instance.categoria_id
+    ))
+
+
+# --- RateioDespesa: afeta o mês da despesa pai ---
+
+@receiver(post_save, sender=RateioDespesa)
+@receiver(post_delete, sender=RateioDespesa)
+def invalidar_dre_rateio(sender, instance, **kwargs):
+    periodo = ContaPagar.objects.filter(pk=instance.despesa_id).values_list(
+        'loja_id_externo', 'data_transacao'
+    ).first()
+    if periodo:
+        dre_cache.invalidar_data(*periodo)
+
+
+# --- CategoriaDespesa: nome/grupo aparecem em todos os DREs ---
+
+@receiver(post_save, sender=CategoriaDespesa)
+@receiver(post_delete, sender=CategoriaDespesa)
+def invalidar_dre_categoria(sender, instance, **kwargs):
+    dre_cache.invalidar_tudo()
+
+
+@receiver(post_save, sender=CategoriaDespesa)
+def sincronizar_grupo_agregados(sender, instance, created, **kwargs):
+    if not created:
+        agregados_mensais.sincronizar_grupo_categoria(instance.pk, instance.grupo_contabil)
+
+
+@receiver(pre_delete, sender=CategoriaDespesa)
+def guardar_periodos_rateios_categoria(sender, instance, **kwargs):
+    # Splits da categoria passam a herdar a categoria da despesa (SET_NULL)
+    instance._periodos_rateios = agregados_mensais.periodos_da_categoria_em_rateios(instance.pk)
+
+
+@receiver(post_delete, sender=CategoriaDespesa)
+def recalcular_agregados_categoria(sender, instance, **kwargs):
+    agregados_mensais.recalcular_periodos(getattr(instance, '_periodos_rateios', ()))
+
+
+# --- Taxas de cartão: afetam a matriz de taxas e todos os meses da loja do perfil ---
+
+def _invalidar_taxas(loja_id):
+    invalidar_taxas_loja(loja_id)
+    dre_cache.invalidar_loja(loja_id)
+
+
+@receiver(pre_save, sender=PerfilTaxaCartao)
+def guardar_loja_anterior_perfil(sender, instance, **kwargs):
+    instance._loja_anterior = None
+    if instance.pk and not instance._state.adding:
+        instance._loja_anterior = PerfilTaxaCartao.objects.filter(pk=instance.pk).values_list(
+            'loja_id_externo', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=PerfilTaxaCartao)
+@receiver(post_delete, sender=PerfilTaxaCartao)
+def invalidar_dre_perfil_taxa(sender, instance, **kwargs):
+    _invalidar_taxas(instance.loja_id_externo)
+    loja_anterior = getattr(instance, '_loja_anterior', None)
+    if loja_anterior is not None and loja_anterior != instance.loja_id_externo:
+        _invalidar_taxas(loja_anterior)
+
+
+@receiver(post_save, sender=TaxaMaquininha)
+@receiver(post_delete, sender=TaxaMaquininha)
+def invalidar_dre_taxa(sender, instance, **kwargs):
+    loja_id = PerfilTaxaCartao.objects.filter(pk=instance.perfil_id).values_list(
+        'loja_id_externo', flat=True
+    ).first()
+    if loja_id is not None:
+        _invalidar_taxas(loja_id)
+
+
+# --- MovimentacaoCaixa: saldo da conta e pontos de controle diários ---
+
+@receiver(pre_save, sender=MovimentacaoCaixa)
+def guardar_movimentacao_anterior(sender, instance, **kwargs):
+    instance._movimentacao_anterior = None
+    if instance.pk and not instance._state.adding:
+        instance._movimentacao_anterior = MovimentacaoCaixa.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=MovimentacaoCaixa)
+def atualizar_saldo_movimentacao(sender, instance, **kwargs):
+    anterior = getattr(instance, '_movimentacao_anterior', None)
+    if anterior is not None:
+        saldos.aplicar_delta(anterior.conta_id, anterior.data_ocorrencia, -anterior.valor_com_sinal)
+    saldos.aplicar_delta(instance.conta_id, instance.data_ocorrencia, instance.valor_com_sinal)
+
+
+@receiver(post_delete, sender=MovimentacaoCaixa)
+def estornar_saldo_movimentacao(sender, instance, **kwargs):
+    saldos.aplicar_delta(instance.conta_id, instance.data_ocorrencia, -instance.valor_com_sinal)
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class FinanceiroCoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'financeiro_core'
-    verbose_name = 'Sistema Financeiro Core'
\ No newline at end of file
+    verbose_name = 'Sistema Financeiro Core'
+
+    def ready(self):
+        # Registra os receivers de invalidação de cache
+        from .app import signals  # noqa: F401
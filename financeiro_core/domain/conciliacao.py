@@ -0,0 +1,158 @@
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+# --- Value Objects / DTOs ---
+
+@dataclass
+class LancamentoExtratoDTO:
+    """Débito do extrato bancário (ex.: linha SAIDA do OFX)."""
+    chave: Any            # Identificador da linha no extrato (FITID, índice...)
+    data: date
+    valor: Decimal        # Valor absoluto
+    descricao: str
+
+@dataclass
+class DespesaConciliavelDTO:
+    """Despesa registrada candidata a corresponder a um débito."""
+    id: int
+    data: date            # Data prevista da saída do dinheiro
+    valor: Decimal
+    descricao: str
+
+@dataclass
+class ParConciliadoDTO:
+    lancamento: LancamentoExtratoDTO
+    despesa: DespesaConciliavelDTO
+    diferenca_dias: int
+    similaridade: float
+
+@dataclass
+class ResultadoConciliacaoDTO:
+    pares: List[ParConciliadoDTO] = field(default_factory=list)
+    lancamentos_sem_par: List[LancamentoExtratoDTO] = field(default_factory=list)
+    despesas_sem_par: List[DespesaConciliavelDTO] = field(default_factory=list)
+
+# --- Serviço de Domínio ---
+
+_RE_PALAVRA = re.compile(r'[a-z0-9]+')
+
+
+# Descrições se repetem muito (tarifas, fornecedores fixos) e o desempate as compara várias vezes
+@lru_cache(maxsize=4096)
+def _palavras(descricao: str) -> FrozenSet[str]:
+    texto = unicodedata.normalize('NFKD', descricao or '').encode('ascii', 'ignore').decode().lower()
+    return frozenset(p for p in _RE_PALAVRA.findall(texto) if len(p) > 2 and not p.isdigit())
+
+
+def _centavos(valor: Decimal) -> int:
+    return int((valor * 100).to_integral_value())
+
+
+def _proxima_livre(proximo: List[int], posicao: int) -> int:
+    """Primeira posição livre a partir de `posicao` (ponteiros de salto com compressão de caminho)."""
+    while proximo[posicao] != posicao:
+        proximo[posicao] = proximo[proximo[posicao]]
+        posicao = proximo[posicao]
+    return posicao
+
+
+class MotorConciliacao:
+    """
+    Casa débitos do extrato com despesas registradas em O((n + m) log m + n·k).
+
+    As despesas são agrupadas pelo valor em centavos e, em cada grupo, ordenadas pela data.
+    Para cada lançamento (em ordem de data) só o grupo de mesmo valor é consultado, e nele a
+    faixa de datas [data - tolerância, data + tolerância] é localizada por busca binária.
+    Despesas já casadas não saem da lista: ponteiros de salto levam direto à próxima livre,
+    então valores muito repetidos não degradam a busca. Havendo mais de um candidato na faixa,
+    vence a maior similaridade de descrição (Jaccard das palavras), depois a menor distância em
+    dias e o menor id, comparando no máximo `limite_candidatos` (k) candidatos, os de data mais
+    antiga. Cada despesa casa uma só vez.
+    """
+
+    def __init__(self, tolerancia_dias: int = 3, limite_candidatos: int = 50):
+        self.tolerancia_dias = tolerancia_dias
+        self.limite_candidatos = limite_candidatos
+
+    def conciliar(
+        self,
+        lancamentos: List[LancamentoExtratoDTO],
+        despesas: List[DespesaConciliavelDTO],
+    ) -> ResultadoConciliacaoDTO:
+        # valor em centavos -> ([ordinais das datas], [despesas], [próxima posição livre])
+        # `proximo` tem uma posição sentinela no fim; posição casada aponta para a seguinte
+        grupos: Dict[int, Tuple[List[int], List[DespesaConciliavelDTO], List[int]]] = {}
+        por_valor: Dict[int, List[DespesaConciliavelDTO]] = defaultdict(list)
+        for despesa in despesas:
+            por_valor[_centavos(despesa.valor)].append(despesa)
+        for centavos, lista in por_valor.items():
+            lista.sort(key=lambda d: (d.data, d.id))
+            grupos[centavos] = ([d.data.toordinal() for d in lista], lista, list(range(len(lista) + 1)))
+
+        resultado = ResultadoConciliacaoDTO()
+        for lancamento in sorted(lancamentos, key=lambda l: l.data):
+            grupo = grupos.get(_centavos(lancamento.valor))
+            escolhido = self._melhor_candidato(lancamento, grupo) if grupo else None
+            if escolhido is None:
+                resultado.lancamentos_sem_par.append(lancamento)
+                continue
+
+            posicao, similaridade = escolhido
+            _, lista, proximo = grupo
+            proximo[posicao] = posicao + 1
+            despesa = lista[posicao]
+            resultado.pares.append(ParConciliadoDTO(
+                lancamento=lancamento,
+                despesa=despesa,
+                diferenca_dias=abs((lancamento.data - despesa.data).days),
+                similaridade=similaridade,
+            ))
+
+        resultado.despesas_sem_par = sorted(
+            (d for _, lista, proximo in grupos.values() for posicao, d in enumerate(lista) if proximo[posicao] == posicao),
+            key=lambda d: (d.data, d.id),
+        )
+        return resultado
+
+    def _melhor_candidato(self, lancamento: LancamentoExtratoDTO, grupo) -> Any:
+        """(posição no grupo, similaridade) do melhor candidato livre na janela de datas, ou None."""
+        ordinais, lista, proximo = grupo
+        dia = lancamento.data.toordinal()
+        inicio = bisect_left(ordinais, dia - self.tolerancia_dias)
+        fim = bisect_right(ordinais, dia + self.tolerancia_dias)
+        posicao = _proxima_livre(proximo, inicio)
+        if posicao >= fim:
+            return None
+        seguinte = _proxima_livre(proximo, posicao + 1)
+        if seguinte >= fim:
+            return posicao, self.similaridade(lancamento.descricao, lista[posicao].descricao)
+
+        palavras = _palavras(lancamento.descricao)
+        melhor, chave_melhor = None, None
+        for _ in range(self.limite_candidatos):
+            despesa = lista[posicao]
+            similaridade = self._jaccard(palavras, _palavras(despesa.descricao))
+            chave = (-similaridade, abs(ordinais[posicao] - dia), despesa.id)
+            if chave_melhor is None or chave < chave_melhor:
+                melhor, chave_melhor = (posicao, similaridade), chave
+            if seguinte >= fim:
+                break
+            posicao, seguinte = seguinte, _proxima_livre(proximo, seguinte + 1)
+        return melhor
+
+    @staticmethod
+    def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    @classmethod
+    def similaridade(cls, descricao_a: str, descricao_b: str) -> float:
+        return cls._jaccard(_palavras(descricao_a), _palavras(descricao_b))
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .services import CalculadoraFinanceira, FaturamentoItemDTO, IRepositorioTaxas
+
+# Vendas repassadas pela adquirente (as demais formas não geram recebível de cartão)
+TIPOS_RECEBIVEL_CARTAO = ('DEBITO', 'CREDITO_AVISTA', 'CREDITO_PARCELADO')
+
+STATUS_CONCILIADO = 'CONCILIADO'
+STATUS_DIVERGENTE = 'DIVERGENTE'
+STATUS_NAO_RECEBIDO = 'NAO_RECEBIDO'
+
+# --- Value Objects / DTOs ---
+
+@dataclass
+class RecebivelPrevistoDTO:
+    """Repasse líquido esperado das adquirentes para a loja em uma data."""
+    loja_id: int
+    data_prevista: date
+    valor_bruto: Decimal
+    taxas: Decimal
+    valor_liquido: Decimal
+
+@dataclass
+class CreditoRecebidoDTO:
+    """Entrada na conta da loja (MovimentacaoCaixa ENTRADA ou linha ENTRADA do OFX)."""
+    loja_id: int
+    data: date
+    valor: Decimal
+    origem: str           # Ex: 'MOVIMENTACAO', 'OFX'
+    chave: Any            # id da movimentação, FITID...
+
+@dataclass
+class ConferenciaRecebivelDTO:
+    previsto: RecebivelPrevistoDTO
+    status: str
+    credito: Optional[CreditoRecebidoDTO]
+    diferenca: Decimal    # recebido - previsto
+
+# --- Serviços de Domínio ---
+
+def proximo_dia_util(dia: date) -> date:
+    """Repasses de fim de semana caem na segunda-feira (feriados não são considerados)."""
+    while dia.weekday() >= 5:
+        dia += timedelta(days=1)
+    return dia
+
+
+class ProjetorRecebiveis:
+    """Projeta os repasses líquidos diários a partir do faturamento diário e das taxas da loja."""
+
+    @staticmethod
+    def projetar(
+        vendas_por_dia: Dict[Tuple[int, date], List[FaturamentoItemDTO]],
+        repositorio_taxas: IRepositorioTaxas,
+    ) -> List[RecebivelPrevistoDTO]:
+        """
+        `vendas_por_dia` é o retorno de get_faturamento_lote(granularidade='dia').
+        Cada item de cartão com taxa cadastrada vai para a data venda + dias_para_recebimento
+        (próximo dia útil); itens sem taxa (ex.: CARTAO_NAO_IDENTIFICADO) não são projetados.
+        """
+        totais: Dict[Tuple[int, date], List[Decimal]] = {}
+        for (loja_id, dia), itens in vendas_por_dia.items():
+            for item in itens:
+                if item.tipo_pagamento not in TIPOS_RECEBIVEL_CARTAO:
+                    continue
+                taxa = repositorio_taxas.buscar_taxa(loja_id, item.tipo_pagamento, item.bandeira, item.parcelas)
+                if not taxa:
+                    continue
+                data_prevista = proximo_dia_util(dia + timedelta(days=taxa.dias_para_recebimento))
+                total = totais.setdefault((loja_id, data_prevista), [Decimal('0.00'), Decimal('0.00')])
+                total[0] += item.valor_bruto
+                total[1] += CalculadoraFinanceira.calcular_taxa_item(item.valor_bruto, taxa)
+
+        return [
+            RecebivelPrevistoDTO(loja_id, data_prevista, bruto, taxas, bruto - taxas)
+            for (loja_id, data_prevista), (bruto, taxas) in sorted(totais.items())
+        ]
+
+
+class ConciliadorRecebiveis:
+    """
+    Confere os repasses previstos com os créditos recebidos por hash join: os créditos são
+    indexados por (loja, dia) e cada previsto só consulta os dias da janela de tolerância.
+
+    O crédito de valor mais próximo na janela é consumido: dentro de `tolerancia_valor` o
+    repasse está CONCILIADO; até `margem_divergencia` (fração do previsto), DIVERGENTE;
+    sem crédito nessa faixa, NAO_RECEBIDO.
+    """
+
+    def __init__(
+        self,
+        tolerancia_dias: int = 1,
+        tolerancia_valor: Decimal = Decimal('1.00'),
+        margem_divergencia: Decimal = Decimal('0.10'),
+    ):
+        self.tolerancia_dias = tolerancia_dias
+        self.tolerancia_valor = tolerancia_valor
+        self.margem_divergencia = margem_divergencia
+
+    def conciliar(
+        self,
+        previstos: Iterable[RecebivelPrevistoDTO],
+        creditos: Iterable[CreditoRecebidoDTO],
+    ) -> List[ConferenciaRecebivelDTO]:
+        por_dia: Dict[Tuple[int, date], List[CreditoRecebidoDTO]] = {}
+        for credito in creditos:
+            por_dia.setdefault((credito.loja_id, credito.data), []).append(credito)
+
+        conferencias = []
+        # Previstos maiores primeiro: um repasse grande não perde o seu crédito para um pequeno
+        for previsto in sorted(previstos, key=lambda p: (-p.valor_liquido, p.loja_id, p.data_prevista)):
+            limite = max(self.tolerancia_valor, previsto.valor_liquido * self.margem_divergencia)
+            melhor, lista_melhor, distancia_melhor = None, None, None
+            for deslocamento in range(-self.tolerancia_dias, self.tolerancia_dias + 1):
+                lista = por_dia.get((previsto.loja_id, previsto.data_prevista + timedelta(days=deslocamento)))
+                for credito in lista or ():
+                    distancia = abs(credito.valor - previsto.valor_liquido)
+                    if distancia <= limite and (distancia_melhor is None or distancia < distancia_melhor):
+                        melhor, lista_melhor, distancia_melhor = credito, lista, distancia
+
+            if melhor is None:
+                conferencias.append(ConferenciaRecebivelDTO(previsto, STATUS_NAO_RECEBIDO, None, -previsto.valor_liquido))
+                continue
+            lista_melhor.remove(melhor)
+            status = STATUS_CONCILIADO if distancia_melhor <= self.tolerancia_valor else STATUS_DIVERGENTE
+            conferencias.append(ConferenciaRecebivelDTO(previsto, status, melhor, melhor.valor - previsto.valor_liquido))
+
+        conferencias.sort(key=lambda c: (c.previsto.loja_id, c.previsto.data_prevista))
+        return conferencias
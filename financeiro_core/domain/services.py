@@ -21,6 +21,7 @@ class TaxaAplicavelDTO:
     """Representa a taxa configurada no sistema para um tipo de transação."""
     percentual: Decimal
     valor_fixo: Decimal
+    dias_para_recebimento: int = 1  # Prazo de repasse da adquirente (D+n)
 
 @dataclass
 class ResultadoFechamentoDTO:
@@ -69,6 +70,11 @@ class CalculadoraFinanceira:
         """Helper para garantir 2 casas decimais em tudo."""
         return valor.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
+    @staticmethod
+    def calcular_taxa_item(valor: Decimal, taxa: TaxaAplicavelDTO) -> Decimal:
+        """Cálculo: (Valor * % / 100) + Taxa Fixa, arredondado no item."""
+        return CalculadoraFinanceira._arredondar(valor * taxa.percentual / Decimal('100') + taxa.valor_fixo)
+
     @staticmethod
     def calcular_liquido_vendas(
         itens_venda: List[FaturamentoItemDTO], 
@@ -91,12 +97,8 @@ class CalculadoraFinanceira:
             )
             
             if taxa:
-                # Cálculo: (Valor * % / 100) + Taxa Fixa
-                percentual_decimal = taxa.percentual / Decimal('100')
-                custo_item = (valor_item * percentual_decimal) + taxa.valor_fixo
-                
                 # Importante: Arredondamos item a item para evitar acumulo de dízimas
-                total_taxas += CalculadoraFinanceira._arredondar(custo_item)
+                total_taxas += CalculadoraFinanceira.calcular_taxa_item(valor_item, taxa)
             else:
                 pass
                 
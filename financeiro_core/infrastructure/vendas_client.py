@@ -1,8 +1,63 @@
+from datetime import date
 from decimal import Decimal
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
 from django.db import connections
 from ..domain.services import FaturamentoItemDTO
-import re
+from ..app.services.periodos import intervalo_mensal
+
+# Faturamento por (loja, período, forma, bandeira), caixa-based, para várias lojas de uma vez.
+# Cada venda válida é lida uma única vez: os dois pagamentos viram linhas via LATERAL (VALUES ...),
+# estornos saem por anti-join (NOT EXISTS) e o intervalo é semiaberto em vendas_caixadiario.data.
+# O primeiro parâmetro é a unidade do date_trunc ('month' ou 'day').
+SQL_FATURAMENTO_LOTE = """
+    SELECT
+        v.loja_id,
+        date_trunc(%s, c.data)::date AS periodo,
+        p.forma,
+        p.bandeira,
+        SUM(p.valor) AS total
+    FROM vendas_venda v
+    INNER JOIN vendas_caixadiario c ON c.id = v.caixa_id
+    CROSS JOIN LATERAL (
+        VALUES
+            (v.forma_pagamento, COALESCE(v.subtipo_pagamento_1, 'GERAL'), v.valor_pagamento_1),
+            (v.forma_pagamento_2, COALESCE(v.subtipo_pagamento_2, 'GERAL'), v.valor_pagamento_2)
+    ) AS p(forma, bandeira, valor)
+    WHERE v.loja_id = ANY(%s)
+      AND c.data >= %s
+      AND c.data < %s
+      AND v.ignorar_faturamento = FALSE
+      AND NOT EXISTS (SELECT 1 FROM vendas_estorno e WHERE e.venda_id = v.id)
+      AND p.valor > 0
+    GROUP BY 1, 2, p.forma, p.bandeira
+"""
+
+# Vendas em DINHEIRO por (loja, dia, caixa) para a conferência de caixa, mesmas regras de validade.
+SQL_DINHEIRO_POR_CAIXA = """
+    SELECT
+        v.loja_id,
+        c.data,
+        c.id AS caixa_id,
+        SUM(p.valor) AS total
+    FROM vendas_venda v
+    INNER JOIN vendas_caixadiario c ON c.id = v.caixa_id
+    CROSS JOIN LATERAL (
+        VALUES (v.forma_pagamento, v.valor_pagamento_1), (v.forma_pagamento_2, v.valor_pagamento_2)
+    ) AS p(forma, valor)
+    WHERE v.loja_id = ANY(%s)
+      AND c.data >= %s
+      AND c.data < %s
+      AND v.ignorar_faturamento = FALSE
+      AND NOT EXISTS (SELECT 1 FROM vendas_estorno e WHERE e.venda_id = v.id)
+      AND p.valor > 0
+      AND UPPER(p.forma) LIKE '%%DINHEIRO%%'
+    GROUP BY v.loja_id, c.data, c.id
+"""
+
+GRANULARIDADE_MES = 'mes'
+GRANULARIDADE_DIA = 'dia'
+_UNIDADES_DATE_TRUNC = {GRANULARIDADE_MES: 'month', GRANULARIDADE_DIA: 'day'}
 
 class VendasClientSQL:
     """
@@ -10,6 +65,15 @@ class VendasClientSQL:
     Nome da tabela identificada: vendas_venda
     """
 
+    def __init__(self, alias: str = 'vendas', usar_consolidado: Optional[bool] = None):
+        # Alias da conexão; o benchmark usa 'default' com tabelas sintéticas
+        self.alias = alias
+        # Dias já consolidados (VendaDiariaConsolidada) são lidos do banco financeiro;
+        # o legado só é consultado a partir do primeiro dia ainda não sincronizado.
+        if usar_consolidado is None:
+            usar_consolidado = getattr(settings, 'VENDAS_USAR_CONSOLIDADO', False)
+        self.usar_consolidado = usar_consolidado
+
     def _mapear_tipo_pagamento(self, tipo_raw: str, parcelas: int) -> str:
         """
         Traduz a string do banco legado para o Enum do sistema financeiro.
@@ -42,90 +106,117 @@ class VendasClientSQL:
             
         return 'OUTRO'
 
-    def get_faturamento_por_loja(self, loja_id: int, mes: int, ano: int) -> List[FaturamentoItemDTO]:
-        
-        # SQL Otimizado para vendas_venda: Pagamentos Múltiplos (Caixa-based)
-        query = """
-            WITH vendas_validas AS (
-                SELECT v.id
-                FROM vendas_venda v
-                INNER JOIN vendas_caixadiario c ON v.caixa_id = c.id
-                LEFT JOIN vendas_estorno e ON v.id = e.venda_id
-                WHERE v.loja_id = %s
-                  AND EXTRACT(MONTH FROM c.data) = %s
-                  AND EXTRACT(YEAR FROM c.data) = %s
-                  AND v.ignorar_faturamento = FALSE
-                  AND e.id IS NULL
-            ),
-            transacoes_unificadas AS (
-                -- Pagamento 1
-                SELECT 
-                    v.forma_pagamento as forma,
-                    COALESCE(v.subtipo_pagamento_1, 'GERAL') as bandeira,
-                    v.valor_pagamento_1 as valor
-                FROM vendas_venda v
-                JOIN vendas_validas vv ON v.id = vv.id
-                WHERE v.valor_pagamento_1 > 0
-
-                UNION ALL
-
-                -- Pagamento 2
-                SELECT
-                    v.forma_pagamento_2 as forma,
-                    COALESCE(v.subtipo_pagamento_2, 'GERAL') as bandeira,
-                    v.valor_pagamento_2 as valor
-                FROM vendas_venda v
-                JOIN vendas_validas vv ON v.id = vv.id
-                WHERE v.valor_pagamento_2 > 0
-            )
-            SELECT 
-                forma,
-                bandeira,
-                SUM(valor) as total
-            FROM transacoes_unificadas
-            GROUP BY forma, bandeira
+    def _montar_item(self, tipo_raw, bandeira_raw, valor) -> FaturamentoItemDTO:
+        tipo_raw = tipo_raw if tipo_raw else ''
+        bandeira_raw = bandeira_raw if bandeira_raw else 'GERAL'
+        valor = valor if valor else Decimal('0.00')
+
+        # Assumimos 1 parcela por padrão já que a coluna não existe
+        parcelas = 1
+
+        # Usa o mapeador atualizado
+        tipo_mapeado = self._mapear_tipo_pagamento(tipo_raw, parcelas)
+
+        # Normaliza bandeira
+        bandeira_normalizada = bandeira_raw.upper().strip()
+
+        return FaturamentoItemDTO(
+            tipo_pagamento=tipo_mapeado,
+            bandeira=bandeira_normalizada,
+            parcelas=parcelas,
+            valor_bruto=Decimal(valor)
+        )
+
+    def get_faturamento_lote(
+        self,
+        lojas: Iterable[int],
+        inicio: date,
+        fim: date,
+        granularidade: str = GRANULARIDADE_MES
+    ) -> Dict[Tuple[int, date], List[FaturamentoItemDTO]]:
         """
-        
-        resultado_dtos = []
-        
+        Faturamento de várias lojas no intervalo [inicio, fim) em uma única consulta agrupada.
+
+        Retorna {(loja_id, periodo): [FaturamentoItemDTO]}, onde `periodo` é o primeiro dia do mês
+        (granularidade 'mes') ou o próprio dia ('dia'). Períodos sem vendas não aparecem no dicionário.
+        """
+        if granularidade not in _UNIDADES_DATE_TRUNC:
+            raise ValueError(f"Granularidade inválida: {granularidade}")
+
+        resultado: Dict[Tuple[int, date], List[FaturamentoItemDTO]] = {}
+        lojas = sorted(set(lojas))
+        if not lojas:
+            return resultado
+
+        linhas = []
+        inicio_legado = inicio
+        if self.usar_consolidado:
+            from ..app.services import vendas_consolidadas
+
+            consolidado_ate = vendas_consolidadas.consolidado_ate()
+            if consolidado_ate and consolidado_ate > inicio:
+                inicio_legado = min(fim, consolidado_ate)
+                linhas += vendas_consolidadas.ler_consolidado(lojas, inicio, inicio_legado, granularidade)
+
+        if inicio_legado < fim:
+            linhas += self.consultar_lote_bruto(lojas, inicio_legado, fim, granularidade)
+
+        # Um mesmo mês pode vir em parte do consolidado e em parte do legado
+        totais: Dict[tuple, Decimal] = {}
+        for loja_id, periodo, forma, bandeira, total in linhas:
+            chave = (loja_id, periodo, forma or '', bandeira or 'GERAL')
+            totais[chave] = totais.get(chave, Decimal('0.00')) + (total or Decimal('0.00'))
+
+        for (loja_id, periodo, forma, bandeira), total in totais.items():
+            resultado.setdefault((loja_id, periodo), []).append(self._montar_item(forma, bandeira, total))
+        return resultado
+
+    def consultar_lote_bruto(self, lojas: List[int], inicio: date, fim: date, granularidade: str = GRANULARIDADE_MES) -> List[tuple]:
+        """Linhas (loja_id, periodo, forma, bandeira, total) do banco legado, sem mapeamento."""
         try:
-            with connections['vendas'].cursor() as cursor:
-                cursor.execute(query, [loja_id, mes, ano])
-                rows = cursor.fetchall()
-                
-                for row in rows:
-                    tipo_raw = row[0] if row[0] else ''
-                    bandeira_raw = row[1] if row[1] else 'GERAL'
-                    valor = row[2] if row[2] else Decimal('0.00')
-                    
-                    # Assumimos 1 parcela por padrão já que a coluna não existe
-                    parcelas = 1 
-                    
-                    # Usa o mapeador atualizado
-                    tipo_mapeado = self._mapear_tipo_pagamento(tipo_raw, parcelas)
-                    
-                    # Normaliza bandeira
-                    bandeira_normalizada = bandeira_raw.upper().strip()
-                    
-                    dto = FaturamentoItemDTO(
-                        tipo_pagamento=tipo_mapeado,
-                        bandeira=bandeira_normalizada,
-                        parcelas=parcelas,
-                        valor_bruto=Decimal(valor)
-                    )
-                    resultado_dtos.append(dto)
-                    
-                    print(f"DEBUG SQL: Raw='{tipo_raw}' -> Mapeado='{tipo_mapeado}' | Valor={valor}")
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute(SQL_FATURAMENTO_LOTE, [_UNIDADES_DATE_TRUNC[granularidade], lojas, inicio, fim])
+                return cursor.fetchall()
 
         except Exception as e:
             print(f"Erro ao consultar banco vendas: {e}")
             raise e
 
-        return resultado_dtos
+    def get_faturamento_por_loja(self, loja_id: int, mes: int, ano: int) -> List[FaturamentoItemDTO]:
+        inicio, fim = intervalo_mensal(mes, ano)
+        return self.get_faturamento_lote([loja_id], inicio, fim).get((loja_id, inicio), [])
+
+    def get_dinheiro_por_caixa(self, lojas: Iterable[int], inicio: date, fim: date) -> Dict[Tuple[int, date], Dict[int, Decimal]]:
+        """
+        Vendas em dinheiro no intervalo [inicio, fim) em uma única consulta agrupada.
+        Retorna {(loja_id, dia): {caixa_id: total}}; sempre lido do legado (o consolidado não guarda o caixa).
+        """
+        resultado: Dict[Tuple[int, date], Dict[int, Decimal]] = {}
+        lojas = sorted(set(lojas))
+        if not lojas:
+            return resultado
+
+        try:
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute(SQL_DINHEIRO_POR_CAIXA, [lojas, inicio, fim])
+                linhas = cursor.fetchall()
+        except Exception as e:
+            print(f"Erro ao consultar banco vendas: {e}")
+            raise e
+
+        for loja_id, dia, caixa_id, total in linhas:
+            resultado.setdefault((loja_id, dia), {})[caixa_id] = total or Decimal('0.00')
+        return resultado
 
 class VendasAPIClientMock:
     """
     Mock mantido para compatibilidade.
     """
     def get_faturamento_por_loja(self, loja_id: int, mes: int, ano: int) -> List[FaturamentoItemDTO]:
-        return []
\ No newline at end of file
+        return []
+
+    def get_faturamento_lote(self, lojas, inicio, fim, granularidade=GRANULARIDADE_MES) -> Dict[Tuple[int, date], List[FaturamentoItemDTO]]:
+        return {}
+
+    def get_dinheiro_por_caixa(self, lojas, inicio, fim) -> Dict[Tuple[int, date], Dict[int, Decimal]]:
+        return {}
\ No newline at end of file
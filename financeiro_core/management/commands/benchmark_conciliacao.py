@@ -0,0 +1,104 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from financeiro_core.domain.conciliacao import (
+    DespesaConciliavelDTO,
+    LancamentoExtratoDTO,
+    MotorConciliacao,
+)
+
+DESCRICOES = ['ENERGIA ELETRICA', 'ALUGUEL LOJA', 'FORNECEDOR TECIDOS', 'INTERNET FIBRA', 'TARIFA BANCARIA', 'FOLHA PAGAMENTO']
+
+
+class Command(BaseCommand):
+    help = 'Mede o motor de conciliação (agrupamento por valor + busca binária) contra a comparação todos-contra-todos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=50000, help='Débitos no extrato e despesas registradas (cada lado)')
+        parser.add_argument('--tolerancia', type=int, default=3)
+        parser.add_argument('--amostra-ingenua', type=int, default=2000,
+                            help='Tamanho da amostra da comparação todos-contra-todos (extrapolada para --linhas)')
+        parser.add_argument('--valores-distintos', type=int, default=20,
+                            help='Valores distintos no cenário de valores repetidos (tarifas, parcelas fixas)')
+
+    def handle(self, *args, **options):
+        lancamentos, despesas = self._gerar(options['linhas'])
+        motor = MotorConciliacao(options['tolerancia'])
+        self._medir_motor(motor, 'Motor', lancamentos, despesas, options['linhas'])
+
+        # Pior caso para a busca por valor: poucos valores, muitas despesas iguais na mesma janela
+        repetidos = self._gerar_repetidos(options['linhas'], options['valores_distintos'])
+        self._medir_motor(motor, 'Motor (valores repetidos)', *repetidos, options['linhas'])
+
+        amostra = min(options['amostra_ingenua'], options['linhas'])
+        inicio = time.perf_counter()
+        pares = self._ingenuo(lancamentos[:amostra], despesas[:amostra], options['tolerancia'])
+        duracao = time.perf_counter() - inicio
+        estimativa = duracao * (options['linhas'] / amostra) ** 2
+        self.stdout.write(self.style.WARNING(
+            f"Todos-contra-todos: {amostra} x {amostra} em {duracao:.2f} s ({pares} pares); "
+            f"estimativa para {options['linhas']} x {options['linhas']}: {estimativa:.0f} s"
+        ))
+
+    def _medir_motor(self, motor, titulo, lancamentos, despesas, linhas: int):
+        inicio = time.perf_counter()
+        resultado = motor.conciliar(lancamentos, despesas)
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {linhas} x {linhas} em {duracao:.2f} s | "
+            f"{len(resultado.pares)} pares, {len(resultado.lancamentos_sem_par)} lançamentos e "
+            f"{len(resultado.despesas_sem_par)} despesas sem par"
+        ))
+
+    def _gerar(self, quantidade: int):
+        rnd = random.Random(42)
+        base = date(2024, 1, 1)
+        lancamentos, despesas = [], []
+        for i in range(quantidade):
+            dia = base + timedelta(days=rnd.randint(0, 365))
+            valor = Decimal(rnd.randint(1000, 5000000)) / 100
+            descricao = rnd.choice(DESCRICOES)
+            despesas.append(DespesaConciliavelDTO(id=i, data=dia, valor=valor, descricao=f'{descricao} {i % 97}'))
+            # ~80% das despesas aparecem no extrato, com alguns dias de atraso
+            if rnd.random() < 0.8:
+                lancamentos.append(LancamentoExtratoDTO(
+                    chave=i, data=dia + timedelta(days=rnd.randint(0, 2)), valor=valor, descricao=f'PAGTO {descricao}'
+                ))
+            else:
+                lancamentos.append(LancamentoExtratoDTO(
+                    chave=i, data=dia, valor=Decimal(rnd.randint(1000, 5000000)) / 100, descricao='PIX AVULSO'
+                ))
+        rnd.shuffle(despesas)
+        return lancamentos, despesas
+
+    def _gerar_repetidos(self, quantidade: int, valores_distintos: int):
+        rnd = random.Random(42)
+        base = date(2024, 1, 1)
+        valores = [Decimal(rnd.randint(1000, 50000)) / 100 for _ in range(valores_distintos)]
+        lancamentos, despesas = [], []
+        for i in range(quantidade):
+            dia = base + timedelta(days=rnd.randint(0, 30))
+            valor = rnd.choice(valores)
+            descricao = rnd.choice(DESCRICOES)
+            despesas.append(DespesaConciliavelDTO(id=i, data=dia, valor=valor, descricao=f'{descricao} {i % 97}'))
+            lancamentos.append(LancamentoExtratoDTO(
+                chave=i, data=dia + timedelta(days=rnd.randint(0, 2)), valor=valor, descricao=f'PAGTO {descricao}'
+            ))
+        rnd.shuffle(despesas)
+        return lancamentos, despesas
+
+    @staticmethod
+    def _ingenuo(lancamentos, despesas, tolerancia: int) -> int:
+        usadas, pares = set(), 0
+        for lancamento in lancamentos:
+            for despesa in despesas:
+                if (despesa.id not in usadas and despesa.valor == lancamento.valor
+                        and abs((despesa.data - lancamento.data).days) <= tolerancia):
+                    usadas.add(despesa.id)
+                    pares += 1
+                    break
+        return pares
@@ -0,0 +1,163 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from financeiro_core.app.services.periodos import intervalo_mensal
+from financeiro_core.infrastructure.vendas_client import SQL_FATURAMENTO_LOTE
+
+
+class _Rollback(Exception):
+    """Usada para descartar as tabelas sintéticas ao final do benchmark."""
+
+
+# Consulta anterior (dupla leitura de vendas_venda com UNION ALL), mantida só para comparação
+SQL_FATURAMENTO_ANTERIOR = """
+    WITH vendas_validas AS (
+        SELECT v.id
+        FROM vendas_venda v
+        INNER JOIN vendas_caixadiario c ON v.caixa_id = c.id
+        LEFT JOIN vendas_estorno e ON v.id = e.venda_id
+        WHERE v.loja_id = %s
+          AND EXTRACT(MONTH FROM c.data) = %s
+          AND EXTRACT(YEAR FROM c.data) = %s
+          AND v.ignorar_faturamento = FALSE
+          AND e.id IS NULL
+    ),
+    transacoes_unificadas AS (
+        SELECT v.forma_pagamento as forma, COALESCE(v.subtipo_pagamento_1, 'GERAL') as bandeira, v.valor_pagamento_1 as valor
+        FROM vendas_venda v
+        JOIN vendas_validas vv ON v.id = vv.id
+        WHERE v.valor_pagamento_1 > 0
+
+        UNION ALL
+
+        SELECT v.forma_pagamento_2 as forma, COALESCE(v.subtipo_pagamento_2, 'GERAL') as bandeira, v.valor_pagamento_2 as valor
+        FROM vendas_venda v
+        JOIN vendas_validas vv ON v.id = vv.id
+        WHERE v.valor_pagamento_2 > 0
+    )
+    SELECT forma, bandeira, SUM(valor) as total
+    FROM transacoes_unificadas
+    GROUP BY forma, bandeira
+"""
+
+# Tabelas temporárias com o mesmo nome das legadas: no Postgres elas têm precedência
+# no search_path, então as consultas rodam sem alteração no banco 'default'.
+DDL_LEGADO = """
+    CREATE TEMP TABLE vendas_caixadiario (id integer PRIMARY KEY, loja_id integer, data date) ON COMMIT DROP;
+    CREATE TEMP TABLE vendas_venda (
+        id integer PRIMARY KEY, loja_id integer, caixa_id integer, ignorar_faturamento boolean,
+        forma_pagamento varchar(50), subtipo_pagamento_1 varchar(50), valor_pagamento_1 numeric(12,2),
+        forma_pagamento_2 varchar(50), subtipo_pagamento_2 varchar(50), valor_pagamento_2 numeric(12,2)
+    ) ON COMMIT DROP;
+    CREATE TEMP TABLE vendas_estorno (id serial PRIMARY KEY, venda_id integer) ON COMMIT DROP;
+"""
+
+# Índices que o Django cria para as FKs do sistema legado, mais um índice em caixadiario.data
+# (só aproveitável pelo filtro em intervalo; EXTRACT() sobre a coluna não usa índice).
+INDICES_LEGADO = """
+    CREATE INDEX ON vendas_venda (loja_id);
+    CREATE INDEX ON vendas_venda (caixa_id);
+    CREATE INDEX ON vendas_caixadiario (loja_id);
+    CREATE INDEX ON vendas_caixadiario (data);
+    CREATE INDEX ON vendas_estorno (venda_id);
+    ANALYZE vendas_caixadiario;
+    ANALYZE vendas_venda;
+    ANALYZE vendas_estorno;
+"""
+
+
+class Command(BaseCommand):
+    help = 'Compara a consulta de faturamento antiga (UNION ALL) com o unpivot LATERAL em um esquema legado sintético'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loja', type=int, default=1)
+        parser.add_argument('--mes', type=int, default=6)
+        parser.add_argument('--ano', type=int, default=2025)
+        parser.add_argument('--lojas', type=int, default=20, help='Quantidade de lojas sintéticas')
+        parser.add_argument('--vendas', type=int, default=500000, help='Quantidade de vendas sintéticas')
+        parser.add_argument('--repeticoes', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('O benchmark usa LATERAL/TEMP TABLE e requer PostgreSQL no banco default.')
+
+        loja, mes, ano = options['loja'], options['mes'], options['ano']
+        inicio, fim = intervalo_mensal(mes, ano)
+        consultas = {
+            'UNION ALL (leitura dupla)': (SQL_FATURAMENTO_ANTERIOR, [loja, mes, ano]),
+            'LATERAL VALUES + NOT EXISTS': (SQL_FATURAMENTO_LOTE, ['month', [loja], inicio, fim]),
+        }
+
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                self._popular(cursor, options['lojas'], options['vendas'])
+
+                resultados = {}
+                for nome, (sql, params) in consultas.items():
+                    self.stdout.write(self.style.WARNING(f'\n--- {nome} ---'))
+                    cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                    self.stdout.write('\n'.join(linha[0] for linha in cursor.fetchall()))
+
+                    inicio_exec = time.perf_counter()
+                    for _ in range(options['repeticoes']):
+                        cursor.execute(sql, params)
+                        linhas = cursor.fetchall()
+                    media_ms = (time.perf_counter() - inicio_exec) * 1000 / options['repeticoes']
+                    self.stdout.write(self.style.SUCCESS(f'Tempo médio: {media_ms:.2f} ms'))
+
+                    # A consulta em lote traz (loja, período) à frente de (forma, bandeira, total)
+                    linhas = [linha[-3:] for linha in linhas]
+                    resultados[nome] = sorted(linhas, key=lambda linha: (str(linha[0]), str(linha[1])))
+
+                anterior, novo = resultados.values()
+                if anterior == novo:
+                    self.stdout.write(self.style.SUCCESS(f'\nResultados idênticos ({len(novo)} grupos).'))
+                else:
+                    self.stdout.write(self.style.ERROR('\nResultados divergentes!'))
+                    self.stdout.write(f'Anterior: {anterior}\nNovo: {novo}')
+
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('\nTabelas sintéticas descartadas (rollback).')
+
+    def _popular(self, cursor, qtd_lojas: int, qtd_vendas: int):
+        self.stdout.write(f'Gerando {qtd_vendas} vendas sintéticas em {qtd_lojas} lojas...')
+        cursor.execute(DDL_LEGADO)
+
+        rnd = random.Random(42)
+        base = date(2022, 1, 1)
+        dias = 365 * 4
+
+        # Um caixa por loja por dia
+        caixas = [(loja * dias + d, loja, base + timedelta(days=d)) for loja in range(1, qtd_lojas + 1) for d in range(dias)]
+        cursor.executemany('INSERT INTO vendas_caixadiario (id, loja_id, data) VALUES (%s, %s, %s)', caixas)
+
+        formas = ['DINHEIRO', 'PIX', 'CARTAO DEBITO', 'CARTAO CREDITO', None]
+        bandeiras = ['VISA', 'MASTER', 'ELO', None]
+        lote, estornos = [], []
+        for venda_id in range(1, qtd_vendas + 1):
+            _, loja, _ = caixa = caixas[rnd.randrange(len(caixas))]
+            segundo = rnd.random() < 0.3
+            lote.append((
+                venda_id, loja, caixa[0], rnd.random() < 0.02,
+                rnd.choice(formas[:-1]), rnd.choice(bandeiras), rnd.randint(0, 50000) / 100,
+                rnd.choice(formas) if segundo else None, rnd.choice(bandeiras) if segundo else None,
+                rnd.randint(1, 20000) / 100 if segundo else 0,
+            ))
+            if rnd.random() < 0.01:
+                estornos.append((venda_id,))
+            if len(lote) == 10000:
+                self._inserir_vendas(cursor, lote)
+                lote = []
+        self._inserir_vendas(cursor, lote)
+        cursor.executemany('INSERT INTO vendas_estorno (venda_id) VALUES (%s)', estornos)
+        cursor.execute(INDICES_LEGADO)
+
+    def _inserir_vendas(self, cursor, lote):
+        cursor.executemany(
+            'INSERT INTO vendas_venda VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)', lote
+        )
@@ -0,0 +1,93 @@
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from financeiro_core.app.services.ofx_parser import OfxParserService
+
+CABECALHO_SGML = (
+    "OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\nCHARSET:1252\n"
+    "COMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n"
+)
+CABECALHO_XML = '<?xml version="1.0" encoding="UTF-8"?>\n<?OFX OFXHEADER="200" VERSION="211" SECURITY="NONE"?>\n'
+
+DESCRICOES = ['PIX ENVIADO FORNECEDOR', 'TARIFA BANCÁRIA', 'PAGTO BOLETO ENERGIA', 'TED RECEBIDA', 'COMPRA CARTÃO DÉBITO']
+
+
+class Command(BaseCommand):
+    help = 'Mede tempo e pico de memória do parser OFX em extratos sintéticos grandes (SGML e XML)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transacoes', type=int, default=200000, help='Transações por extrato sintético')
+        parser.add_argument('--formato', choices=['sgml', 'xml', 'ambos'], default='ambos')
+
+    def handle(self, *args, **options):
+        formatos = ['sgml', 'xml'] if options['formato'] == 'ambos' else [options['formato']]
+
+        for formato in formatos:
+            caminho = self._gerar(formato, options['transacoes'])
+            try:
+                tamanho_mb = os.path.getsize(caminho) / 1024 / 1024
+                self.stdout.write(self.style.WARNING(
+                    f"\n--- {formato.upper()}: {options['transacoes']} transações ({tamanho_mb:.1f} MB) ---"
+                ))
+
+                # Streaming: o arquivo é lido em blocos e as transações consumidas uma a uma
+                def streaming():
+                    with open(caminho, 'rb') as arquivo:
+                        return sum(1 for _ in OfxParserService.iterar_transacoes(arquivo))
+
+                # Conteúdo inteiro em memória, como num upload lido com .read()
+                def em_memoria():
+                    with open(caminho, 'rb') as arquivo:
+                        return len(OfxParserService.parse(arquivo.read()))
+
+                self._medir('iterar_transacoes (arquivo)', streaming)
+                self._medir('parse (bytes em memória)', em_memoria)
+            finally:
+                os.remove(caminho)
+
+    def _medir(self, nome: str, funcao):
+        inicio = time.perf_counter()
+        total = funcao()
+        duracao = time.perf_counter() - inicio
+
+        # O tracemalloc deixa a execução bem mais lenta: o pico é medido numa segunda passada
+        tracemalloc.start()
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(self.style.SUCCESS(
+            f'{nome}: {total} transações em {duracao:.2f} s, pico de memória {pico / 1024 / 1024:.1f} MB'
+        ))
+
+    def _gerar(self, formato: str, quantidade: int) -> str:
+        rnd = random.Random(42)
+        base = date(2024, 1, 1)
+        xml = formato == 'xml'
+
+        with tempfile.NamedTemporaryFile('w', suffix='.ofx', delete=False, encoding='utf-8' if xml else 'cp1252') as arquivo:
+            arquivo.write(CABECALHO_XML if xml else CABECALHO_SGML)
+            arquivo.write('<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n')
+            for i in range(quantidade):
+                dia = base + timedelta(days=rnd.randint(0, 365))
+                valor = rnd.randint(-500000, 500000) / 100
+                descricao = rnd.choice(DESCRICOES)
+                campos = [
+                    ('TRNTYPE', 'DEBIT' if valor < 0 else 'CREDIT'),
+                    ('DTPOSTED', f'{dia:%Y%m%d}120000[-3:BRT]'),
+                    ('TRNAMT', f'{valor:.2f}'),
+                    ('FITID', f'{i:012d}'),
+                    ('NAME' if i % 2 else 'MEMO', f'{descricao} {i}'),
+                ]
+                if xml:
+                    corpo = ''.join(f'<{tag}>{texto}</{tag}>' for tag, texto in campos)
+                else:
+                    corpo = ''.join(f'<{tag}>{texto}\n' for tag, texto in campos)
+                arquivo.write(f'<STMTTRN>{corpo}</STMTTRN>\n')
+            arquivo.write('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+            return arquivo.name
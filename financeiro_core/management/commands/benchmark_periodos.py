@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from financeiro_core.models import ContaPagar, CategoriaDespesa
+from financeiro_core.app.services.periodos import filtro_mensal
+
+
+class _Rollback(Exception):
+    """Usada para descartar os dados sintéticos ao final do benchmark."""
+
+
+class Command(BaseCommand):
+    help = 'Compara o plano de execução do filtro mensal com EXTRACT() vs intervalo semiaberto (índices compostos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loja', type=int, default=1)
+        parser.add_argument('--mes', type=int, default=6)
+        parser.add_argument('--ano', type=int, default=2025)
+        parser.add_argument('--lojas', type=int, default=20, help='Quantidade de lojas sintéticas')
+        parser.add_argument('--despesas', type=int, default=200000, help='Quantidade de despesas sintéticas')
+        parser.add_argument('--repeticoes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        loja, mes, ano = options['loja'], options['mes'], options['ano']
+
+        consultas = {
+            'EXTRACT (month/year)': ContaPagar.objects.filter(
+                loja_id_externo=loja, data_transacao__month=mes, data_transacao__year=ano
+            ),
+            'Intervalo [inicio, fim)': ContaPagar.objects.filter(
+                loja_id_externo=loja, **filtro_mensal('data_transacao', mes, ano)
+            ),
+        }
+
+        try:
+            # Os dados sintéticos vivem apenas dentro desta transação
+            with transaction.atomic():
+                self._popular(options['lojas'], options['despesas'])
+
+                for nome, qs in consultas.items():
+                    qs = qs.values('categoria_id').order_by()
+                    self.stdout.write(self.style.WARNING(f'\n--- {nome} ---'))
+                    self.stdout.write(qs.explain(analyze=True))
+
+                    inicio = time.perf_counter()
+                    for _ in range(options['repeticoes']):
+                        list(qs.all())
+                    media_ms = (time.perf_counter() - inicio) * 1000 / options['repeticoes']
+                    self.stdout.write(self.style.SUCCESS(f'Tempo médio: {media_ms:.2f} ms'))
+
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('\nDados sintéticos descartados (rollback).')
+
+    def _popular(self, qtd_lojas: int, qtd_despesas: int):
+        self.stdout.write(f'Gerando {qtd_despesas} despesas sintéticas em {qtd_lojas} lojas...')
+        categoria = CategoriaDespesa.objects.create(nome='Benchmark', grupo_contabil='ADMINISTRATIVA')
+        rnd = random.Random(42)
+        base = date(2020, 1, 1)
+
+        lote = []
+        for i in range(qtd_despesas):
+            dia = base + timedelta(days=rnd.randint(0, 365 * 6))
+            valor = Decimal(rnd.randint(100, 500000)) / 100
+            lote.append(ContaPagar(
+                descricao=f'Despesa sintética {i}',
+                loja_id_externo=rnd.randint(1, qtd_lojas),
+                categoria=categoria,
+                valor_bruto=valor,
+                valor_liquido=valor,
+                data_competencia=dia,
+                data_transacao=dia,
+            ))
+            if len(lote) == 5000:
+                ContaPagar.objects.bulk_create(lote)
+                lote = []
+        ContaPagar.objects.bulk_create(lote)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {ContaPagar._meta.db_table}')
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from financeiro_core.app.services import saldos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o saldo de todas as contas a partir das movimentações e aponta divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help='Grava o saldo do razão nas contas divergentes')
+        parser.add_argument(
+            '--pontos-controle', nargs='?', const='', type=str, metavar='AAAA-MM-DD',
+            help='Regera os saldos diários até a data (padrão: ontem)'
+        )
+
+    def handle(self, *args, **options):
+        divergentes = saldos.divergencias_saldo(corrigir=options['corrigir'])
+        for item in divergentes:
+            self.stdout.write(self.style.WARNING(
+                f" - Conta {item['conta_id']} ({item['nome']}): atual={item['saldo_atual']} "
+                f"razão={item['saldo_razao']} diferença={item['diferenca']}"
+            ))
+
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS('Saldos conferem com as movimentações.'))
+        elif options['corrigir']:
+            self.stdout.write(self.style.SUCCESS(f'{len(divergentes)} contas corrigidas.'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{len(divergentes)} contas divergentes (use --corrigir).'))
+
+        if options['pontos_controle'] is not None:
+            ate = date.fromisoformat(options['pontos_controle']) if options['pontos_controle'] else None
+            gravados = saldos.gerar_pontos_controle(ate)
+            self.stdout.write(self.style.SUCCESS(f'{gravados} saldos diários gravados.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from financeiro_core.app.services import agregados_mensais
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela de agregados mensais de despesas (todas as lojas ou uma loja)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loja', type=int, help='Reconstrói apenas esta loja')
+
+    def handle(self, *args, **options):
+        periodos = sorted(agregados_mensais.periodos_existentes(options.get('loja')))
+        self.stdout.write(f'Recalculando {len(periodos)} períodos...')
+
+        for loja_id, mes, ano, regime in periodos:
+            agregados_mensais.recalcular_periodo(loja_id, mes, ano, regime)
+            self.stdout.write(f' - Loja {loja_id} {mes:02d}/{ano} ({regime})')
+
+        self.stdout.write(self.style.SUCCESS('Agregados reconstruídos.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from financeiro_core.app.services import permissoes_lojas
+
+
+class Command(BaseCommand):
+    help = 'Atualiza o espelho local de permissões de loja a partir do banco de vendas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, action='append', help='Sincroniza apenas este user_id (pode repetir)')
+        parser.add_argument('--alias', default='vendas', help='Alias do banco de vendas')
+
+    def handle(self, *args, **options):
+        resultado = permissoes_lojas.sincronizar(alias=options['alias'], user_ids=options.get('usuario'))
+        self.stdout.write(
+            f"Usuários: {resultado['usuarios']} | Criadas: {resultado['criadas']} | "
+            f"Alteradas: {resultado['alteradas']} | Removidas: {resultado['removidas']}"
+        )
+        self.stdout.write(self.style.SUCCESS('Permissões sincronizadas.'))
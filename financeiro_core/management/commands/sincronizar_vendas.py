@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from financeiro_core.app.services import vendas_consolidadas
+
+
+class Command(BaseCommand):
+    help = 'Atualiza a tabela local de vendas diárias consolidadas a partir do banco de vendas (incremental)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Relê todos os dias a partir desta data (AAAA-MM-DD)')
+        parser.add_argument('--hoje', type=date.fromisoformat, help='Data de referência: só dias anteriores são consolidados')
+        parser.add_argument('--alias', default='vendas', help='Alias do banco de vendas')
+
+    def handle(self, *args, **options):
+        resultado = vendas_consolidadas.sincronizar(
+            alias=options['alias'], hoje=options.get('hoje'), desde=options.get('desde')
+        )
+        self.stdout.write(
+            f"Dias atualizados: {resultado['dias_atualizados']} | Linhas gravadas: {resultado['linhas_gravadas']}"
+        )
+        self.stdout.write(
+            f"Marcas d'água: caixa={resultado['ultimo_caixa_id']} estorno={resultado['ultimo_estorno_id']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Vendas consolidadas até {resultado['consolidado_ate']:%d/%m/%Y} (exclusivo)."))
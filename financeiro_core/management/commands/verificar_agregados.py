@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from financeiro_core.app.services import agregados_mensais
+
+
+class Command(BaseCommand):
+    help = 'Compara os agregados mensais gravados com um recálculo completo das despesas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loja', type=int, help='Verifica apenas esta loja')
+        parser.add_argument('--corrigir', action='store_true', help='Recalcula os períodos divergentes')
+
+    def handle(self, *args, **options):
+        periodos = sorted(agregados_mensais.periodos_existentes(options.get('loja')))
+        divergentes = 0
+
+        for loja_id, mes, ano, regime in periodos:
+            divergencias = agregados_mensais.divergencias_periodo(loja_id, mes, ano, regime)
+            if not divergencias:
+                continue
+
+            divergentes += 1
+            self.stdout.write(self.style.WARNING(f'Loja {loja_id} {mes:02d}/{ano} ({regime}):'))
+            for divergencia in divergencias:
+                self.stdout.write(f'   {divergencia}')
+
+            if options['corrigir']:
+                agregados_mensais.recalcular_periodo(loja_id, mes, ano, regime)
+                self.stdout.write(self.style.SUCCESS('   -> recalculado'))
+
+        if divergentes and not options['corrigir']:
+            raise CommandError(f'{divergentes} de {len(periodos)} períodos divergentes. Use --corrigir para recalcular.')
+        self.stdout.write(self.style.SUCCESS(f'{len(periodos)} períodos verificados, {divergentes} divergentes.'))
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0005_remove_contapagar_data_vencimento_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contapagar",
+            index=models.Index(
+                fields=["loja_id_externo", "data_transacao"],
+                name="contapagar_loja_transacao_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contapagar",
+            index=models.Index(
+                fields=["loja_id_externo", "data_competencia"],
+                name="contapagar_loja_compet_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movimentacaocaixa",
+            index=models.Index(
+                fields=["loja_id_externo", "data_ocorrencia"],
+                name="movcaixa_loja_ocorrencia_idx",
+            ),
+        ),
+    ]
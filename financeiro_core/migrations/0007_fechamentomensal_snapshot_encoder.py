@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0006_indices_periodo"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fechamentomensal",
+            name="dados_auditoria_snapshot",
+            field=models.JSONField(
+                blank=True,
+                encoder=django.core.serializers.json.DjangoJSONEncoder,
+                null=True,
+            ),
+        ),
+    ]
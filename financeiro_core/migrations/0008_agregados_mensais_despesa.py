@@ -0,0 +1,133 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0007_fechamentomensal_snapshot_encoder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PeriodoAgregadoDespesa",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("loja_id_externo", models.IntegerField()),
+                ("ano", models.IntegerField()),
+                ("mes", models.IntegerField()),
+                (
+                    "regime",
+                    models.CharField(
+                        choices=[
+                            ("CAIXA", "Caixa (data_transacao)"),
+                            ("COMPETENCIA", "Competência (data_competencia)"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("quantidade_despesas_consideradas", models.IntegerField(default=0)),
+                ("quantidade_despesas_sem_rateio", models.IntegerField(default=0)),
+                (
+                    "quantidade_despesas_com_rateio_valido",
+                    models.IntegerField(default=0),
+                ),
+                (
+                    "quantidade_despesas_com_rateio_invalido",
+                    models.IntegerField(default=0),
+                ),
+                (
+                    "valor_despesas_com_rateio_invalido",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=15
+                    ),
+                ),
+                (
+                    "valor_total_despesas_consideradas",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=15
+                    ),
+                ),
+                (
+                    "valor_splits_rateio_invalido",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=15
+                    ),
+                ),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Período Agregado de Despesas",
+                "verbose_name_plural": "Períodos Agregados de Despesas",
+                "unique_together": {("loja_id_externo", "ano", "mes", "regime")},
+            },
+        ),
+        migrations.CreateModel(
+            name="AgregadoMensalDespesa",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("loja_id_externo", models.IntegerField()),
+                ("ano", models.IntegerField()),
+                ("mes", models.IntegerField()),
+                (
+                    "regime",
+                    models.CharField(
+                        choices=[
+                            ("CAIXA", "Caixa (data_transacao)"),
+                            ("COMPETENCIA", "Competência (data_competencia)"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("grupo_contabil", models.CharField(max_length=50)),
+                (
+                    "total",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=15
+                    ),
+                ),
+                ("quantidade_lancamentos", models.IntegerField(default=0)),
+                (
+                    "categoria",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="agregados_mensais",
+                        to="financeiro_core.categoriadespesa",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Agregado Mensal de Despesas",
+                "verbose_name_plural": "Agregados Mensais de Despesas",
+                "unique_together": {
+                    (
+                        "loja_id_externo",
+                        "ano",
+                        "mes",
+                        "regime",
+                        "categoria",
+                        "grupo_contabil",
+                    )
+                },
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0008_agregados_mensais_despesa"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SincronizacaoVendas",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ultimo_caixa_id",
+                    models.BigIntegerField(
+                        default=0,
+                        help_text="Maior vendas_caixadiario.id já consolidado",
+                    ),
+                ),
+                (
+                    "ultimo_estorno_id",
+                    models.BigIntegerField(
+                        default=0, help_text="Maior vendas_estorno.id já processado"
+                    ),
+                ),
+                (
+                    "consolidado_ate",
+                    models.DateField(
+                        blank=True,
+                        help_text="Dias anteriores a esta data estão consolidados",
+                        null=True,
+                    ),
+                ),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Sincronização de Vendas",
+                "verbose_name_plural": "Sincronizações de Vendas",
+            },
+        ),
+        migrations.CreateModel(
+            name="VendaDiariaConsolidada",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("loja_id_externo", models.IntegerField()),
+                (
+                    "data",
+                    models.DateField(
+                        help_text="Data do caixa diário (vendas_caixadiario.data)"
+                    ),
+                ),
+                ("forma", models.CharField(blank=True, default="", max_length=50)),
+                ("bandeira", models.CharField(default="GERAL", max_length=50)),
+                ("total", models.DecimalField(decimal_places=2, max_digits=15)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Venda Diária Consolidada",
+                "verbose_name_plural": "Vendas Diárias Consolidadas",
+                "unique_together": {("loja_id_externo", "data", "forma", "bandeira")},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0009_vendas_consolidadas"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SincronizacaoPermissoesUsuario",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id_externo", models.IntegerField(unique=True)),
+                ("sincronizado_em", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Sincronização de Permissões",
+                "verbose_name_plural": "Sincronizações de Permissões",
+            },
+        ),
+        migrations.CreateModel(
+            name="PermissaoLojaUsuario",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id_externo", models.IntegerField()),
+                ("loja_id_externo", models.IntegerField()),
+                ("loja_nome", models.CharField(max_length=255)),
+                ("role", models.CharField(max_length=20)),
+            ],
+            options={
+                "verbose_name": "Permissão de Loja",
+                "verbose_name_plural": "Permissões de Loja",
+                "unique_together": {("user_id_externo", "loja_id_externo")},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0010_permissoes_loja_usuario"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contapagar",
+            index=models.Index(
+                condition=models.Q(("data_pagamento__isnull", True)),
+                fields=["loja_id_externo", "data_transacao"],
+                name="contapagar_loja_pendente_idx",
+            ),
+        ),
+    ]
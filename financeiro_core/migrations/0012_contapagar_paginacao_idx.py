@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0011_contapagar_pendentes_idx"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="contapagar",
+            name="contapagar_loja_transacao_idx",
+        ),
+        migrations.AddIndex(
+            model_name="contapagar",
+            index=models.Index(
+                fields=["loja_id_externo", "data_transacao", "id"],
+                name="contapagar_loja_trans_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0012_contapagar_paginacao_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SaldoDiarioConta",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("data", models.DateField()),
+                ("saldo", models.DecimalField(decimal_places=2, max_digits=15)),
+                (
+                    "conta",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="saldos_diarios",
+                        to="financeiro_core.contabancaria",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Saldo Diário da Conta",
+                "verbose_name_plural": "Saldos Diários das Contas",
+                "unique_together": {("conta", "data")},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0013_saldo_diario_conta"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movimentacaocaixa",
+            index=models.Index(
+                fields=["conta", "data_ocorrencia", "id"],
+                name="movcaixa_conta_ocorr_id_idx",
+            ),
+        ),
+    ]
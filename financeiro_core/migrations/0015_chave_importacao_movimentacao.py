@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0014_extrato_conta_indice"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movimentacaocaixa",
+            name="chave_importacao",
+            field=models.CharField(
+                blank=True,
+                help_text="Identidade da linha do extrato importado (FITID ou hash do conteúdo); vazia nos lançamentos manuais",
+                max_length=80,
+                null=True,
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="movimentacaocaixa",
+            unique_together={("conta", "chave_importacao")},
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0015_chave_importacao_movimentacao"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="contapagar",
+            name="contapagar_loja_trans_id_idx",
+        ),
+        migrations.AddIndex(
+            model_name="contapagar",
+            index=models.Index(
+                models.F("loja_id_externo"),
+                models.OrderBy(models.F("data_transacao"), descending=True, nulls_last=True),
+                models.OrderBy(models.F("id"), descending=True),
+                name="contapagar_loja_trans_id_idx",
+            ),
+        ),
+    ]
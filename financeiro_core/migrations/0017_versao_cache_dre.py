@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financeiro_core", "0016_contapagar_paginacao_desc_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersaoCacheDRE",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("chave", models.CharField(max_length=80, unique=True)),
+                ("versao", models.BigIntegerField()),
+            ],
+            options={
+                "verbose_name": "Versão do Cache de DRE",
+                "verbose_name_plural": "Versões do Cache de DRE",
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 from financeiro_core.models import ContaPagar, CategoriaDespesa, FechamentoMensal, Fornecedor
 from decimal import Decimal
@@ -164,6 +164,171 @@ class DespesasApiTest(TestCase):
         self.assertGreaterEqual(data['despesas_atrasadas'], 1)
         self.assertGreaterEqual(data['despesas_vencendo_semana'], 1)
 
+    def test_listagem_paginada_por_cursor(self):
+        datas = [date(2024, 10, 5), date(2024, 10, 5), date(2024, 10, 9), None, date(2024, 9, 1)]
+        for i, data in enumerate(datas):
+            ContaPagar.objects.create(
+                descricao=f"D{i}", loja_id_externo=self.loja_id, categoria=self.categoria,
+                valor_bruto=Decimal('10.00') + i, data_competencia=date(2024, 10, 1), data_transacao=data,
+            )
+
+        ids, cursor, paginas = [], None, 0
+        while True:
+            url = "/despesas/?limite=2" + (f"&cursor={cursor}" if cursor else "")
+            response = self.client.get(url, headers=self.auth_headers)
+            self.assertEqual(response.status_code, 200)
+            ids += [d['id'] for d in response.json()]
+            paginas += 1
+            cursor = response.headers.get('X-Proximo-Cursor')
+            if not cursor:
+                break
+
+        esperado = [d.id for d in sorted(
+            ContaPagar.objects.filter(loja_id_externo=self.loja_id),
+            key=lambda d: (d.data_transacao is not None, d.data_transacao or date.min, d.id), reverse=True,
+        )]
+        self.assertEqual(ids, esperado)
+        self.assertEqual(paginas, (len(esperado) + 1) // 2)
+
+        # A página só lê a cauda de datas nulas quando a faixa das datas não a completa
+        from financeiro_core.app.services import paginacao
+        qs = ContaPagar.objects.filter(loja_id_externo=self.loja_id).values_list('id', flat=True)
+        ultima_datada = len(esperado) - 1 - sum(1 for d in datas if d is None)
+        antes, na_fronteira = [
+            (ContaPagar.objects.get(id=esperado[i]).data_transacao, esperado[i]) for i in (ultima_datada - 2, ultima_datada - 1)
+        ]
+        with self.assertNumQueries(1):
+            self.assertEqual(paginacao.pagina_decrescente(qs, 'data_transacao', 2, antes), esperado[ultima_datada - 1:ultima_datada + 1])
+        with self.assertNumQueries(2):
+            self.assertEqual(paginacao.pagina_decrescente(qs, 'data_transacao', 2, na_fronteira), esperado[ultima_datada:ultima_datada + 2])
+
+        response = self.client.get("/despesas/?valor_min=12&valor_max=13", headers=self.auth_headers)
+        self.assertEqual(sorted(d['descricao'] for d in response.json()), ['D2', 'D3'])
+        self.assertEqual(response.json()[0]['categoria']['nome'], "Teste Cat")
+
+    def test_listagem_paginada_usa_faixa_do_indice(self):
+        from django.db import connection
+        from financeiro_core.app.services import paginacao
+
+        if connection.vendor != 'postgresql':
+            self.skipTest("Plano de execução específico do Postgres")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        qs = ContaPagar.objects.filter(loja_id_externo=self.loja_id)
+        consultas = [qs] + [
+            qs.filter(faixa) for faixa in paginacao.faixas_apos_cursor_decrescente('data_transacao', date(2024, 10, 5), 10)
+        ]
+        for consulta in consultas:
+            plano = consulta.order_by(*paginacao.ordenacao_decrescente('data_transacao'))[:50].explain()
+            # Varredura do índice na própria ordem da listagem: sem ordenação (top-N) depois
+            self.assertIn('contapagar_loja_trans_id_idx', plano)
+            self.assertNotIn('Sort', plano)
+
+    def test_criacao_em_lote_com_sucesso_parcial(self):
+        from financeiro_core.models import RateioDespesa, AgregadoMensalDespesa
+
+        outra = CategoriaDespesa.objects.create(nome="Outra", ativa=True)
+        item = {
+            "descricao": "Lote", "categoria_id": self.categoria.id, "valor": "90.00",
+            "data_competencia": "2024-10-01", "data_transacao": "2024-10-03",
+        }
+        itens = [
+            {**item, "rateios": [{"descricao": "A", "valor": "60.00"}, {"descricao": "B", "valor": "30.00", "categoria_id": outra.id}]},
+            {**item, "categoria_id": 999999},
+            {**item, "data_competencia": f"{self.ano_fechado}-{self.mes_fechado:02d}-01"},
+            {**item, "descricao": "Lote 2", "fornecedor_id": self.fornecedor.id},
+        ]
+        response = self.client.post("/despesas/bulk", json={"itens": itens}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual([c['indice'] for c in data['criadas']], [0, 3])
+        self.assertEqual([e['indice'] for e in data['erros']], [1, 2])
+        self.assertIn("mês fechado", data['erros'][1]['erro'])
+
+        criada = ContaPagar.objects.get(id=data['criadas'][0]['id'])
+        self.assertEqual(criada.valor_liquido, Decimal('90.00'))
+        self.assertEqual(
+            sorted(RateioDespesa.objects.filter(despesa=criada).values_list('categoria_id', flat=True)),
+            sorted([self.categoria.id, outra.id]),
+        )
+        # Agregado do mês recalculado na mesma operação
+        self.assertTrue(AgregadoMensalDespesa.objects.filter(loja_id_externo=self.loja_id, mes=10, ano=2024, categoria=outra).exists())
+
+    def test_edicao_aplica_apenas_diferencas_dos_rateios(self):
+        from financeiro_core.models import RateioDespesa
+        from financeiro_core.app.services.rateios import sincronizar_rateios
+        from ninja import Schema
+
+        a = RateioDespesa.objects.create(despesa=self.despesa_aberta, descricao="A", valor=Decimal('60.00'), categoria=self.categoria)
+        b = RateioDespesa.objects.create(despesa=self.despesa_aberta, descricao="B", valor=Decimal('40.00'), categoria=self.categoria)
+
+        payload = {
+            "descricao": "Despesa Aberta", "categoria_id": self.categoria.id, "valor": "100.00",
+            "data_competencia": f"{self.ano_aberto}-{self.mes_aberto:02d}-15",
+            "data_transacao": f"{self.ano_aberto}-{self.mes_aberto:02d}-20",
+            "rateios": [{"id": a.id, "descricao": "A", "valor": "60.00"}, {"descricao": "C", "valor": "40.00"}],
+        }
+        response = self.client.put(f"/despesas/{self.despesa_aberta.id}", json=payload, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+
+        # B foi reaproveitado como C; nenhum split novo
+        splits = dict(RateioDespesa.objects.filter(despesa=self.despesa_aberta).values_list('id', 'descricao'))
+        self.assertEqual(splits, {a.id: "A", b.id: "C"})
+
+        class R(Schema):
+            descricao: str
+            valor: Decimal
+            categoria_id: int = None
+
+        # Reenviar os mesmos rateios (sem id) não escreve nada
+        iguais = [R(descricao="C", valor=Decimal('40')), R(descricao="A", valor=Decimal('60'))]
+        with self.assertNumQueries(1):
+            resultado = sincronizar_rateios(self.despesa_aberta, iguais, self.categoria.id)
+        self.assertEqual(resultado, {"inseridos": 0, "alterados": 0, "excluidos": 0})
+
+        self.assertEqual(
+            sincronizar_rateios(self.despesa_aberta, iguais[:1], self.categoria.id),
+            {"inseridos": 0, "alterados": 0, "excluidos": 1},
+        )
+
+    def test_bloqueio_de_mes_fechado_em_todas_as_escritas(self):
+        from financeiro_core.models import ContaBancaria
+        from financeiro_core.app.services import periodos_fechados
+
+        fechado = f"{self.ano_fechado}-{self.mes_fechado:02d}-10"
+        despesa = {
+            "descricao": "X", "categoria_id": self.categoria.id, "valor": "10.00",
+            "data_competencia": fechado, "data_transacao": fechado,
+        }
+        response = self.client.post("/despesas/", json=despesa, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 400)
+
+        antiga = ContaPagar.objects.create(
+            descricao="Antiga", loja_id_externo=self.loja_id, categoria=self.categoria, valor_bruto=Decimal('5.00'),
+            data_competencia=date(self.ano_fechado, self.mes_fechado, 2), data_transacao=date(self.ano_fechado, self.mes_fechado, 2),
+        )
+        self.assertEqual(self.client.delete(f"/despesas/{antiga.id}", headers=self.auth_headers).status_code, 400)
+
+        origem = ContaBancaria.objects.create(loja_id_externo=self.loja_id, nome="Caixa", tipo="CAIXA_FISICO")
+        destino = ContaBancaria.objects.create(loja_id_externo=self.loja_id, nome="Banco", tipo="CONTA_CORRENTE")
+        transferencia = {"conta_origem_id": origem.id, "conta_destino_id": destino.id, "valor": "10.00", "descricao": "T"}
+        response = self.client.post("/contas/transferencia", json={**transferencia, "data": fechado}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/contas/transferencia", json={**transferencia, "data": "2024-10-10"}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+
+        # Sem cache: reabrir ou fechar o mês (em qualquer processo) vale para a próxima escrita
+        FechamentoMensal.objects.filter(loja_id_externo=self.loja_id).update(status='ABERTO')
+        with self.assertNumQueries(1):
+            self.assertEqual(periodos_fechados.datas_fechadas(self.loja_id, [
+                date(self.ano_fechado, self.mes_fechado, 1), date(self.ano_aberto, self.mes_aberto, 1), None,
+            ]), set())
+        FechamentoMensal.objects.filter(loja_id_externo=self.loja_id).update(status='CONCLUIDO')
+        with self.assertRaises(periodos_fechados.PeriodoFechadoError):
+            periodos_fechados.verificar_aberto(self.loja_id, date(self.ano_fechado, self.mes_fechado, 1))
+
     def test_get_dre_no_side_effects(self):
         # 15. GET do DRE não cria FechamentoMensal.
         # 16. GET do DRE não modifica FechamentoMensal existente.
@@ -197,6 +362,7 @@ class DespesasApiTest(TestCase):
         # 7. Nome real da loja aparece no JSON.
         self.assertEqual(data['identificacao']['loja_nome'], f"Loja {self.loja_id}")
         self.assertEqual(data['identificacao']['regime'], "CAIXA")
+        self.assertEqual(data['identificacao']['gerado_por'], "testuser")
 
         # Tem qualidade de dados
         self.assertIn('qualidade_dados', data)
@@ -242,3 +408,1108 @@ class DespesasApiTest(TestCase):
         self.assertEqual(root.tag, 'dre')
         self.assertEqual(root.attrib.get('versao'), '1.0')
         self.assertEqual(root.attrib.get('regime'), 'CAIXA')
+
+
+class DREServiceAgregacaoTest(TestCase):
+    """Garante que a agregação em SQL segue as regras de rateio do DRE."""
+
+    def setUp(self):
+        from financeiro_core.models import RateioDespesa
+
+        self.loja_id = 1
+        self.cat_adm = CategoriaDespesa.objects.create(nome="Aluguel", grupo_contabil="ADMINISTRATIVA")
+        self.cat_pessoal = CategoriaDespesa.objects.create(nome="Salários", grupo_contabil="PESSOAL")
+        self.cat_mkt = CategoriaDespesa.objects.create(nome="Anúncios", grupo_contabil="MARKETING")
+
+        def criar(descricao, valor, categoria, data_transacao=date(2024, 10, 10), loja_id=1):
+            return ContaPagar.objects.create(
+                descricao=descricao,
+                loja_id_externo=loja_id,
+                categoria=categoria,
+                valor_bruto=Decimal(valor),
+                data_competencia=date(2024, 10, 1),
+                data_transacao=data_transacao,
+            )
+
+        # Regra A: sem rateio
+        criar("Sem rateio", "100.00", self.cat_adm)
+
+        # Regra B: rateio válido, um split sem categoria herda a da despesa
+        valida = criar("Rateio válido", "200.00", self.cat_adm)
+        RateioDespesa.objects.create(despesa=valida, descricao="Parte pessoal", valor=Decimal('120.00'), categoria=self.cat_pessoal)
+        RateioDespesa.objects.create(despesa=valida, descricao="", valor=Decimal('80.00'), categoria=None)
+
+        # Regra D: rateio inválido, valor integral vai para a categoria da despesa
+        invalida = criar("Rateio inválido", "50.00", self.cat_mkt)
+        RateioDespesa.objects.create(despesa=invalida, descricao="Parcial", valor=Decimal('10.00'), categoria=self.cat_pessoal)
+
+        # Fora do escopo: outro mês, outra loja e sem data de transação
+        criar("Outro mês", "999.00", self.cat_adm, data_transacao=date(2024, 11, 1))
+        criar("Outra loja", "999.00", self.cat_adm, loja_id=2)
+        criar("Sem transação", "999.00", self.cat_adm, data_transacao=None)
+
+    def _gerar(self, **kwargs):
+        from financeiro_core.app.services.dre_service import DREService
+        from financeiro_core.infrastructure.vendas_client import VendasAPIClientMock
+
+        service = DREService(vendas_client=VendasAPIClientMock())
+        return service.gerar(self.loja_id, 10, 2024, "Loja 1", "teste", **kwargs)
+
+    def test_totais_e_qualidade(self):
+        dre = self._gerar()
+
+        self.assertEqual(dre['resumo']['despesas_administrativas'], Decimal('180.00'))
+        self.assertEqual(dre['resumo']['despesas_pessoal'], Decimal('120.00'))
+        self.assertEqual(dre['resumo']['despesas_marketing'], Decimal('50.00'))
+
+        self.assertEqual(dre['qualidade_dados'], {
+            "quantidade_despesas_consideradas": 3,
+            "quantidade_despesas_sem_rateio": 1,
+            "quantidade_despesas_com_rateio_valido": 1,
+            "quantidade_despesas_com_rateio_invalido": 1,
+            "valor_despesas_com_rateio_invalido": Decimal('50.00'),
+            "valor_total_despesas_consideradas": Decimal('350.00'),
+            "possui_rateios_invalidos": True,
+        })
+
+        grupo_adm = next(g for g in dre['grupos_detalhados'] if g['grupo_contabil'] == 'ADMINISTRATIVA')
+        self.assertEqual(grupo_adm['categorias'][0]['quantidade_lancamentos'], 2)
+        self.assertEqual(grupo_adm['categorias'][0]['lancamentos'], [])
+
+    def test_lancamentos_sob_demanda(self):
+        dre = self._gerar(incluir_lancamentos=True)
+
+        lancamentos = {
+            g['grupo_contabil']: [l for c in g['categorias'] for l in c['lancamentos']]
+            for g in dre['grupos_detalhados']
+        }
+        self.assertEqual(len(lancamentos['ADMINISTRATIVA']), 2)
+        self.assertEqual(lancamentos['PESSOAL'][0]['tipo_origem'], 'RATEIO')
+        self.assertTrue(lancamentos['MARKETING'][0]['descricao'].startswith('[RATEIO INVÁLIDO]'))
+
+
+class DRECacheTest(TestCase):
+    """Cache do DRE: reaproveitamento entre chamadas e invalidação por período."""
+
+    def setUp(self):
+        from django.core.cache import caches
+        from financeiro_core.app.services.dre_service import DREService
+        from financeiro_core.infrastructure.vendas_client import VendasAPIClientMock
+
+        caches['dre'].clear()
+        self.categoria = CategoriaDespesa.objects.create(nome="Cache", grupo_contabil="ADMINISTRATIVA")
+
+        service = DREService(vendas_client=VendasAPIClientMock())
+        self.chamadas = 0
+        gerar_original = service.gerar
+
+        def gerar_contando(*args, **kwargs):
+            self.chamadas += 1
+            return gerar_original(*args, **kwargs)
+
+        service.gerar = gerar_contando
+        self.service = service
+
+    def _obter(self, mes=10, gerado_por="ana"):
+        from financeiro_core.app.services.dre_cache import obter_dre
+        return obter_dre(1, mes, 2024, "Loja 1", gerado_por, service=self.service)
+
+    def _criar_despesa(self, data_transacao):
+        # A versão do período é renovada no commit da escrita
+        with self.captureOnCommitCallbacks(execute=True):
+            return ContaPagar.objects.create(
+                descricao="Despesa", loja_id_externo=1, categoria=self.categoria,
+                valor_bruto=Decimal('10.00'), data_competencia=data_transacao, data_transacao=data_transacao,
+            )
+
+    def test_reaproveita_e_renova_identificacao(self):
+        self._obter(gerado_por="ana")
+        dre = self._obter(gerado_por="bruno")
+        self.assertEqual(self.chamadas, 1)
+        self.assertEqual(dre['identificacao']['gerado_por'], "bruno")
+
+    def test_invalida_apenas_o_mes_afetado(self):
+        self._obter(mes=10)
+        self._obter(mes=11)
+
+        self._criar_despesa(date(2024, 10, 5))
+        dre = self._obter(mes=10)
+        self._obter(mes=11)
+
+        self.assertEqual(self.chamadas, 3)
+        self.assertEqual(dre['resumo']['despesas_administrativas'], Decimal('10.00'))
+
+    def test_mudanca_de_mes_invalida_origem_e_destino(self):
+        despesa = self._criar_despesa(date(2024, 10, 5))
+        self._obter(mes=10)
+        self._obter(mes=11)
+
+        despesa.data_transacao = date(2024, 11, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            despesa.save()
+        self.assertEqual(self._obter(mes=10)['resumo']['despesas_administrativas'], Decimal('0.00'))
+        self.assertEqual(self._obter(mes=11)['resumo']['despesas_administrativas'], Decimal('10.00'))
+
+    def test_versao_renovada_por_outro_processo(self):
+        from django.db.models import F
+        from financeiro_core.models import VersaoCacheDRE
+
+        self._obter()
+        # Outro worker invalidou o período: só a versão no banco muda, o cache local continua cheio
+        VersaoCacheDRE.objects.filter(chave__startswith='dre:v:periodo:1:2024:10').update(versao=F('versao') + 1)
+        self._obter()
+        self.assertEqual(self.chamadas, 2)
+
+    def test_recalculo_do_fechamento_ignora_o_cache(self):
+        from financeiro_core.app.services.dre_cache import recalcular_dre
+
+        despesa = self._criar_despesa(date(2024, 10, 5))
+        self._obter()
+        # Escrita cuja invalidação ainda não chegou (ex.: outro processo no meio do commit)
+        ContaPagar.objects.filter(pk=despesa.pk).update(valor_liquido=Decimal('25.00'))
+        self.assertEqual(self._obter()['resumo']['despesas_administrativas'], Decimal('10.00'))
+
+        dre = recalcular_dre(1, 10, 2024, "Loja 1", "Sistema", service=self.service)
+        self.assertEqual(dre['resumo']['despesas_administrativas'], Decimal('25.00'))
+        self.assertEqual(self._obter()['resumo']['despesas_administrativas'], Decimal('25.00'))
+        self.assertEqual(self.chamadas, 2)
+
+
+class RepositorioTaxasTest(TestCase):
+    """Matriz de taxas pré-carregada: uma consulta por loja, fallback GERAL e invalidação."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from financeiro_core.models import PerfilTaxaCartao, TaxaMaquininha
+
+        cache.clear()
+        self.perfil = PerfilTaxaCartao.objects.create(nome="Stone", loja_id_externo=1, data_inicio_vigencia=date(2024, 1, 1))
+        TaxaMaquininha.objects.create(perfil=self.perfil, tipo='DEBITO', bandeira='GERAL', taxa_percentual=Decimal('1.00'))
+        TaxaMaquininha.objects.create(perfil=self.perfil, tipo='DEBITO', bandeira='Visa', taxa_percentual=Decimal('0.80'))
+        self.parcelado = TaxaMaquininha.objects.create(
+            perfil=self.perfil, tipo='CREDITO_PARCELADO', bandeira='GERAL',
+            parcela_inicial=2, parcela_final=6, taxa_percentual=Decimal('3.50'), taxa_fixa=Decimal('0.10')
+        )
+
+    def test_busca_com_uma_consulta(self):
+        from financeiro_core.app.services.dre_repositories import DjangoRepositorioTaxas
+
+        repo = DjangoRepositorioTaxas()
+        with self.assertNumQueries(1):
+            self.assertEqual(repo.buscar_taxa(1, 'DEBITO', 'VISA', 1).percentual, Decimal('0.80'))
+            self.assertEqual(repo.buscar_taxa(1, 'DEBITO', 'ELO', 1).percentual, Decimal('1.00'))
+            self.assertEqual(repo.buscar_taxa(1, 'DEBITO', '', 1).percentual, Decimal('1.00'))
+            self.assertEqual(repo.buscar_taxa(1, 'CREDITO_PARCELADO', 'VISA', 3).valor_fixo, Decimal('0.10'))
+            self.assertIsNone(repo.buscar_taxa(1, 'CREDITO_PARCELADO', 'VISA', 10))
+            self.assertIsNone(repo.buscar_taxa(1, 'PIX', 'GERAL', 1))
+
+        # Outra instância (nova requisição) reaproveita o cache
+        with self.assertNumQueries(0):
+            DjangoRepositorioTaxas().buscar_taxa(1, 'DEBITO', 'VISA', 1)
+
+    def test_escrita_invalida_matriz(self):
+        from financeiro_core.app.services.dre_repositories import DjangoRepositorioTaxas
+
+        DjangoRepositorioTaxas().buscar_taxa(1, 'CREDITO_PARCELADO', 'GERAL', 3)
+        self.parcelado.taxa_percentual = Decimal('4.00')
+        self.parcelado.save()
+        self.assertEqual(DjangoRepositorioTaxas().buscar_taxa(1, 'CREDITO_PARCELADO', 'GERAL', 3).percentual, Decimal('4.00'))
+
+        self.perfil.ativo = False
+        self.perfil.save()
+        self.assertIsNone(DjangoRepositorioTaxas().buscar_taxa(1, 'DEBITO', 'VISA', 1))
+
+
+class AgregadosMensaisTest(TestCase):
+    """Tabela de agregados mensais: equivalência com o recálculo completo e manutenção nas escritas."""
+
+    setUp = DREServiceAgregacaoTest.setUp
+
+    def test_materializado_equivale_ao_recalculo(self):
+        from financeiro_core.app.services import agregados_mensais
+        from financeiro_core.app.services.dre_agregacao import AgregadorDespesasDRE
+
+        agregados_mensais.recalcular_periodos(agregados_mensais.periodos_existentes())
+
+        esperado = AgregadorDespesasDRE().agregar(self.loja_id, 10, 2024)
+        with self.assertNumQueries(2):
+            materializado = agregados_mensais.AgregadorDespesasMaterializado().agregar(self.loja_id, 10, 2024)
+        self.assertEqual(materializado, esperado)
+        self.assertEqual(materializado['valor_splits_rateio_invalido'], Decimal('10.00'))
+
+        competencia = agregados_mensais.ler_periodo(self.loja_id, 10, 2024, agregados_mensais.REGIME_COMPETENCIA)
+        self.assertEqual(competencia['qualidade']['quantidade_despesas_consideradas'], 5)
+
+    def test_verificador_detecta_escrita_fora_do_fluxo(self):
+        from financeiro_core.app.services import agregados_mensais
+
+        agregados_mensais.recalcular_periodo(self.loja_id, 10, 2024)
+        self.assertEqual(agregados_mensais.divergencias_periodo(self.loja_id, 10, 2024), [])
+
+        ContaPagar.objects.create(
+            descricao="Direto no banco", loja_id_externo=self.loja_id, categoria=self.cat_adm,
+            valor_bruto=Decimal('5.00'), data_competencia=date(2024, 10, 1), data_transacao=date(2024, 10, 2),
+        )
+        self.assertTrue(agregados_mensais.divergencias_periodo(self.loja_id, 10, 2024))
+
+        agregados_mensais.recalcular_periodo(self.loja_id, 10, 2024)
+        self.assertEqual(agregados_mensais.divergencias_periodo(self.loja_id, 10, 2024), [])
+
+    def test_troca_de_grupo_e_exclusao_de_categoria(self):
+        from financeiro_core.models import RateioDespesa
+        from financeiro_core.app.services import agregados_mensais
+
+        cat_temporaria = CategoriaDespesa.objects.create(nome="Temporária", grupo_contabil="CUSTOS")
+        despesa = ContaPagar.objects.get(descricao="Rateio válido")
+        despesa.splits.filter(categoria=None).update(categoria=cat_temporaria)
+        agregados_mensais.recalcular_periodo(self.loja_id, 10, 2024)
+
+        self.cat_mkt.grupo_contabil = "FINANCEIRA"
+        self.cat_mkt.save()
+        cat_temporaria.delete()
+
+        self.assertEqual(RateioDespesa.objects.filter(categoria=None).count(), 1)
+        self.assertEqual(agregados_mensais.divergencias_periodo(self.loja_id, 10, 2024), [])
+
+
+class AgregadosConcorrenciaTest(TransactionTestCase):
+    """Duas escritas simultâneas no mesmo mês: o recálculo do período é serializado."""
+
+    databases = {'default'}
+
+    def test_escritas_concorrentes_no_mesmo_periodo(self):
+        import threading
+        from django.db import connection, transaction
+        from financeiro_core.app.services import agregados_mensais
+
+        categoria = CategoriaDespesa.objects.create(nome="Aluguel", ativa=True)
+        barreira = threading.Barrier(2, timeout=10)
+        erros = []
+
+        def escrever(valor):
+            try:
+                with transaction.atomic():
+                    despesa = ContaPagar.objects.create(
+                        descricao=f"Despesa {valor}", loja_id_externo=1, categoria=categoria, valor_bruto=Decimal(valor),
+                        data_competencia=date(2024, 10, 1), data_transacao=date(2024, 10, 5),
+                    )
+                    # As duas despesas existem (sem commit) antes de qualquer recálculo
+                    barreira.wait()
+                    agregados_mensais.recalcular_periodos(agregados_mensais.periodos_de_despesas([despesa]))
+            except Exception as e:
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escrever, args=(valor,)) for valor in ('10.00', '20.00')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertEqual(ContaPagar.objects.count(), 2)
+        for regime in (agregados_mensais.REGIME_CAIXA, agregados_mensais.REGIME_COMPETENCIA):
+            self.assertEqual(agregados_mensais.divergencias_periodo(1, 10, 2024, regime), [])
+            periodo = agregados_mensais.ler_periodo(1, 10, 2024, regime)
+            self.assertEqual(periodo['qualidade']['valor_total_despesas_consideradas'], Decimal('30.00'))
+
+
+class DRESnapshotFechamentoTest(TestCase):
+    """Meses CONCLUIDO são servidos do snapshot do fechamento, sem recálculo."""
+
+    def setUp(self):
+        from django.core.cache import caches
+        from financeiro_core.app.services.dre_service import DREService
+        from financeiro_core.infrastructure.vendas_client import VendasAPIClientMock
+
+        caches['dre'].clear()
+        categoria = CategoriaDespesa.objects.create(nome="Aluguel", grupo_contabil="ADMINISTRATIVA")
+        ContaPagar.objects.create(
+            descricao="Aluguel", loja_id_externo=1, categoria=categoria,
+            valor_bruto=Decimal('300.00'), data_competencia=date(2024, 5, 1), data_transacao=date(2024, 5, 5),
+        )
+        self.dre = DREService(vendas_client=VendasAPIClientMock()).gerar(1, 5, 2024, "Loja 1", "ana", incluir_lancamentos=True)
+
+        class ServicoIndisponivel:
+            def gerar(self, *args, **kwargs):
+                raise AssertionError("mês concluído não deve ser recalculado")
+
+        self.servico_indisponivel = ServicoIndisponivel()
+
+    def _fechar(self, snapshot):
+        FechamentoMensal.objects.create(
+            loja_id_externo=1, mes=5, ano=2024, status='CONCLUIDO',
+            faturamento_bruto=0, total_taxas=0, receita_liquida=0, total_despesas=0, resultado_operacional=0,
+            dados_auditoria_snapshot=snapshot,
+        )
+
+    def _obter(self, **kwargs):
+        from financeiro_core.app.services.dre_cache import obter_dre
+        return obter_dre(1, 5, 2024, "Loja 1", "bruno", **kwargs)
+
+    def test_serve_snapshot_com_tipos_do_contrato(self):
+        from financeiro_core.app.services.dre_snapshot import preparar_snapshot
+
+        self._fechar(preparar_snapshot(self.dre))
+        with self.assertNumQueries(1):
+            dre = self._obter(service=self.servico_indisponivel, incluir_lancamentos=False)
+
+        self.assertEqual(dre['resumo'], self.dre['resumo'])
+        self.assertEqual(dre['identificacao']['gerado_por'], "bruno")
+        self.assertNotIn('versao_schema', dre)
+        self.assertEqual(dre['grupos_detalhados'][0]['categorias'][0]['lancamentos'], [])
+
+    def test_snapshot_sem_versao_e_atualizado(self):
+        self._fechar(self.dre)
+        dre = self._obter(service=self.servico_indisponivel)
+        self.assertEqual(dre['resumo']['despesas_administrativas'], Decimal('300.00'))
+        self.assertEqual(dre['grupos_detalhados'][0]['categorias'][0]['lancamentos'][0]['valor'], Decimal('300.00'))
+
+    def test_snapshot_legado_recalcula(self):
+        from financeiro_core.app.services.dre_service import DREService
+        from financeiro_core.infrastructure.vendas_client import VendasAPIClientMock
+
+        self._fechar({"vendas_brutas_api": [], "dre": {"lucro_liquido": 0.0}, "data_processamento": "2024-06-01"})
+        dre = self._obter(service=DREService(vendas_client=VendasAPIClientMock()))
+        self.assertEqual(dre['resumo']['despesas_administrativas'], Decimal('300.00'))
+
+
+class DREServiceParaleloTest(TestCase):
+    """A consulta ao banco de vendas roda no pool de threads e seus erros chegam ao chamador."""
+
+    def _service(self, vendas_client):
+        from financeiro_core.app.services.dre_service import DREService
+        return DREService(vendas_client=vendas_client)
+
+    def test_vendas_em_outra_thread(self):
+        import threading
+        from financeiro_core.domain.services import FaturamentoItemDTO
+
+        threads = []
+
+        class ClienteVendas:
+            def get_faturamento_por_loja(self, loja_id, mes, ano):
+                threads.append(threading.current_thread().name)
+                return [FaturamentoItemDTO('PIX', 'GERAL', 1, Decimal('150.00'))]
+
+        dre = self._service(ClienteVendas()).gerar(1, 10, 2024, "Loja 1", "ana")
+        self.assertEqual(dre['resumo']['receita_bruta'], Decimal('150.00'))
+        self.assertTrue(threads[0].startswith('dre-vendas'))
+
+    def test_erro_no_banco_de_vendas_propaga(self):
+        class ClienteIndisponivel:
+            def get_faturamento_por_loja(self, loja_id, mes, ano):
+                raise ConnectionError("timeout")
+
+        with self.assertRaises(Exception) as contexto:
+            self._service(ClienteIndisponivel()).gerar(1, 10, 2024, "Loja 1", "ana")
+        self.assertIn("Falha ao obter faturamento", str(contexto.exception))
+        self.assertIsInstance(contexto.exception.__cause__, ConnectionError)
+
+
+class VendasClientSQLTest(TestCase):
+    """Consulta de faturamento sobre tabelas legadas sintéticas (temporárias no banco default)."""
+
+    def setUp(self):
+        from django.db import connection
+        from financeiro_core.management.commands.benchmark_faturamento_vendas import DDL_LEGADO
+
+        with connection.cursor() as cursor:
+            cursor.execute(DDL_LEGADO)
+            cursor.executemany('INSERT INTO vendas_caixadiario VALUES (%s, %s, %s)', [
+                (1, 1, date(2024, 10, 1)), (2, 1, date(2024, 10, 31)), (3, 2, date(2024, 10, 1)),
+                (4, 1, date(2024, 11, 1)),
+            ])
+            cursor.executemany('INSERT INTO vendas_venda VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)', [
+                # Dois pagamentos na mesma venda
+                (1, 1, 1, False, 'PIX', None, '100.00', 'Cartão Débito', 'visa', '50.00'),
+                (2, 1, 2, False, 'PIX', None, '30.00', None, None, '0.00'),
+                # Ignorada, estornada, fora do mês e de outra loja
+                (3, 1, 1, True, 'PIX', None, '999.00', None, None, '0.00'),
+                (4, 1, 1, False, 'PIX', None, '999.00', None, None, '0.00'),
+                (5, 1, 4, False, 'PIX', None, '999.00', None, None, '0.00'),
+                (6, 2, 3, False, 'PIX', None, '999.00', None, None, '0.00'),
+            ])
+            cursor.execute('INSERT INTO vendas_estorno (venda_id) VALUES (4), (4)')
+
+    def test_unpivot_dos_pagamentos(self):
+        from financeiro_core.infrastructure.vendas_client import VendasClientSQL
+
+        itens = VendasClientSQL(alias='default').get_faturamento_por_loja(1, 10, 2024)
+        totais = {(i.tipo_pagamento, i.bandeira): i.valor_bruto for i in itens}
+        self.assertEqual(totais, {('PIX', 'GERAL'): Decimal('130.00'), ('DEBITO', 'VISA'): Decimal('50.00')})
+
+    def test_lote_por_loja_e_periodo(self):
+        from financeiro_core.infrastructure.vendas_client import VendasClientSQL, GRANULARIDADE_DIA
+
+        cliente = VendasClientSQL(alias='default')
+        mensal = cliente.get_faturamento_lote([1, 2], date(2024, 10, 1), date(2024, 12, 1))
+        self.assertEqual(set(mensal), {(1, date(2024, 10, 1)), (1, date(2024, 11, 1)), (2, date(2024, 10, 1))})
+
+        diario = cliente.get_faturamento_lote([1], date(2024, 10, 1), date(2024, 11, 1), granularidade=GRANULARIDADE_DIA)
+        self.assertEqual(sorted(diario), [(1, date(2024, 10, 1)), (1, date(2024, 10, 31))])
+        self.assertEqual(diario[(1, date(2024, 10, 31))][0].valor_bruto, Decimal('30.00'))
+
+    def test_dre_de_varios_meses_com_uma_consulta(self):
+        from financeiro_core.app.services.dre_service import DREService
+        from financeiro_core.infrastructure.vendas_client import VendasClientSQL
+
+        class ClienteContando(VendasClientSQL):
+            chamadas = 0
+
+            def get_faturamento_lote(self, *args, **kwargs):
+                ClienteContando.chamadas += 1
+                return super().get_faturamento_lote(*args, **kwargs)
+
+        with self.settings(DRE_VENDAS_PARALELO=False):
+            dres = DREService(vendas_client=ClienteContando(alias='default')).gerar_periodos(
+                1, [(10, 2024), (11, 2024), (12, 2024)], "Loja 1", "ana"
+            )
+
+        self.assertEqual(ClienteContando.chamadas, 1)
+        self.assertEqual(dres[(10, 2024)]['resumo']['receita_bruta'], Decimal('180.00'))
+        self.assertEqual(dres[(11, 2024)]['resumo']['receita_bruta'], Decimal('999.00'))
+        self.assertEqual(dres[(12, 2024)]['resumo']['receita_bruta'], Decimal('0.00'))
+
+    def test_consolidado_incremental_equivale_ao_legado(self):
+        from django.db import connection
+        from financeiro_core.models import VendaDiariaConsolidada
+        from financeiro_core.app.services import vendas_consolidadas
+        from financeiro_core.infrastructure.vendas_client import VendasClientSQL
+
+        def totais(cliente):
+            lote = cliente.get_faturamento_lote([1, 2], date(2024, 10, 1), date(2024, 12, 1))
+            return {chave: sorted((i.tipo_pagamento, i.bandeira, i.valor_bruto) for i in itens) for chave, itens in lote.items()}
+
+        legado = VendasClientSQL(alias='default', usar_consolidado=False)
+        consolidado = VendasClientSQL(alias='default', usar_consolidado=True)
+
+        # Caixa de 01/11 ainda aberto: fica fora do consolidado e a marca d'água para antes dele
+        resultado = vendas_consolidadas.sincronizar(alias='default', hoje=date(2024, 11, 1))
+        self.assertEqual(resultado['ultimo_caixa_id'], 3)
+        self.assertEqual(VendaDiariaConsolidada.objects.filter(data__gte=date(2024, 11, 1)).count(), 0)
+        self.assertEqual(totais(consolidado), totais(legado))
+
+        # Estorno novo de uma venda de dia já consolidado: o dia é relido
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO vendas_estorno (venda_id) VALUES (1)')
+        resultado = vendas_consolidadas.sincronizar(alias='default', hoje=date(2024, 11, 2))
+        self.assertEqual(resultado['ultimo_caixa_id'], 4)
+        self.assertEqual(totais(consolidado), totais(legado))
+        self.assertEqual(totais(consolidado)[(1, date(2024, 10, 1))], [('PIX', 'GERAL', Decimal('30.00'))])
+
+
+class AuthBearerTest(TestCase):
+    """Token com claims assinados dispensa a consulta ao usuário em cada requisição."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='maria', password='password')
+
+    def _autenticar(self, token):
+        from django.test import RequestFactory
+        from financeiro_core.app.api.security import AuthBearer
+
+        request = RequestFactory().get('/')
+        return request, AuthBearer().authenticate(request, token)
+
+    def test_claims_sem_consulta_apos_revalidacao(self):
+        from financeiro_core.app.api.auth import create_token as criar_token_login
+
+        token = criar_token_login(self.user, 1)
+        self._autenticar(token)
+
+        with self.assertNumQueries(0, using='vendas'):
+            request, user = self._autenticar(token)
+
+        self.assertEqual((user.id, user.username), (self.user.id, 'maria'))
+        self.assertIs(request.user, user)
+        self.assertEqual(request.active_loja_id, 1)
+
+    def test_token_antigo_e_permissao_alterada(self):
+        from financeiro_core.app.api.auth import create_token as criar_token_login
+        from financeiro_core.app.api.security import invalidar_usuario
+
+        # Token sem claims de identidade continua aceito
+        _, user = self._autenticar(create_token(self.user.id, 1))
+        self.assertEqual(user.username, 'maria')
+
+        token = criar_token_login(self.user, 1)
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        invalidar_usuario(self.user.id)
+        self.assertIsNone(self._autenticar(token)[1])
+
+        User.objects.filter(pk=self.user.pk).update(is_superuser=False, is_active=False)
+        invalidar_usuario(self.user.id)
+        self.assertIsNone(self._autenticar(create_token(self.user.id, 1))[1])
+
+
+class PermissoesLojaTest(TestCase):
+    """Espelho de permissões montado por uma consulta UNION sobre tabelas legadas temporárias."""
+
+    def setUp(self):
+        from django.db import connection
+
+        self.gestor = User.objects.create_user(username='gestor', password='password')
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE vendas_loja (id integer, nome varchar(100), ativa boolean, grupo_id integer);
+                CREATE TEMP TABLE vendas_grupolojas_super_usuarios_grupo (grupolojas_id integer, user_id integer);
+                CREATE TEMP TABLE vendas_loja_gestores (loja_id integer, user_id integer);
+                CREATE TEMP TABLE vendas_userprofile (id integer, user_id integer, loja_id integer);
+                CREATE TEMP TABLE vendas_userprofile_lojas_conferencia (userprofile_id integer, loja_id integer);
+            """)
+            cursor.execute("""
+                INSERT INTO vendas_loja VALUES (1, 'Centro', true, 10), (2, 'Norte', true, 10), (3, 'Sul', false, NULL), (4, 'Leste', true, NULL)
+            """)
+            cursor.execute('INSERT INTO vendas_grupolojas_super_usuarios_grupo VALUES (10, %s)', [self.gestor.id])
+            cursor.execute('INSERT INTO vendas_loja_gestores VALUES (2, %s), (4, %s)', [self.gestor.id, self.gestor.id])
+            cursor.execute('INSERT INTO vendas_userprofile VALUES (1, %s, 4)', [self.gestor.id])
+            cursor.execute('INSERT INTO vendas_userprofile_lojas_conferencia VALUES (1, 3)')
+
+    def test_prioridade_dos_papeis(self):
+        from financeiro_core.app.services.permissoes_lojas import lojas_do_usuario
+
+        lojas = lojas_do_usuario(self.gestor.id, alias='default')
+        self.assertEqual([(l['id'], l['role']) for l in lojas], [(1, 'GESTOR_GRUPO'), (2, 'GESTOR_GRUPO'), (4, 'GESTOR')])
+
+        lojas = lojas_do_usuario(self.admin.id, alias='default')
+        self.assertEqual([(l['id'], l['role']) for l in lojas], [(1, 'GLOBAL'), (2, 'GLOBAL'), (4, 'GLOBAL')])
+
+    def test_espelho_atualizado_pela_sincronizacao(self):
+        from django.db import connection
+        from financeiro_core.app.services import permissoes_lojas
+
+        permissoes_lojas.sincronizar(alias='default')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM vendas_grupolojas_super_usuarios_grupo')
+
+        # Dentro do TTL a resposta vem do espelho
+        self.assertEqual(len(permissoes_lojas.lojas_do_usuario(self.gestor.id, alias='default')), 3)
+
+        resultado = permissoes_lojas.sincronizar(alias='default')
+        self.assertEqual((resultado['removidas'], resultado['alteradas']), (1, 1))
+        lojas = permissoes_lojas.lojas_do_usuario(self.gestor.id, alias='default')
+        self.assertEqual([(l['id'], l['role']) for l in lojas], [(2, 'GESTOR'), (4, 'GESTOR')])
+
+    def test_sincronizacoes_simultaneas_do_mesmo_usuario(self):
+        from unittest import mock
+        from financeiro_core.models import PermissaoLojaUsuario
+        from financeiro_core.app.services import permissoes_lojas
+
+        bulk_create = PermissaoLojaUsuario.objects.bulk_create
+
+        def gravar_depois_da_requisicao_concorrente(objs, **kwargs):
+            # A outra requisição grava a mesma permissão entre a leitura do espelho e esta escrita
+            PermissaoLojaUsuario.objects.create(user_id_externo=self.gestor.id, loja_id_externo=1, loja_nome='Centro', role='GESTOR_GRUPO')
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(PermissaoLojaUsuario.objects, 'bulk_create', side_effect=gravar_depois_da_requisicao_concorrente):
+            lojas = permissoes_lojas.lojas_do_usuario(self.gestor.id, alias='default')
+        self.assertEqual([l['id'] for l in lojas], [1, 2, 4])
+
+
+class DashboardResumoTest(TestCase):
+    """Resumo do painel em uma consulta agregada."""
+
+    def setUp(self):
+        from financeiro_core.models import RateioDespesa
+
+        self.categoria = CategoriaDespesa.objects.create(nome="Cat", ativa=True)
+        base = dict(loja_id_externo=1, categoria=self.categoria, data_competencia=date(2024, 10, 1))
+        # Rateio inválido (splits somam 90): o painel usa a soma dos splits
+        rateada = ContaPagar.objects.create(descricao="Rateada", valor_bruto=Decimal('100.00'), data_transacao=date(2024, 10, 2), data_pagamento=date(2024, 10, 2), **base)
+        RateioDespesa.objects.create(despesa=rateada, descricao="A", valor=Decimal('60.00'))
+        RateioDespesa.objects.create(despesa=rateada, descricao="B", valor=Decimal('30.00'))
+        ContaPagar.objects.create(descricao="Atrasada", valor_bruto=Decimal('10.00'), data_transacao=date(2024, 10, 10), **base)
+        ContaPagar.objects.create(descricao="Prevista", valor_bruto=Decimal('20.00'), data_transacao=date(2024, 10, 30), **base)
+        ContaPagar.objects.create(descricao="Próxima semana", valor_bruto=Decimal('5.00'), data_transacao=date(2024, 11, 3), **base)
+        ContaPagar.objects.create(descricao="Outra loja", valor_bruto=Decimal('7.00'), data_transacao=date(2024, 10, 10), **{**base, 'loja_id_externo': 2})
+
+    def test_totais_e_pendencias_em_uma_consulta(self):
+        from financeiro_core.app.services.dashboard import resumo_despesas
+
+        with self.assertNumQueries(1):
+            resumo = resumo_despesas(1, 10, 2024, hoje=date(2024, 10, 28))
+
+        self.assertEqual(resumo['quantidade_mes'], 3)
+        self.assertEqual(resumo['total_mes'], Decimal('120.00'))
+        self.assertEqual(resumo['pago_mes'], Decimal('90.00'))
+        self.assertEqual(resumo['atrasado_mes'], Decimal('10.00'))
+        self.assertEqual(resumo['previsto_mes'], Decimal('20.00'))
+        self.assertEqual(resumo['despesas_atrasadas'], 1)
+        self.assertEqual(resumo['despesas_vencendo_semana'], 2)
+
+
+class SaldosContaTest(TestCase):
+    """Saldo mantido por incrementos atômicos e consultado via pontos de controle diários."""
+
+    def setUp(self):
+        from financeiro_core.models import ContaBancaria
+
+        self.conta = ContaBancaria.objects.create(
+            loja_id_externo=1, nome="Caixa", tipo="CAIXA_FISICO", saldo_inicial=Decimal('100.00'), saldo_atual=Decimal('100.00')
+        )
+
+    def _movimentar(self, tipo, valor, dia):
+        from django.utils import timezone
+        from financeiro_core.models import MovimentacaoCaixa
+
+        return MovimentacaoCaixa.objects.create(
+            conta=self.conta, tipo_movimentacao=tipo, descricao=tipo, valor=Decimal(valor), loja_id_externo=1,
+            data_ocorrencia=timezone.make_aware(datetime.datetime.combine(dia, datetime.time(10, 0))),
+        )
+
+    def test_saldo_atual_edicao_e_exclusao(self):
+        entrada = self._movimentar('ENTRADA', '50.00', date(2024, 10, 1))
+        saida = self._movimentar('SAIDA', '30.00', date(2024, 10, 2))
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.saldo_atual, Decimal('120.00'))
+
+        entrada.valor = Decimal('80.00')
+        entrada.save()
+        saida.delete()
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.saldo_atual, Decimal('180.00'))
+
+    def test_saldo_em_data_e_reconciliacao(self):
+        from financeiro_core.models import ContaBancaria
+        from financeiro_core.app.services import saldos
+
+        self._movimentar('ENTRADA', '50.00', date(2024, 10, 1))
+        self._movimentar('SAIDA', '20.00', date(2024, 10, 3))
+        self.assertEqual(saldos.gerar_pontos_controle(date(2024, 10, 31)), 2)
+
+        # Lançamento retroativo ajusta os pontos de controle seguintes
+        self._movimentar('TRANSFERENCIA_ENTRADA', '5.00', date(2024, 10, 2))
+        self._movimentar('SAIDA', '1.00', date(2024, 10, 5))
+
+        self.assertEqual(saldos.saldo_em(self.conta, date(2024, 9, 30)), Decimal('100.00'))
+        self.assertEqual(saldos.saldo_em(self.conta, date(2024, 10, 2)), Decimal('155.00'))
+        self.assertEqual(saldos.saldo_em(self.conta, date(2024, 10, 4)), Decimal('135.00'))
+        self.assertEqual(saldos.saldo_em(self.conta, date(2024, 10, 5)), Decimal('134.00'))
+
+        self.assertEqual(saldos.divergencias_saldo(), [])
+        ContaBancaria.objects.filter(pk=self.conta.pk).update(saldo_atual=Decimal('0.00'))
+        divergentes = saldos.divergencias_saldo(corrigir=True)
+        self.assertEqual([d['diferenca'] for d in divergentes], [Decimal('-134.00')])
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.saldo_atual, Decimal('134.00'))
+
+    def test_pontos_controle_gerados_na_primeira_consulta(self):
+        from financeiro_core.models import SaldoDiarioConta
+        from financeiro_core.app.services import saldos
+
+        self._movimentar('ENTRADA', '50.00', date(2024, 10, 1))
+        self._movimentar('SAIDA', '20.00', date(2024, 10, 2))
+        self.assertFalse(SaldoDiarioConta.objects.filter(conta=self.conta).exists())
+
+        self.assertEqual(saldos.saldo_em(self.conta, date(2024, 10, 2)), Decimal('130.00'))
+        self.assertEqual(SaldoDiarioConta.objects.filter(conta=self.conta).count(), 2)
+        with self.assertNumQueries(2):  # ponto de controle + movimentações depois dele
+            self.assertEqual(saldos.saldo_em(self.conta, date(2024, 10, 2)), Decimal('130.00'))
+
+    def test_extrato_paginado_com_saldo_acumulado(self):
+        from financeiro_core.app.services import saldos
+
+        user = User.objects.create_user(username='extrato', password='password')
+        headers = {"Authorization": f"Bearer {create_token(user.id, 1)}"}
+        client = TestClient(router)
+
+        self._movimentar('ENTRADA', '50.00', date(2024, 10, 1))
+        self._movimentar('SAIDA', '20.00', date(2024, 10, 1))
+        saldos.gerar_pontos_controle(date(2024, 10, 1))
+        self._movimentar('SAIDA', '5.00', date(2024, 10, 2))
+        self._movimentar('TRANSFERENCIA_ENTRADA', '10.00', date(2024, 10, 3))
+        self._movimentar('SAIDA', '1.00', date(2024, 10, 4))
+
+        url = f"/contas/{self.conta.id}/extrato?limite=2"
+        pagina, cursor = [], None
+        while True:
+            response = client.get(url + (f"&cursor={cursor}" if cursor else ""), headers=headers)
+            self.assertEqual(response.status_code, 200)
+            pagina += response.json()
+            cursor = response.headers.get('X-Proximo-Cursor')
+            if not cursor:
+                break
+
+        self.assertEqual(
+            [Decimal(item['saldo']) for item in pagina],
+            [Decimal(v) for v in ('150.00', '130.00', '125.00', '135.00', '134.00')],
+        )
+
+        response = client.get(f"/contas/{self.conta.id}/extrato?data_inicio=2024-10-03", headers=headers)
+        self.assertEqual([Decimal(item['saldo']) for item in response.json()], [Decimal('135.00'), Decimal('134.00')])
+        self.assertEqual(client.get(url + "&cursor=xx", headers=headers).status_code, 400)
+
+
+class OfxParserTest(TestCase):
+    """Parser incremental: SGML/XML, charset do cabeçalho e tokens cortados entre blocos."""
+
+    SGML = (
+        "OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nENCODING:USASCII\nCHARSET:1252\n\n"
+        "<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n"
+        "<STMTTRN><TRNTYPE>DEBIT\n<DTPOSTED>20241001120000[-3:BRT]\n<TRNAMT>-12,50\n<FITID>A1\n<MEMO>Pão de Açúcar\n</STMTTRN>\n"
+        "<STMTTRN><TRNTYPE>CREDIT\n<DTPOSTED>20241002\n<TRNAMT>100.00\n<FITID>A2\n<NAME>PIX RECEBIDO\n</STMTTRN>\n"
+        "<STMTTRN><TRNTYPE>DEBIT\n<DTPOSTED>invalida\n<TRNAMT>-1.00\n</STMTTRN>\n"
+        "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+    ).encode('cp1252')
+
+    XML = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<?OFX OFXHEADER="200" VERSION="211"?>\n'
+        "<OFX><BANKTRANLIST><STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20241003</DTPOSTED>"
+        "<TRNAMT>-1234.56</TRNAMT><FITID>X9</FITID><NAME>Tarifa &amp; Manutenção</NAME></STMTTRN></BANKTRANLIST></OFX>"
+    ).encode('utf-8')
+
+    def test_sgml_e_xml_em_blocos_pequenos(self):
+        import io
+        from financeiro_core.app.services.ofx_parser import OfxParserService
+
+        esperado_sgml = [
+            {"data_transacao": date(2024, 10, 1), "descricao_original": "Pão de Açúcar", "valor": Decimal('12.50'), "tipo": "SAIDA", "fitid": "A1"},
+            {"data_transacao": date(2024, 10, 2), "descricao_original": "PIX RECEBIDO", "valor": Decimal('100.00'), "tipo": "ENTRADA", "fitid": "A2"},
+        ]
+        esperado_xml = [
+            {"data_transacao": date(2024, 10, 3), "descricao_original": "Tarifa & Manutenção", "valor": Decimal('1234.56'), "tipo": "SAIDA", "fitid": "X9"},
+        ]
+
+        for tamanho in (5, 64 * 1024):
+            self.assertEqual(list(OfxParserService.iterar_transacoes(io.BytesIO(self.SGML), tamanho)), esperado_sgml)
+            self.assertEqual(list(OfxParserService.iterar_transacoes(io.BytesIO(self.XML), tamanho)), esperado_xml)
+        self.assertEqual(OfxParserService.parse(self.SGML.decode('cp1252')), esperado_sgml)
+
+    def test_separadores_do_valor(self):
+        from financeiro_core.app.services.ofx_parser import _valor
+
+        for texto, esperado in [
+            ('-12.50', '-12.50'), ('-12,50', '-12.50'), ('1.234,56', '1234.56'), ('1,234.56', '1234.56'),
+            ('-1.234.567,8', '-1234567.8'), ('1,234,567', '1234567'), (' 100 ', '100'),
+        ]:
+            self.assertEqual(_valor(texto), Decimal(esperado), texto)
+        for texto in ('1,234', '1.234', '1,23.45', '12.34,567.89', '1.2345,00'):
+            with self.assertRaises(ValueError, msg=texto):
+                _valor(texto)
+
+
+class SugestaoCategoriasTest(TestCase):
+    """Índice de termos por loja: votação ponderada, LRU em memória e atualização incremental."""
+
+    def setUp(self):
+        from financeiro_core.app.services import sugestao_categorias
+
+        sugestao_categorias.limpar()
+        self.energia = CategoriaDespesa.objects.create(nome="Energia", ativa=True)
+        self.tarifas = CategoriaDespesa.objects.create(nome="Tarifas", ativa=True)
+        for descricao, categoria in [
+            ("Pagamento Energia Elétrica CEMIG", self.energia),
+            ("Pagamento conta de energia", self.energia),
+            ("Tarifa bancária pacote", self.tarifas),
+            ("Pagamento tarifa manutenção", self.tarifas),
+        ]:
+            ContaPagar.objects.create(
+                descricao=descricao, loja_id_externo=1, categoria=categoria,
+                valor_bruto=Decimal('10.00'), data_competencia=date(2024, 10, 1), data_transacao=date(2024, 10, 1),
+            )
+
+    def test_sugestao_em_lote_e_incremental(self):
+        from financeiro_core.app.services.ofx_parser import OfxParserService
+
+        descricoes = ["PAGTO CEMIG ENERGIA 0123", "TARIFA BANCARIA MENSAL", "Pagamento 123", "PIX XYZW"]
+        with self.assertNumQueries(1):
+            sugestoes = OfxParserService.adivinhar_categorias(descricoes, 1)
+            self.assertEqual(OfxParserService.adivinhar_categoria("energia", 1), self.energia.id)
+        # "pagamento" aparece nas duas categorias: o voto segue a maioria (2 de energia, 1 de tarifas)
+        self.assertEqual(sugestoes, [self.energia.id, self.tarifas.id, self.energia.id, None])
+        self.assertIsNone(OfxParserService.adivinhar_categoria("energia", 2))
+
+        # Gravação desfeita por rollback não deixa termos no índice
+        from django.db import transaction
+        with self.assertRaises(ValueError), self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                ContaPagar.objects.create(
+                    descricao="Seguro xyzw", loja_id_externo=1, categoria=self.tarifas,
+                    valor_bruto=Decimal('10.00'), data_competencia=date(2024, 10, 1), data_transacao=date(2024, 10, 1),
+                )
+                raise ValueError("rateio inválido")
+        self.assertIsNone(OfxParserService.adivinhar_categoria("PIX XYZW", 1))
+
+        # Despesa nova entra no índice já carregado (após o commit), sem reconstruí-lo
+        with self.captureOnCommitCallbacks(execute=True):
+            despesa = ContaPagar.objects.create(
+                descricao="Seguro xyzw", loja_id_externo=1, categoria=self.tarifas,
+                valor_bruto=Decimal('10.00'), data_competencia=date(2024, 10, 1), data_transacao=date(2024, 10, 1),
+            )
+            despesa.categoria = self.energia
+            despesa.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(OfxParserService.adivinhar_categoria("PIX XYZW", 1), self.energia.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            despesa.delete()
+        self.assertIsNone(OfxParserService.adivinhar_categoria("PIX XYZW", 1))
+
+
+class ImportacaoExtratoTest(TestCase):
+    """Importação idempotente: chave por FITID/hash, bulk_create e um incremento de saldo por conta."""
+
+    def setUp(self):
+        from financeiro_core.models import ContaBancaria
+        from financeiro_core.app.services import sugestao_categorias
+
+        sugestao_categorias.limpar()
+        self.conta = ContaBancaria.objects.create(
+            loja_id_externo=1, nome="Banco", tipo="CONTA_CORRENTE", saldo_inicial=Decimal('100.00'), saldo_atual=Decimal('100.00')
+        )
+
+    def _transacoes(self, quantidade, inicio=0):
+        transacoes = [
+            {"data_transacao": date(2024, 10, 1 + i % 28), "descricao_original": f"PIX {i}", "valor": Decimal('10.00'),
+             "tipo": "SAIDA" if i % 2 else "ENTRADA", "fitid": f"F{i}"}
+            for i in range(inicio, quantidade)
+        ]
+        # Linhas sem FITID e idênticas entre si continuam sendo duas movimentações
+        tarifa = {"data_transacao": date(2024, 10, 5), "descricao_original": "TARIFA", "valor": Decimal('2.50'), "tipo": "SAIDA", "fitid": None}
+        return transacoes + [dict(tarifa), dict(tarifa)]
+
+    def test_reimportacao_com_sobreposicao(self):
+        from financeiro_core.models import MovimentacaoCaixa
+        from financeiro_core.app.services import importacao_extrato, saldos
+
+        resultado = importacao_extrato.importar_extrato(self.conta, self._transacoes(40), tamanho_lote=25)
+        self.assertEqual(resultado, {"importadas": 42, "ja_importadas": 0, "em_periodo_fechado": 0})
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.saldo_atual, Decimal('95.00'))
+
+        # Mesmo extrato ampliado: só as 20 linhas novas entram
+        FechamentoMensal.objects.create(
+            loja_id_externo=1, mes=11, ano=2024, status='CONCLUIDO',
+            faturamento_bruto=0, total_taxas=0, receita_liquida=0, total_despesas=0, resultado_operacional=0,
+        )
+        novas = self._transacoes(60) + [
+            {"data_transacao": date(2024, 11, 3), "descricao_original": "BLOQ", "valor": Decimal('1.00'), "tipo": "SAIDA", "fitid": "N1"}
+        ]
+        resultado = importacao_extrato.importar_extrato(self.conta, novas, tamanho_lote=25)
+        self.assertEqual(resultado, {"importadas": 20, "ja_importadas": 42, "em_periodo_fechado": 1})
+
+        # savepoint, lock, uma consulta de duplicadas por lote (3), meses fechados da linha bloqueada, release
+        with self.assertNumQueries(7):
+            self.assertEqual(importacao_extrato.importar_extrato(self.conta, novas, tamanho_lote=25)["importadas"], 0)
+
+        self.assertEqual(MovimentacaoCaixa.objects.filter(conta=self.conta).count(), 62)
+        self.assertEqual(saldos.divergencias_saldo(), [])
+
+
+class ConciliacaoBancariaTest(TestCase):
+    """Débitos do extrato x despesas em aberto: mesmo valor, janela de datas e desempate pela descrição."""
+
+    def setUp(self):
+        self.categoria = CategoriaDespesa.objects.create(nome="Utilidades", ativa=True)
+
+    def _despesa(self, descricao, valor, dia, **extras):
+        return ContaPagar.objects.create(
+            descricao=descricao, loja_id_externo=1, categoria=self.categoria, valor_bruto=Decimal(valor),
+            data_competencia=dia, data_transacao=dia, **extras
+        )
+
+    def test_motor_e_baixa_das_despesas(self):
+        from financeiro_core.models import ContaBancaria
+        from financeiro_core.app.services import conciliacao_bancaria
+
+        conta = ContaBancaria.objects.create(loja_id_externo=1, nome="Banco", tipo="CONTA_CORRENTE")
+        energia = self._despesa("Energia elétrica CEMIG", '150.00', date(2024, 10, 10))
+        agua = self._despesa("Água COPASA", '150.00', date(2024, 10, 11))
+        internet = self._despesa("Internet fibra", '99.90', date(2024, 10, 1))
+        self._despesa("Aluguel", '99.90', date(2024, 10, 14))  # na janela do extrato, fora da tolerância
+        self._despesa("Já paga", '10.00', date(2024, 10, 10), data_pagamento=date(2024, 10, 10))
+        # Competência de setembro (mês fechado), paga em outubro: casa, mas não pode ser baixada
+        contador = ContaPagar.objects.create(
+            descricao="Honorários contador", loja_id_externo=1, categoria=self.categoria, valor_bruto=Decimal('450.00'),
+            data_competencia=date(2024, 9, 30), data_transacao=date(2024, 10, 5),
+        )
+        FechamentoMensal.objects.create(
+            loja_id_externo=1, mes=9, ano=2024, status='CONCLUIDO',
+            faturamento_bruto=0, total_taxas=0, receita_liquida=0, total_despesas=0, resultado_operacional=0,
+        )
+
+        extrato = [
+            {"data_transacao": date(2024, 10, 12), "descricao_original": "DEB AUT COPASA AGUA", "valor": Decimal('150.00'), "tipo": "SAIDA", "fitid": "1"},
+            {"data_transacao": date(2024, 10, 12), "descricao_original": "DEB AUT CEMIG ENERGIA", "valor": Decimal('150.00'), "tipo": "SAIDA", "fitid": "2"},
+            {"data_transacao": date(2024, 10, 3), "descricao_original": "FIBRA NET", "valor": Decimal('99.90'), "tipo": "SAIDA", "fitid": "3"},
+            {"data_transacao": date(2024, 10, 10), "descricao_original": "TARIFA", "valor": Decimal('10.00'), "tipo": "SAIDA", "fitid": "4"},
+            {"data_transacao": date(2024, 10, 10), "descricao_original": "PIX RECEBIDO", "valor": Decimal('150.00'), "tipo": "ENTRADA", "fitid": "5"},
+            {"data_transacao": date(2024, 10, 5), "descricao_original": "TED CONTABILIDADE", "valor": Decimal('450.00'), "tipo": "SAIDA", "fitid": "6"},
+        ]
+
+        with self.assertNumQueries(2):  # despesas da janela + meses fechados da loja
+            resultado = conciliacao_bancaria.conciliar_despesas(1, extrato, tolerancia_dias=3)
+        self.assertEqual(
+            {par['fitid']: par['despesa_id'] for par in resultado['pares']},
+            {"1": agua.id, "2": energia.id, "3": internet.id, "6": contador.id},
+        )
+        self.assertEqual(resultado['lancamentos_sem_par'], [3])
+        self.assertEqual(len(resultado['despesas_sem_par']), 1)
+        self.assertEqual(resultado['em_periodo_fechado'], [contador.id])
+
+        conciliacao_bancaria.conciliar_despesas(1, extrato, tolerancia_dias=3, conta=conta)
+        energia.refresh_from_db()
+        contador.refresh_from_db()
+        self.assertEqual((energia.data_pagamento, energia.conta_origem_id), (date(2024, 10, 12), conta.id))
+        self.assertEqual((contador.data_pagamento, contador.conta_origem_id), (None, None))
+        self.assertEqual(
+            [par['despesa_id'] for par in conciliacao_bancaria.conciliar_despesas(1, extrato)['pares']], [contador.id]
+        )
+
+
+    def test_motor_com_valores_repetidos(self):
+        from datetime import timedelta
+        from financeiro_core.domain.conciliacao import DespesaConciliavelDTO, LancamentoExtratoDTO, MotorConciliacao
+
+        # Tarifas de mesmo valor em poucos dias: cada débito casa uma despesa livre diferente
+        despesas = [
+            DespesaConciliavelDTO(id=i, data=date(2024, 10, 1) + timedelta(days=i % 5), valor=Decimal('9.90'), descricao='Tarifa')
+            for i in range(300)
+        ]
+        despesas.append(DespesaConciliavelDTO(id=999, data=date(2024, 10, 5), valor=Decimal('9.90'), descricao='Pacote servicos'))
+        lancamentos = [
+            LancamentoExtratoDTO(chave=i, data=date(2024, 10, 3), valor=Decimal('9.90'), descricao='TARIFA') for i in range(250)
+        ]
+        lancamentos.append(LancamentoExtratoDTO(chave='pacote', data=date(2024, 10, 6), valor=Decimal('9.90'), descricao='PACOTE SERVICOS'))
+
+        resultado = MotorConciliacao(tolerancia_dias=3, limite_candidatos=400).conciliar(lancamentos, despesas)
+        self.assertEqual(len(resultado.pares), 251)
+        self.assertEqual(len({par.despesa.id for par in resultado.pares}), 251)
+        self.assertEqual(len(resultado.despesas_sem_par), 50)
+        self.assertEqual(next(par.despesa.id for par in resultado.pares if par.lancamento.chave == 'pacote'), 999)
+        # Com o limite, o desempate só compara os candidatos livres mais antigos da janela
+        resultado = MotorConciliacao(tolerancia_dias=3, limite_candidatos=2).conciliar(lancamentos[:2], despesas)
+        self.assertEqual([par.despesa.id for par in resultado.pares], [0, 5])
+
+
+class RecebiveisCartaoTest(TestCase):
+    """Repasse líquido previsto (D+dias_para_recebimento, dia útil) x entradas registradas."""
+
+    class ClienteVendasFixo:
+        def __init__(self, vendas):
+            self.vendas = vendas
+
+        def get_faturamento_lote(self, lojas, inicio, fim, granularidade):
+            return self.vendas
+
+    def setUp(self):
+        from django.core.cache import cache
+        from financeiro_core.models import ContaBancaria, PerfilTaxaCartao, TaxaMaquininha
+
+        cache.clear()
+        perfil = PerfilTaxaCartao.objects.create(nome="Stone", loja_id_externo=1, data_inicio_vigencia=date(2024, 1, 1))
+        TaxaMaquininha.objects.create(perfil=perfil, tipo='DEBITO', taxa_percentual=Decimal('1.00'), dias_para_recebimento=1)
+        TaxaMaquininha.objects.create(perfil=perfil, tipo='CREDITO_AVISTA', taxa_percentual=Decimal('3.00'), dias_para_recebimento=30)
+        self.conta = ContaBancaria.objects.create(loja_id_externo=1, nome="Banco", tipo="CONTA_CORRENTE")
+
+    def _entrada(self, valor, dia, tipo='ENTRADA'):
+        from django.utils import timezone
+        from financeiro_core.models import MovimentacaoCaixa
+
+        return MovimentacaoCaixa.objects.create(
+            conta=self.conta, tipo_movimentacao=tipo, descricao="Repasse", valor=Decimal(valor), loja_id_externo=1,
+            data_ocorrencia=timezone.make_aware(datetime.datetime.combine(dia, datetime.time(9, 0))),
+        )
+
+    def test_conferencia_do_mes(self):
+        from financeiro_core.app.services import recebiveis
+        from financeiro_core.domain.services import FaturamentoItemDTO
+
+        vendas = {
+            (1, date(2024, 10, 3)): [
+                FaturamentoItemDTO('DEBITO', 'VISA', 1, Decimal('1000.00')),
+                FaturamentoItemDTO('CREDITO_AVISTA', 'MASTER', 1, Decimal('500.00')),
+            ],
+            (1, date(2024, 10, 4)): [
+                FaturamentoItemDTO('DEBITO', 'ELO', 1, Decimal('200.00')),
+                FaturamentoItemDTO('DINHEIRO', 'GERAL', 1, Decimal('300.00')),
+                FaturamentoItemDTO('CARTAO_NAO_IDENTIFICADO', 'GERAL', 1, Decimal('50.00')),
+            ],
+        }
+        conciliado = self._entrada('990.40', date(2024, 10, 4))
+        self._entrada('180.00', date(2024, 10, 7))
+        self._entrada('485.00', date(2024, 11, 4), tipo='TRANSFERENCIA_ENTRADA')
+
+        with self.assertNumQueries(2):  # matriz de taxas + entradas do período
+            conferencias = recebiveis.conferir_recebiveis([1], 10, 2024, client=self.ClienteVendasFixo(vendas))
+
+        self.assertEqual(
+            [(c['data_prevista'], c['valor_liquido_previsto'], c['status'], c['diferenca']) for c in conferencias],
+            [
+                (date(2024, 10, 4), Decimal('990.00'), 'CONCILIADO', Decimal('0.40')),
+                # Sábado: o repasse D+1 cai na segunda-feira
+                (date(2024, 10, 7), Decimal('198.00'), 'DIVERGENTE', Decimal('-18.00')),
+                (date(2024, 11, 4), Decimal('485.00'), 'NAO_RECEBIDO', Decimal('-485.00')),
+            ],
+        )
+        self.assertEqual(conferencias[0]['chave_credito'], str(conciliado.id))
+
+
+class ConferenciaCaixaTest(TestCase):
+    """Dinheiro vendido por caixa (legado sintético) x recolhido dos caixas físicos, por loja e dia."""
+
+    def setUp(self):
+        from django.db import connection
+        from financeiro_core.models import ContaBancaria
+        from financeiro_core.management.commands.benchmark_faturamento_vendas import DDL_LEGADO
+
+        with connection.cursor() as cursor:
+            cursor.execute(DDL_LEGADO)
+            cursor.executemany('INSERT INTO vendas_caixadiario VALUES (%s, %s, %s)', [
+                (1, 1, date(2024, 10, 1)), (2, 1, date(2024, 10, 1)), (3, 2, date(2024, 10, 2)), (4, 1, date(2024, 10, 5)),
+            ])
+            cursor.executemany('INSERT INTO vendas_venda VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)', [
+                (1, 1, 1, False, 'Dinheiro', None, '100.00', 'PIX', None, '20.00'),
+                (2, 1, 2, False, 'PIX', None, '10.00', 'DINHEIRO', None, '50.00'),
+                (3, 1, 1, False, 'DINHEIRO', None, '999.00', None, None, '0.00'),
+                (4, 2, 3, False, 'DINHEIRO', None, '80.00', None, None, '0.00'),
+                (5, 1, 4, False, 'DINHEIRO', None, '40.00', None, None, '0.00'),
+            ])
+            cursor.execute('INSERT INTO vendas_estorno (venda_id) VALUES (3)')
+
+        self.caixa_1 = ContaBancaria.objects.create(loja_id_externo=1, nome="Caixa", tipo="CAIXA_FISICO")
+        self.caixa_2 = ContaBancaria.objects.create(loja_id_externo=2, nome="Caixa", tipo="CAIXA_FISICO")
+        self.banco_1 = ContaBancaria.objects.create(loja_id_externo=1, nome="Banco", tipo="CONTA_CORRENTE")
+
+    def _movimentar(self, conta, tipo, valor, dia):
+        from django.utils import timezone
+        from financeiro_core.models import MovimentacaoCaixa
+
+        MovimentacaoCaixa.objects.create(
+            conta=conta, tipo_movimentacao=tipo, descricao=tipo, valor=Decimal(valor), loja_id_externo=conta.loja_id_externo,
+            data_ocorrencia=timezone.make_aware(datetime.datetime.combine(dia, datetime.time(18, 0))),
+        )
+
+    def test_relatorio_do_mes_para_todas_as_lojas(self):
+        from financeiro_core.app.services import conferencia_caixa
+        from financeiro_core.infrastructure.vendas_client import VendasClientSQL
+
+        self._movimentar(self.caixa_1, 'SAIDA', '200.00', date(2024, 10, 1))
+        self._movimentar(self.caixa_1, 'TRANSFERENCIA_ENTRADA', '50.00', date(2024, 10, 1))
+        self._movimentar(self.caixa_1, 'ENTRADA', '30.00', date(2024, 10, 1))
+        self._movimentar(self.banco_1, 'SAIDA', '500.00', date(2024, 10, 1))
+        self._movimentar(self.caixa_1, 'SAIDA', '35.00', date(2024, 10, 5))
+        self._movimentar(self.caixa_2, 'TRANSFERENCIA_SAIDA', '70.00', date(2024, 10, 3))
+
+        with self.assertNumQueries(2):  # uma consulta agrupada em cada banco
+            relatorio = conferencia_caixa.conferir_caixas(
+                [1, 2], 10, 2024, client=VendasClientSQL(alias='default', usar_consolidado=False)
+            )
+
+        self.assertEqual(
+            [(r['loja_id'], r['data'], r['dinheiro_vendido'], r['recolhido'], r['diferenca'], r['status']) for r in relatorio],
+            [
+                (1, date(2024, 10, 1), Decimal('150.00'), Decimal('150.00'), Decimal('0.00'), 'OK'),
+                (1, date(2024, 10, 5), Decimal('40.00'), Decimal('35.00'), Decimal('-5.00'), 'DIVERGENTE'),
+                (2, date(2024, 10, 2), Decimal('80.00'), Decimal('0.00'), Decimal('-80.00'), 'SEM_REGISTRO'),
+                (2, date(2024, 10, 3), Decimal('0.00'), Decimal('70.00'), Decimal('70.00'), 'SEM_VENDA'),
+            ],
+        )
+        self.assertEqual(relatorio[0]['caixas'], [{"caixa_id": 1, "total": Decimal('100.00')}, {"caixa_id": 2, "total": Decimal('50.00')}])
+        self.assertEqual(relatorio[0]['entradas'], Decimal('30.00'))